@@ -0,0 +1,57 @@
+"""
+Flask application factory.
+Importing this package is cheap: AI clients, PDF and SVG libraries are only loaded when first used.
+"""
+import os
+import tempfile
+from flask import Flask
+
+
+SECRET_KEY_FILENAME = "secret_key"
+
+
+def load_dev_secret_key(instance_path):
+    """
+    Return the secret key persisted in the instance folder, creating it on first use,
+    so every worker process on this machine signs sessions with the same key.
+    The key is written to a temporary file and linked into place, so a worker starting at the
+    same moment never reads a half-written file; if two workers race, the first link wins.
+    """
+    path = os.path.join(instance_path, SECRET_KEY_FILENAME)
+    os.makedirs(instance_path, exist_ok=True)
+    if not os.path.exists(path):
+        fd, tmp_path = tempfile.mkstemp(dir=instance_path, prefix=SECRET_KEY_FILENAME + ".")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(os.urandom(32).hex())
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def create_app(config=None):
+    """
+    Create the Flask app, load environment settings and register the routes.
+    Sessions must be signed with the same key in every worker and on every node, so outside debug
+    and testing FLASK_SECRET_KEY is required; debug and test apps fall back to a key kept in the instance folder.
+    """
+    from dotenv import load_dotenv
+    from .routes import bp
+
+    load_dotenv()
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
+    secret_key = os.getenv("FLASK_SECRET_KEY")
+    if not secret_key:
+        if not (app.debug or app.testing):
+            raise RuntimeError("FLASK_SECRET_KEY must be set; use the same value for every worker and node.")
+        secret_key = load_dev_secret_key(app.instance_path)
+    app.secret_key = secret_key
+    app.register_blueprint(bp)
+    return app
@@ -0,0 +1,197 @@
+"""
+Admission control for pattern processing: estimates what a job will cost before running it,
+sends large jobs to a separate, smaller lane so they cannot starve quick SVG resizes,
+and rejects or defers work that would exceed this process's worker and memory budgets.
+"""
+import os
+import threading
+import time
+import xml.etree.ElementTree as Et
+from contextlib import contextmanager
+from .overlay import PAPER_SIZES
+from .output_profiles import UNIT_TO_MM, svg_geometry
+from .pdf_to_svg import count_svg_elements
+
+
+A4_AREA_MM2 = PAPER_SIZES["A4"][0] * PAPER_SIZES["A4"][1]
+# Rough CPU weight of drawing elements compared to one A4 page of rendering
+PATHS_PER_COST_UNIT = 10000
+# One A4 page rendered as RGBA at 300 dpi, plus the interpreter and libraries
+MB_PER_A4_AT_300_DPI = 35.0
+BASE_MEMORY_MB = 64.0
+# OSD and preview renders during upload run at about this resolution
+UPLOAD_DPI = 100
+LANES = ("light", "heavy")
+DEFAULT_SETTINGS = {
+    "HEAVY_COST": "16",
+    "LIGHT_WORKERS": "4",
+    "LIGHT_QUEUE": "32",
+    "HEAVY_WORKERS": "1",
+    "HEAVY_QUEUE": "4",
+    "MEMORY_MB": "2048",
+    "WAIT_SECONDS": "30",
+    "RETRY_AFTER": "30",
+}
+
+_condition = threading.Condition()
+_stats = {lane: {"running": 0, "waiting": 0, "admitted": 0, "rejected": 0} for lane in LANES}
+_usage = {"memory_mb": 0.0}
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a job cannot be admitted; carries the HTTP status and Retry-After to send back.
+    """
+
+    def __init__(self, message, status=503, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def setting(name):
+    """
+    Read an admission setting from the environment (ADMISSION_<name>), falling back to the default.
+    """
+    return float(os.getenv(f"ADMISSION_{name}", DEFAULT_SETTINGS[name]))
+
+
+def pdf_page_sizes(pdf_path):
+    """
+    Media box size of every page of a PDF in mm, read from the page tree without rendering anything.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [(float(page.mediabox.width) * UNIT_TO_MM["pt"], float(page.mediabox.height) * UNIT_TO_MM["pt"])
+            for page in reader.pages]
+
+
+def svg_page_size(svg_path):
+    """
+    Physical size of an SVG in mm, read from the root element only. Unreadable sizes count as A4.
+    """
+    try:
+        for _, root in Et.iterparse(svg_path, events=("start",)):
+            width_mm, height_mm, _ = svg_geometry(root)
+            return width_mm, height_mm
+    except (Et.ParseError, ValueError):
+        pass
+    return PAPER_SIZES["A4"]
+
+
+def job_cost(page_sizes, paths=0, scale_x=1.0, scale_y=1.0, dpi=UPLOAD_DPI):
+    """
+    Turn page sizes (mm) and a drawing element count into a cost estimate.
+    Cost is measured in A4-page equivalents; memory is the peak for the largest page rendered at dpi.
+    """
+    areas = [width * scale_x * height * scale_y / A4_AREA_MM2 for width, height in page_sizes] or [1.0]
+    cost = sum(areas) + paths / PATHS_PER_COST_UNIT
+    return {
+        "pages": len(page_sizes),
+        "area_a4": round(sum(areas), 2),
+        "paths": paths,
+        "cost": round(cost, 2),
+        "memory_mb": round(BASE_MEMORY_MB + max(areas) * MB_PER_A4_AT_300_DPI * (dpi / 300) ** 2, 1),
+        "lane": "heavy" if cost > setting("HEAVY_COST") else "light",
+    }
+
+
+def estimate_upload_cost(filepath, file_type):
+    """
+    Estimate the conversion and preview work for an uploaded file:
+    page count and media boxes for PDFs, page size and path count for SVGs.
+    """
+    if file_type == "pdf":
+        return job_cost(pdf_page_sizes(filepath))
+    return job_cost([svg_page_size(filepath)], count_svg_elements(filepath))
+
+
+def estimate_render_cost(job):
+    """
+    Estimate the print render recorded in a pending job (see preview.schedule_print_render).
+    """
+    profile = job["profile"]
+    dpi = profile.get("dpi", UPLOAD_DPI) if profile["mode"] == "tiled" else UPLOAD_DPI
+    if job.get("raster_pdf") and profile["mode"] == "tiled":
+        return job_cost(pdf_page_sizes(job["raster_pdf"]), 0, job["scale_x"], job["scale_y"], dpi)
+    svg_paths = [path for path in job["svg_paths"] if os.path.exists(path)]
+    paths = sum(count_svg_elements(path) for path in svg_paths)
+    return job_cost([svg_page_size(path) for path in svg_paths], paths, job["scale_x"], job["scale_y"], dpi)
+
+
+def can_start(lane, memory_mb):
+    """
+    Check the lane's worker budget and the shared memory budget. Heavy jobs also yield to waiting light jobs.
+    Must be called with _condition held.
+    """
+    if _stats[lane]["running"] >= setting(f"{lane.upper()}_WORKERS"):
+        return False
+    if lane == "heavy" and _stats["light"]["waiting"]:
+        return False
+    return _usage["memory_mb"] + memory_mb <= setting("MEMORY_MB")
+
+
+def reject(lane, message, status=503):
+    """
+    Count a rejection and raise it. Must be called with _condition held.
+    """
+    _stats[lane]["rejected"] += 1
+    raise AdmissionRejected(message, status, retry_after=int(setting("RETRY_AFTER")) if status == 503 else None)
+
+
+@contextmanager
+def admission_slot(cost):
+    """
+    Run the enclosed block once the job's lane has a free worker and its memory fits the budget.
+    Waits up to ADMISSION_WAIT_SECONDS in a bounded per-lane queue; raises AdmissionRejected
+    when the queue is full, the wait times out, or the job could never fit the memory budget.
+    """
+    lane, memory_mb = cost["lane"], cost["memory_mb"]
+    stats = _stats[lane]
+    with _condition:
+        if memory_mb > setting("MEMORY_MB"):
+            reject(lane, "This pattern is too large to process on this server.", status=413)
+        if stats["waiting"] >= setting(f"{lane.upper()}_QUEUE"):
+            reject(lane, "The server is busy, please try again shortly.")
+        deadline = time.monotonic() + setting("WAIT_SECONDS")
+        stats["waiting"] += 1
+        try:
+            while not can_start(lane, memory_mb):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    reject(lane, "The server is busy, please try again shortly.")
+                _condition.wait(remaining)
+        finally:
+            stats["waiting"] -= 1
+            # Heavy jobs may have been holding back for this one
+            _condition.notify_all()
+        stats["running"] += 1
+        stats["admitted"] += 1
+        _usage["memory_mb"] += memory_mb
+    print(f"[admission] {lane} job admitted: cost {cost['cost']}, ~{memory_mb:.0f} MB")
+    try:
+        yield
+    finally:
+        with _condition:
+            stats["running"] -= 1
+            _usage["memory_mb"] -= memory_mb
+            _condition.notify_all()
+
+
+def metrics_text():
+    """
+    Queue depth, running jobs, admission counters and memory use in the Prometheus text format.
+    """
+    lines = []
+    with _condition:
+        for name, key, kind in (("queue_depth", "waiting", "gauge"), ("running", "running", "gauge"),
+                                ("admitted_total", "admitted", "counter"),
+                                ("rejected_total", "rejected", "counter")):
+            lines.append(f"# TYPE sewing_admission_{name} {kind}")
+            lines.extend(f'sewing_admission_{name}{{lane="{lane}"}} {_stats[lane][key]}' for lane in LANES)
+        lines.append("# TYPE sewing_admission_memory_in_use_mb gauge")
+        lines.append(f"sewing_admission_memory_in_use_mb {_usage['memory_mb']:.1f}")
+    lines.append("# TYPE sewing_admission_memory_budget_mb gauge")
+    lines.append(f"sewing_admission_memory_budget_mb {setting('MEMORY_MB'):.1f}")
+    return "\n".join(lines) + "\n"
@@ -1,9 +1,8 @@
 import os
-import openai
-from dotenv import load_dotenv
+import time
+from functools import lru_cache
 
 
-load_dotenv()
 SIZE_CHART = {
     "32": {"bust": 76, "waist": 60, "hips": 84},
     "34": {"bust": 80, "waist": 64, "hips": 88},
@@ -15,7 +14,47 @@ SIZE_CHART = {
     "46": {"bust": 104, "waist": 88, "hips": 112},
     "48": {"bust": 110, "waist": 94, "hips": 118}
 }
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+
+@lru_cache(maxsize=1)
+def get_openai_client():
+    """
+    Import and configure the OpenAI client on first use, so importing this module stays cheap.
+    """
+    import openai
+
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def fake_completion(prompt):
+    """
+    Local stand-in for OpenAI, used when SEWING_AI_BACKEND=fake (tests, load tests, offline development).
+    Sleeps FAKE_AI_LATENCY seconds, then returns a canned reply in the format the prompt asks for.
+    """
+    time.sleep(float(os.getenv("FAKE_AI_LATENCY", "0.5")))
+    if "scale_x" in prompt:
+        return ("estimated_bust = 88\nestimated_waist = 72\nestimated_hips = 96\n"
+                "scale_x = 1.0\nscale_y = 1.0")
+    return "width = 140\nheight = 100\npath_logic = M 10 10 L 70 20 L 40 90 Z"
+
+
+def chat_completion(prompt, max_tokens, temperature):
+    """
+    Send a single-message prompt to gpt-4o-mini and return the reply text.
+    """
+    if os.getenv("SEWING_AI_BACKEND") == "fake":
+        return fake_completion(prompt)
+    client = get_openai_client()
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+    return response.choices[0].message.content
+
 
 def get_pattern_parameters(pattern_type, svg_summary, user_measurements, original_size=None):
     """
@@ -48,18 +87,7 @@ def get_pattern_parameters(pattern_type, svg_summary, user_measurements, origina
     scale_y = <number>
     """
 
-    client = openai.OpenAI()
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=100,
-        temperature=0.3
-    )
-
-    return response.choices[0].message.content
+    return chat_completion(prompt, max_tokens=100, temperature=0.3)
 
 
 def generate_pattern_params_bikini_top(user_measurements):
@@ -86,16 +114,7 @@ def generate_pattern_params_bikini_top(user_measurements):
     IMPORTANT:
     Respond with all 3 lines exactly as shown above. Do not skip any of them. Do not use Markdown.
     """
-    client = openai.OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.4
-    )
-    return response.choices[0].message.content
+    return chat_completion(prompt, max_tokens=150, temperature=0.4)
 
 
 def generate_pattern_params_corset(user_measurements):
@@ -126,16 +145,7 @@ def generate_pattern_params_corset(user_measurements):
     path_logic = M 10 10 C 30 30, 50 10, 70 20 ...
     Make sure path_logic is a real string of SVG path data.
     """
-    client = openai.OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.4
-    )
-    return response.choices[0].message.content
+    return chat_completion(prompt, max_tokens=150, temperature=0.4)
 
 
 def generate_pattern_params_bikini_bottom(user_measurements):
@@ -166,13 +176,4 @@ def generate_pattern_params_bikini_bottom(user_measurements):
     path_logic = M 10 10 C 30 30, 50 10, 70 20 ...
     Make sure path_logic is a real string of SVG path data.
     """
-    client = openai.OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0.4
-    )
-    return response.choices[0].message.content
+    return chat_completion(prompt, max_tokens=150, temperature=0.4)
@@ -0,0 +1,216 @@
+"""
+Shared artifact store: uploads, page SVGs, previews, scaled SVGs and print ZIPs are stored by content hash,
+so any app node can serve or reuse them. Small mutable JSON records (pattern handle metadata, print jobs)
+live next to them as named refs. Backends: a local directory (one node, or a shared mount) and any
+S3-compatible object store such as MinIO.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+from flask import current_app
+from .downloads import PRECOMPRESSED_EXTENSIONS, file_sha256, replace_with, write_precompressed
+
+
+KEY_RE = re.compile(r"^[0-9a-f]{32}(\.[a-z0-9]{1,8})?$")
+EXTENSION_ALIASES = {".jpeg": ".jpg"}
+
+
+def content_key(path):
+    """
+    Build the store key of a file: its SHA-256 prefix plus its lower-cased extension.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return file_sha256(path)[:32] + EXTENSION_ALIASES.get(ext, ext)
+
+
+def write_atomic(path, data):
+    """
+    Write bytes through a temporary file in the same directory, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    replace_with(path, lambda f: f.write(data))
+
+
+def publish(tmp_path, path):
+    """
+    Move a fully written temporary file into place as a stored object. Precompressed variants are
+    written first, so a reader that finds the object also finds complete variants no older than it.
+    """
+    if path.endswith(PRECOMPRESSED_EXTENSIONS):
+        write_precompressed(tmp_path, path)
+    os.replace(tmp_path, path)
+
+
+def link_or_copy(src, dst):
+    """
+    Hard-link src to dst when both are on the same filesystem, otherwise copy it.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class LocalStore:
+    """
+    Artifacts in a local directory: objects/<ab>/<key> and refs/<name>.json.
+    Point several nodes at the same shared mount to scale out without an object store.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def object_path(self, key):
+        return os.path.join(self.root, "objects", key[:2], key)
+
+    def ref_path(self, name):
+        return os.path.join(self.root, "refs", name + ".json")
+
+    def put_file(self, path):
+        """
+        Store a file under its content hash and return the key. Storing the same content again is free.
+        """
+        key = content_key(path)
+        target = self.object_path(key)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            try:
+                # Stream the copy: print ZIPs can be hundreds of MB
+                with os.fdopen(fd, "wb") as dst, open(path, "rb") as src:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                publish(tmp_path, target)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return key
+
+    def local_path(self, key):
+        """
+        Path of an object on this node's disk. Raises FileNotFoundError for unknown keys.
+        """
+        path = self.object_path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(key)
+        return path
+
+    def get_ref(self, name):
+        try:
+            with open(self.ref_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put_ref(self, name, data):
+        write_atomic(self.ref_path(name), json.dumps(data).encode("utf-8"))
+
+
+class S3Store:
+    """
+    Artifacts in an S3-compatible bucket under <prefix>objects/<key> and <prefix>refs/<name>.json.
+    Objects are downloaded into a node-local cache on first use; since keys are content hashes
+    the cache never needs invalidating and can be wiped at any time.
+    """
+
+    def __init__(self, bucket, cache_dir, prefix="", endpoint_url=None):
+        import boto3
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+
+    def object_name(self, key):
+        return f"{self.prefix}objects/{key}"
+
+    def ref_name(self, name):
+        return f"{self.prefix}refs/{name}.json"
+
+    def exists(self, object_name):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=object_name)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, path):
+        """
+        Upload a file under its content hash unless the bucket already has it, and return the key.
+        """
+        key = content_key(path)
+        if not self.exists(self.object_name(key)):
+            self.client.upload_file(path, self.bucket, self.object_name(key))
+        return key
+
+    def local_path(self, key):
+        """
+        Download an object into the local cache if needed and return its path.
+        Raises FileNotFoundError for unknown keys.
+        """
+        from botocore.exceptions import ClientError
+
+        path = os.path.join(self.cache_dir, key[:2], key)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.object_name(key), tmp_path)
+            publish(tmp_path, path)
+        except ClientError as e:
+            raise FileNotFoundError(key) from e
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def get_ref(self, name):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.ref_name(name))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def put_ref(self, name, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.ref_name(name), Body=json.dumps(data).encode("utf-8"),
+                               ContentType="application/json")
+
+
+def config_value(name, default=None):
+    """
+    Read a store setting from the app config, then the environment.
+    """
+    return current_app.config.get(name) or os.getenv(name) or default
+
+
+def get_store():
+    """
+    Return the app's artifact store, created on first use from ARTIFACT_STORE ("local" or "s3")
+    and the related ARTIFACT_* settings.
+    """
+    store = current_app.extensions.get("artifact_store")
+    if store is None:
+        backend = config_value("ARTIFACT_STORE", "local")
+        if backend == "s3":
+            store = S3Store(
+                config_value("ARTIFACT_S3_BUCKET"),
+                config_value("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sewing_artifacts")),
+                prefix=config_value("ARTIFACT_S3_PREFIX", ""),
+                endpoint_url=config_value("ARTIFACT_S3_ENDPOINT_URL"),
+            )
+        elif backend == "local":
+            store = LocalStore(config_value("ARTIFACT_ROOT", os.path.join(current_app.root_path, "artifacts")))
+        else:
+            raise ValueError(f"Unknown ARTIFACT_STORE backend: {backend}")
+        current_app.extensions["artifact_store"] = store
+    return store
@@ -1,11 +1,11 @@
 import sqlite3
 
-def init_db():
+def init_db(db_path="patterns.db"):
     """
     Create the database and all tables if they don't already exist.
     Run this once at the start of the project.
     """
-    conn = sqlite3.connect("patterns.db")
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     # Main upload info
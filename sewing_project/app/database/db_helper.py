@@ -1,21 +1,32 @@
 import sqlite3
 import os
+import socket
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "patterns.db")
 
-def save_upload_to_db(
-    filename, file_type, pattern_type, download_filename,
-    bust, waist, hips, torso_height, original_size,
-    scale_x, scale_y, resize_response, instructions
-):
+
+def db_path():
     """
-    Save all the data from a pattern upload to the database.
-    This includes the file info, user measurements, scale factors, and AI responses.
+    Path of the SQLite database: SEWING_DB_PATH if set (load tests, tests), otherwise patterns.db.
     """
+    return os.getenv("SEWING_DB_PATH") or DB_PATH
 
-    connection = sqlite3.connect(DB_PATH)
-    cursor = connection.cursor()
 
+def database_id():
+    """
+    Identify this node's database, so rows ids recorded by one node are never written through another node.
+    """
+    return f"{socket.gethostname()}:{db_path()}"
+
+def insert_upload(
+    cursor, filename, file_type, pattern_type, download_filename,
+    bust, waist, hips, torso_height, original_size,
+    scale_x, scale_y, resize_response, instructions, source="ai"
+):
+    """
+    Insert one upload with its measurements, scale factors and AI responses using an open cursor.
+    Returns the new upload id.
+    """
     # Insert uploads
     cursor.execute("""
         INSERT INTO uploads (filename, file_type, pattern_type, download_filename)
@@ -33,18 +44,85 @@ def save_upload_to_db(
     cursor.execute("""
         INSERT INTO scaling (upload_id, scale_x, scale_y, source)
         VALUES (?, ?, ?, ?)
-    """, (upload_id, scale_x, scale_y, "ai"))
+    """, (upload_id, scale_x, scale_y, source))
 
     # AI responses
     cursor.execute("""
         INSERT INTO ai_responses (upload_id, type, content)
         VALUES (?, ?, ?)
     """, (upload_id, "resize", resize_response))
-    cursor.execute("""
-        INSERT INTO ai_responses (upload_id, type, content)
-        VALUES (?, ?, ?)
-    """, (upload_id, "instructions", instructions))
+    # Streamed instructions are saved separately once generation finishes
+    if instructions is not None:
+        cursor.execute("""
+            INSERT INTO ai_responses (upload_id, type, content)
+            VALUES (?, ?, ?)
+        """, (upload_id, "instructions", instructions))
+    return upload_id
+
 
+def save_upload_to_db(
+    filename, file_type, pattern_type, download_filename,
+    bust, waist, hips, torso_height, original_size,
+    scale_x, scale_y, resize_response, instructions, source="ai"
+):
+    """
+    Save all the data from a pattern upload to the database.
+    This includes the file info, user measurements, scale factors, and AI responses.
+    """
+
+    connection = sqlite3.connect(db_path())
+    cursor = connection.cursor()
+    upload_id = insert_upload(
+        cursor, filename, file_type, pattern_type, download_filename,
+        bust, waist, hips, torso_height, original_size,
+        scale_x, scale_y, resize_response, instructions, source
+    )
     connection.commit()
     connection.close()
-    return upload_id
\ No newline at end of file
+    return upload_id
+
+
+def save_uploads_to_db(rows):
+    """
+    Save many uploads in a single transaction.
+    Each row is a dict of save_upload_to_db's keyword arguments. Returns the new upload ids.
+    """
+    connection = sqlite3.connect(db_path())
+    try:
+        cursor = connection.cursor()
+        upload_ids = [insert_upload(cursor, **row) for row in rows]
+        connection.commit()
+    finally:
+        connection.close()
+    return upload_ids
+
+
+def save_instructions_to_db(upload_id, instructions):
+    """
+    Save the sewing instructions for an upload once they have been fully generated.
+    """
+    connection = sqlite3.connect(db_path())
+    try:
+        connection.execute("""
+            INSERT INTO ai_responses (upload_id, type, content)
+            VALUES (?, ?, ?)
+        """, (upload_id, "instructions", instructions))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def get_instructions_from_db(upload_id):
+    """
+    Return the saved sewing instructions for an upload, or None if they have not been generated yet.
+    """
+    connection = sqlite3.connect(db_path())
+    try:
+        row = connection.execute("""
+            SELECT content FROM ai_responses
+            WHERE upload_id = ? AND type = 'instructions'
+            ORDER BY id DESC LIMIT 1
+        """, (upload_id,)).fetchone()
+    finally:
+        connection.close()
+    return row[0] if row else None
@@ -0,0 +1,154 @@
+"""
+Download serving for generated artifacts: content-hash ETags, conditional GET and byte-range resume,
+precompressed SVG variants, and optional hand-off to a front server (X-Sendfile / X-Accel-Redirect).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from flask import Response, abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+PRECOMPRESSED_EXTENSIONS = (".svg",)
+# Preferred order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Most recently used ETags kept per process; older ones are hashed again when next requested
+ETAG_CACHE_SIZE = 1024
+
+_etag_cache = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """
+    Return the hex SHA-256 of a file's content, read in 1 MB chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_etag(path):
+    """
+    Return a content-hash ETag for a file, cached by path, size and modification time
+    in a least-recently-used cache of ETAG_CACHE_SIZE entries.
+    """
+    stat = os.stat(path)
+    cache_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _etag_lock:
+        etag = _etag_cache.get(cache_key)
+        if etag:
+            _etag_cache.move_to_end(cache_key)
+            return etag
+    etag = file_sha256(path)[:32]
+    with _etag_lock:
+        _etag_cache[cache_key] = etag
+        _etag_cache.move_to_end(cache_key)
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+def replace_with(path, write):
+    """
+    Create path through a temporary file in the same directory: write(f) fills the file, which is then
+    renamed into place, so readers never see it half-written.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_precompressed(source_path, path=None):
+    """
+    Store gzip (and brotli, when the optional brotli package is installed) variants of source_path
+    next to path (default: source_path). Each variant appears atomically.
+    """
+    path = path or source_path
+
+    def write_gzip(f):
+        with open(source_path, "rb") as src, gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+            shutil.copyfileobj(src, gz)
+
+    replace_with(path + ".gz", write_gzip)
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(source_path, "rb") as src:
+        data = src.read()
+    replace_with(path + ".br", lambda f: f.write(brotli.compress(data)))
+
+
+def pick_variant(path):
+    """
+    Choose a precompressed variant the client accepts and that is not older than the original.
+    Returns (variant_path, content_encoding), or (path, None) for the original.
+    """
+    if not path.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+        return path, None
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        variant = path + suffix
+        if (accepted[encoding] and os.path.exists(variant)
+                and os.path.getmtime(variant) >= os.path.getmtime(path)):
+            return variant, encoding
+    return path, None
+
+
+def send_artifact(directory, filename, as_attachment=True, download_name=None, immutable=False):
+    """
+    Serve a generated file with a content-hash ETag, conditional GET and Range support.
+    Artifacts addressed by content hash (immutable=True) get immutable cache headers; others must revalidate.
+    With X_ACCEL_REDIRECT_PREFIX configured the body is left to the front server;
+    Flask's USE_X_SENDFILE setting is honoured by send_file.
+    """
+    path = safe_join(directory, filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+    download_name = download_name or filename
+    etag = file_etag(path)
+    served_path, encoding = pick_variant(path)
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    accel_prefix = current_app.config.get("X_ACCEL_REDIRECT_PREFIX")
+    if accel_prefix:
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            relative = os.path.relpath(served_path, current_app.config.get("X_ACCEL_REDIRECT_ROOT",
+                                                                           current_app.root_path))
+            response = Response(mimetype=mimetype)
+            response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{relative}"
+            if as_attachment:
+                response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+        response.set_etag(etag)
+    else:
+        response = send_file(served_path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             etag=etag, conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    return response
@@ -0,0 +1,183 @@
+"""
+Deterministic parametric drafting: turns body measurements into pattern piece geometry using formulas
+and the size chart, without any AI round-trip. All lengths are in centimetres; the SVG is drawn in millimetres.
+"""
+from .ai_calls import SIZE_CHART
+
+
+# Negative ease: swimwear is cut smaller than the body for stretch, corsets for waist reduction
+EASE_CM = {
+    "bikini_top": {"bust": -4.0},
+    "bikini_bottom": {"waist": -4.0, "hips": -6.0},
+    "corset": {"bust": -2.0, "waist": -6.0, "hips": -2.0},
+}
+REQUIRED_MEASUREMENTS = {
+    "bikini_top": ("bust",),
+    "bikini_bottom": ("waist", "hips"),
+    "corset": ("bust", "waist", "hips"),
+}
+# Share of the waist reduction taken by each corset panel, centre front to centre back
+CORSET_WAIST_WEIGHTS = (0.6, 0.9, 1.25, 1.25, 1.1, 0.9)
+PIECE_GAP_CM = 3.0
+SEAM_ALLOWANCE_CM = 1.0
+# Body measurements outside this range are typos or the wrong unit and would draft degenerate pieces
+MIN_MEASUREMENT_CM = 40.0
+MAX_MEASUREMENT_CM = 200.0
+
+
+def check_measurements(bust=None, waist=None, hips=None):
+    """
+    Raise ValueError unless every given measurement is a finite number between
+    MIN_MEASUREMENT_CM and MAX_MEASUREMENT_CM centimetres. Missing (None) measurements are fine.
+    """
+    for name, value in (("bust", bust), ("waist", waist), ("hips", hips)):
+        # NaN fails both comparisons, infinities fail one
+        if value is not None and not MIN_MEASUREMENT_CM <= value <= MAX_MEASUREMENT_CM:
+            raise ValueError(f"{name.capitalize()} must be between {MIN_MEASUREMENT_CM:g} and "
+                             f"{MAX_MEASUREMENT_CM:g} cm")
+
+
+def nearest_size(bust=None, waist=None, hips=None):
+    """
+    Return the size chart entry closest to the given measurements.
+    """
+    given = {k: v for k, v in (("bust", bust), ("waist", waist), ("hips", hips)) if v}
+    if not given:
+        raise ValueError("At least one measurement is required")
+    return min(SIZE_CHART.values(), key=lambda row: sum((row[k] - v) ** 2 for k, v in given.items()))
+
+
+def complete_measurements(bust=None, waist=None, hips=None):
+    """
+    Fill in missing measurements from the nearest size, shifted by how far the given ones differ from it.
+    """
+    size = nearest_size(bust, waist, hips)
+    given = {k: v for k, v in (("bust", bust), ("waist", waist), ("hips", hips)) if v}
+    offset = sum(v - size[k] for k, v in given.items()) / len(given)
+    return {k: given.get(k, size[k] + offset) for k in ("bust", "waist", "hips")}
+
+
+def with_ease(pattern_type, measurements):
+    """
+    Apply the pattern type's ease to the body measurements.
+    """
+    ease = EASE_CM[pattern_type]
+    return {k: v + ease.get(k, 0.0) for k, v in measurements.items()}
+
+
+def draft_bikini_top(m):
+    """
+    Draft a triangle cup with curved sides, sized from the bust (cut twice).
+    Returns a list of (name, path_data, width, height) in cm, with each path starting at its own origin.
+    """
+    base = m["bust"] / 4
+    height = m["bust"] * 0.2
+    curve = base * 0.08
+    cup = (
+        f"M 0 {height:.2f} "
+        f"Q {base * 0.25 - curve:.2f} {height * 0.5:.2f} {base * 0.5:.2f} 0 "
+        f"Q {base * 0.75 + curve:.2f} {height * 0.5:.2f} {base:.2f} {height:.2f} "
+        f"Q {base * 0.5:.2f} {height + curve:.2f} 0 {height:.2f} Z"
+    )
+    return [("Cup (cut 2)", cup, base, height + curve)]
+
+
+def draft_bikini_bottom(m):
+    """
+    Draft the front and back panels from waist and hips, with a fixed crotch width.
+    """
+    pieces = []
+    for name, top_width, rise, crotch in (
+        ("Front (cut 1 on fold)", m["hips"] * 0.22, m["hips"] * 0.24, 7.0),
+        ("Back (cut 1 on fold)", m["hips"] * 0.28, m["hips"] * 0.28, 9.0),
+    ):
+        # The waistline can never be narrower than the waist allows across the two panels
+        top_width = max(top_width, m["waist"] * 0.25)
+        left = (top_width - crotch) / 2
+        right = left + crotch
+        path = (
+            f"M 0 0 L {top_width:.2f} 0 "
+            f"C {top_width:.2f} {rise * 0.45:.2f}, {right:.2f} {rise * 0.7:.2f}, {right:.2f} {rise:.2f} "
+            f"L {left:.2f} {rise:.2f} "
+            f"C {left:.2f} {rise * 0.7:.2f}, 0 {rise * 0.45:.2f}, 0 0 Z"
+        )
+        pieces.append((name, path, top_width, rise))
+    return pieces
+
+
+def draft_corset(m, weights=CORSET_WAIST_WEIGHTS):
+    """
+    Draft one half of a panelled corset: each panel tapers from bust to waist and flares to the hips.
+    The waist reduction is spread over the panels by weight; panel heights scale with the hip measurement.
+    """
+    panels = len(weights)
+    bust_w = m["bust"] / 2 / panels
+    hips_w = m["hips"] / 2 / panels
+    reduction = (bust_w + hips_w) / 2 - m["waist"] / 2 / panels
+    mean_weight = sum(weights) / panels
+    scale = m["hips"] / 100
+    bust_to_waist = 18.0 * scale
+    waist_to_hip = 16.0 * scale
+    height = bust_to_waist + waist_to_hip
+    widest = max(bust_w, hips_w)
+    pieces = []
+    for i, weight in enumerate(weights):
+        waist_w = (bust_w + hips_w) / 2 - reduction * weight / mean_weight
+        cx = widest / 2
+        bl, br = cx - bust_w / 2, cx + bust_w / 2
+        wl, wr = cx - waist_w / 2, cx + waist_w / 2
+        hl, hr = cx - hips_w / 2, cx + hips_w / 2
+        y_w = bust_to_waist
+        path = (
+            f"M {bl:.2f} 0 L {br:.2f} 0 "
+            f"C {br:.2f} {y_w * 0.5:.2f}, {wr:.2f} {y_w * 0.7:.2f}, {wr:.2f} {y_w:.2f} "
+            f"C {wr:.2f} {y_w + waist_to_hip * 0.3:.2f}, {hr:.2f} {y_w + waist_to_hip * 0.5:.2f}, {hr:.2f} {height:.2f} "
+            f"L {hl:.2f} {height:.2f} "
+            f"C {hl:.2f} {y_w + waist_to_hip * 0.5:.2f}, {wl:.2f} {y_w + waist_to_hip * 0.3:.2f}, {wl:.2f} {y_w:.2f} "
+            f"C {wl:.2f} {y_w * 0.7:.2f}, {bl:.2f} {y_w * 0.5:.2f}, {bl:.2f} 0 Z"
+        )
+        pieces.append((f"Panel {i + 1} (cut 2)", path, widest, height))
+    return pieces
+
+
+DRAFTERS = {
+    "bikini_top": draft_bikini_top,
+    "bikini_bottom": draft_bikini_bottom,
+    "corset": draft_corset,
+}
+
+
+def layout_pieces_svg(pieces):
+    """
+    Lay the drafted pieces out side by side and return the SVG string, drawn in millimetres.
+    """
+    import svgwrite
+
+    margin = PIECE_GAP_CM
+    total_w = margin + sum(w + margin for _, _, w, _ in pieces)
+    total_h = margin * 2 + max(h for _, _, _, h in pieces) + 2.0
+    svg = svgwrite.Drawing(size=(f"{total_w * 10:.1f}mm", f"{total_h * 10:.1f}mm"),
+                           viewBox=f"0 0 {total_w * 10:.1f} {total_h * 10:.1f}")
+    x = margin
+    for name, path, width, height in pieces:
+        group = svg.g(transform=f"translate({x * 10:.1f},{(margin + 2.0) * 10:.1f}) scale(10)")
+        group.add(svg.path(d=path, fill="none", stroke="black", stroke_width=0.05))
+        group.add(svg.text(name, insert=(0, -0.8), font_size=0.8, font_family="sans-serif"))
+        svg.add(group)
+        x += width + margin
+    svg.add(svg.text(f"Seam allowance: add {SEAM_ALLOWANCE_CM:g} cm", insert=(margin * 10, margin * 10),
+                     font_size=6, font_family="sans-serif"))
+    return svg.tostring()
+
+
+def draft_pattern(pattern_type, bust=None, waist=None, hips=None):
+    """
+    Draft a pattern locally from measurements and return the SVG string.
+    Missing measurements are filled in from the size chart.
+    Raises ValueError for unknown pattern types, out-of-range measurements or when no measurement is given.
+    """
+    if pattern_type not in DRAFTERS:
+        raise ValueError(f"No drafting rules for pattern type: {pattern_type}")
+    check_measurements(bust, waist, hips)
+    measurements = with_ease(pattern_type, complete_measurements(bust, waist, hips))
+    return layout_pieces_svg(DRAFTERS[pattern_type](measurements))
@@ -1,13 +1,22 @@
-import google.generativeai as genai
 import os
+import time
+from functools import lru_cache
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-def get_sewing_instructions(pattern_type, measurements_summary):
+@lru_cache(maxsize=1)
+def get_gemini_model():
     """
-    Ask Gemini to write simple sewing instructions for the resized pattern.
-    Based on the user's measurements and the selected pattern type.
-    Returns the response
+    Import and configure Gemini on first use, so importing this module stays cheap.
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+
+def build_instructions_prompt(pattern_type, measurements_summary):
+    """
+    Build the Gemini prompt for beginner-friendly sewing instructions.
     """
     prompt = f"""
 You are a sewing assistant helping users assemble sewing patterns.
@@ -25,8 +34,45 @@ Your task:
 - If important measurements are missing, still create simple instructions.
 - Mention a 3cm line has been created for dimension guidance
     """
+    return prompt
 
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    response = model.generate_content(prompt)
 
-    return response.text.strip()
\ No newline at end of file
+def fake_instruction_chunks(pattern_type, measurements_summary, delay=None):
+    """
+    Local stand-in for Gemini streaming, used when SEWING_AI_BACKEND=fake (tests, offline development).
+    Yields canned instructions word by word, sleeping FAKE_AI_TOKEN_DELAY seconds between chunks.
+    """
+    if delay is None:
+        delay = float(os.getenv("FAKE_AI_TOKEN_DELAY", "0.02"))
+    text = (
+        "1. Print the pattern and check the 3cm line measures exactly 3 cm.\n"
+        f"2. Cut the {pattern_type} pieces from your fabric, adding a 1 cm seam allowance.\n"
+        "3. Pin the pieces right sides together, matching notches.\n"
+        "4. Sew the seams and finish the edges.\n"
+        f"5. Try it on ({measurements_summary or 'no measurements given'}) and adjust the fit."
+    )
+    for word in text.split(" "):
+        time.sleep(delay)
+        yield word + " "
+
+
+def stream_sewing_instructions(pattern_type, measurements_summary):
+    """
+    Ask Gemini for sewing instructions and yield the text chunks as they arrive.
+    """
+    if os.getenv("SEWING_AI_BACKEND") == "fake":
+        yield from fake_instruction_chunks(pattern_type, measurements_summary)
+        return
+    prompt = build_instructions_prompt(pattern_type, measurements_summary)
+    for chunk in get_gemini_model().generate_content(prompt, stream=True):
+        if chunk.text:
+            yield chunk.text
+
+
+def get_sewing_instructions(pattern_type, measurements_summary):
+    """
+    Ask Gemini to write simple sewing instructions for the resized pattern.
+    Based on the user's measurements and the selected pattern type.
+    Returns the response
+    """
+    return "".join(stream_sewing_instructions(pattern_type, measurements_summary)).strip()
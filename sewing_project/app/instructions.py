@@ -0,0 +1,91 @@
+"""
+Background generation of sewing instructions: each job is generated once per node, in a thread that does
+not depend on the browser staying connected, and any number of SSE readers follow it as it grows.
+"""
+import threading
+
+
+_generations = {}
+_lock = threading.Lock()
+
+
+class InstructionGeneration(threading.Thread):
+    """
+    Generates one job's instructions from generate() and keeps every chunk produced so far.
+    on_done(text) runs in the thread once the text is complete; readers use follow().
+    """
+
+    def __init__(self, job_id, generate, on_done):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.generate = generate
+        self.on_done = on_done
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    @classmethod
+    def completed(cls, job_id, text):
+        """
+        A generation that has already finished with the given text.
+        """
+        generation = cls(job_id, None, None)
+        generation.chunks.append(text)
+        generation.finished = True
+        return generation
+
+    def run(self):
+        try:
+            for chunk in self.generate():
+                with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+            self.on_done("".join(self.chunks).strip())
+        except Exception as e:
+            print(f"Error generating instructions for job {self.job_id}: {e}")
+            self.error = e
+        finally:
+            # Only now, after on_done has stored the text, may a new reader start the job again
+            with _lock:
+                _generations.pop(self.job_id, None)
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def follow(self):
+        """
+        Yield the chunks generated so far, then each new chunk as it arrives, until generation ends.
+        Raises RuntimeError after the last chunk if generation failed.
+        """
+        sent = 0
+        while True:
+            with self.condition:
+                while sent == len(self.chunks) and not self.finished:
+                    self.condition.wait()
+                new_chunks = self.chunks[sent:]
+                finished = self.finished
+            yield from new_chunks
+            sent += len(new_chunks)
+            if finished and sent == len(self.chunks):
+                break
+        if self.error is not None:
+            raise RuntimeError(f"Instructions for job {self.job_id} could not be generated") from self.error
+
+
+def start_generation(job_id, generate, on_done, stored_text):
+    """
+    Return this node's generation of a job, starting it if none is running.
+    stored_text() returns the job's saved instructions or None; it is checked under the registry lock,
+    so a generation that finished since the caller last looked is replayed instead of run again.
+    """
+    with _lock:
+        generation = _generations.get(job_id)
+        if generation is None:
+            text = stored_text()
+            if text is not None:
+                return InstructionGeneration.completed(job_id, text)
+            generation = InstructionGeneration(job_id, generate, on_done)
+            _generations[job_id] = generation
+            generation.start()
+    return generation
@@ -0,0 +1,479 @@
+"""
+Piece nesting: find the individual pattern pieces on the scaled pages and pack them onto as few sheets as possible,
+so tiled and plotter output stop printing (and rendering) the empty space between pieces.
+"""
+import copy
+import math
+import os
+import re
+import xml.etree.ElementTree as Et
+from .overlay import PAPER_SIZES, page_size_px
+from .pattern_generator import strip_svg_namespace
+from .resize import tile_image
+from .output_profiles import SVG_NS, svg_geometry, write_vector_pages
+
+
+PIECE_GAP_MM = 5.0
+# Closed shapes smaller than this are notches, dots and symbols rather than pieces
+MIN_PIECE_AREA_MM2 = 400.0
+# A closed shape covering nearly the whole page is a page frame, not a piece
+PAGE_FRAME_RATIO = 0.95
+# Notches, labels and grainline ends may reach this far past the cutting line and still belong to the piece
+PIECE_MARGIN_MM = 6.0
+# Points on or this close to an outline count as inside it, so darts and seam lines touching it nest
+OUTLINE_TOLERANCE_MM = 1.0
+# Outline sampling step; the clip margin is built from one ellipse per sample, so keep it well below the margin
+OUTLINE_STEP_MM = PIECE_MARGIN_MM / 2
+OUTLINE_WIDTH_MM = 0.4
+EXTRA_TILE_COLUMNS = 3
+URL_REF_RE = re.compile(r"url\(#([^)]+)\)")
+NUMBER_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+# Containers whose content is only drawn through a reference, never where it stands
+UNRENDERED_TAGS = ("defs", "symbol", "clipPath", "mask", "pattern", "marker")
+DEFAULT_FONT_SIZE = 16.0
+# Rough advance of one character relative to the font size, to estimate how far a <text> reaches
+CHAR_WIDTH_RATIO = 0.6
+
+
+def bbox_contains(outer, inner):
+    """
+    Check whether bounding box inner (xmin, ymin, xmax, ymax) lies inside outer.
+    """
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def sample_points(subpath, mm_x, mm_y, step_mm=None):
+    """
+    Points along a subpath in page units: segment ends, plus points every step_mm along curves
+    (and along straight lines too when step_mm is given).
+    """
+    points = []
+    for segment in subpath:
+        is_line = type(segment).__name__ == "Line"
+        if step_mm is None:
+            count = 1 if is_line else 4
+        else:
+            length_mm = segment.length() * max(mm_x, mm_y)
+            count = max(1, math.ceil(length_mm / step_mm))
+        points.extend(segment.point(i / count) for i in range(count))
+    points.append(subpath[-1].end)
+    return [(p.real, p.imag) for p in points]
+
+
+def point_in_polygon(x, y, polygon):
+    """
+    Even-odd ray casting test of (x, y) against a closed polygon of (x, y) points.
+    """
+    inside = False
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def distance_to_polygon(x, y, polygon):
+    """
+    Shortest distance from (x, y) to the edges of a closed polygon.
+    """
+    best = math.inf
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        t = 0.0 if not length2 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length2))
+        best = min(best, math.hypot(x - x1 - t * dx, y - y1 - t * dy))
+        x1, y1 = x2, y2
+    return best
+
+
+def within_piece(points, piece, margin_mm):
+    """
+    Check whether all points (page units) lie inside a piece's outline or within margin_mm of it.
+    """
+    mm_x, mm_y = piece["mm_per_unit"]
+    xmin, ymin, xmax, ymax = piece["outline_bbox"]
+    pad_x, pad_y = margin_mm / mm_x, margin_mm / mm_y
+    polygon = piece["polygon_mm"]
+    for x, y in points:
+        if not (xmin - pad_x <= x <= xmax + pad_x and ymin - pad_y <= y <= ymax + pad_y):
+            return False
+        x_mm, y_mm = x * mm_x, y * mm_y
+        if not point_in_polygon(x_mm, y_mm, polygon) and distance_to_polygon(x_mm, y_mm, polygon) > margin_mm:
+            return False
+    return True
+
+
+def local_name(elem):
+    return elem.tag.rsplit("}", 1)[-1]
+
+
+def first_number(value, default=0.0):
+    """
+    First number of an attribute such as x="10 12 14" (text positions may list one per character).
+    """
+    match = NUMBER_RE.search(value or "")
+    return float(match.group()) if match else default
+
+
+def font_size(elem):
+    """
+    Font size of a <text> element in user units, from its style or attribute.
+    """
+    style = dict(part.split(":", 1) for part in elem.get("style", "").replace(" ", "").split(";") if ":" in part)
+    return first_number(style.get("font-size") or elem.get("font-size"), DEFAULT_FONT_SIZE)
+
+
+def local_corners(elem, ids):
+    """
+    Corners of what a <text>, <use> or <image> element draws, in its own user units, or None for other elements.
+    Glyph <use> elements get the bounding box of the paths they reference; a <use> of anything else
+    only gives its anchor point.
+    """
+    from svgpathtools import parse_path
+    from svgpathtools.parser import parse_transform
+
+    tag = local_name(elem)
+    x, y = first_number(elem.get("x")), first_number(elem.get("y"))
+    if tag == "image":
+        w, h = first_number(elem.get("width")), first_number(elem.get("height"))
+        return [(x, y), (x + w, y), (x, y + h), (x + w, y + h)]
+    if tag == "text":
+        size = font_size(elem)
+        w = CHAR_WIDTH_RATIO * size * len("".join(elem.itertext()).strip())
+        return [(x, y - size), (x + w, y - size), (x, y), (x + w, y)]
+    if tag != "use":
+        return None
+    href = next((value for name, value in elem.attrib.items() if name.rsplit("}", 1)[-1] == "href"), "")
+    target = ids.get(href.lstrip("#"))
+    corners = []
+    for path in ([] if target is None else target.iter()):
+        if local_name(path) != "path" or not path.get("d", "").strip():
+            continue
+        xmin, xmax, ymin, ymax = parse_path(path.get("d")).bbox()
+        matrix = parse_transform(path.get("transform"))
+        for px, py in ((xmin, ymin), (xmax, ymin), (xmin, ymax), (xmax, ymax)):
+            corners.append((matrix[0][0] * px + matrix[0][1] * py + matrix[0][2] + x,
+                            matrix[1][0] * px + matrix[1][1] * py + matrix[1][2] + y))
+    return corners or [(x, y)]
+
+
+def drawn_elements(root):
+    """
+    Corner points (page units) of every <text>, <use> and <image> drawn on a page. svgpathtools only
+    returns paths, so labels, glyphs and embedded rasters are collected here to check they nest too.
+    """
+    from svgpathtools.parser import parse_transform
+
+    ids = {elem.get("id"): elem for elem in root.iter() if elem.get("id")}
+    found = []
+
+    def walk(elem, matrix):
+        for child in elem:
+            if local_name(child) in UNRENDERED_TAGS:
+                continue
+            child_matrix = matrix.dot(parse_transform(child.get("transform")))
+            corners = local_corners(child, ids)
+            if corners is None:
+                walk(child, child_matrix)
+                continue
+            found.append([(child_matrix[0][0] * cx + child_matrix[0][1] * cy + child_matrix[0][2],
+                           child_matrix[1][0] * cx + child_matrix[1][1] * cy + child_matrix[1][2])
+                          for cx, cy in corners])
+
+    walk(root, parse_transform(None))
+    return found
+
+
+def extract_pieces(svg_path, scale_x=1.0, scale_y=1.0, page=0):
+    """
+    Find the pattern pieces on one page: closed outlines that do not lie inside a larger outline.
+    Everything drawn inside an outline or within PIECE_MARGIN_MM of it (grainlines, darts, notches, labels)
+    travels with its piece.
+    Returns (pieces, stray) where each piece dict has the outline, its bounding box (including the margin)
+    in page units and its scaled size in mm, and stray counts the drawn paths, text, glyphs and images
+    that belong to no piece, such as open outlines, outlines cut off at the page edge or labels between pieces.
+    """
+    from svgpathtools import Document
+
+    root = Et.parse(svg_path).getroot()
+    width_mm, height_mm, (_, _, vw, vh) = svg_geometry(root)
+    mm_x = scale_x * width_mm / vw
+    mm_y = scale_y * height_mm / vh
+    pad_x, pad_y = PIECE_MARGIN_MM / mm_x, PIECE_MARGIN_MM / mm_y
+    candidates = []
+    drawn = []
+    for path in Document(svg_path).paths():
+        for subpath in path.continuous_subpaths():
+            if len(subpath) == 0:
+                continue
+            xmin, xmax, ymin, ymax = subpath.bbox()
+            if xmax - xmin >= vw * PAGE_FRAME_RATIO and ymax - ymin >= vh * PAGE_FRAME_RATIO:
+                continue
+            drawn.append(subpath)
+            if not subpath.isclosed() or (xmax - xmin) * mm_x * (ymax - ymin) * mm_y < MIN_PIECE_AREA_MM2:
+                continue
+            outline = sample_points(subpath, mm_x, mm_y, OUTLINE_STEP_MM)
+            candidates.append({
+                "page": page,
+                "outline": subpath.d(),
+                "outline_points": outline,
+                "polygon_mm": [(x * mm_x, y * mm_y) for x, y in outline],
+                "outline_bbox": (xmin, ymin, xmax, ymax),
+                "bbox": (xmin - pad_x, ymin - pad_y, xmax + pad_x, ymax + pad_y),
+                "mm_per_unit": (mm_x, mm_y),
+                "width_mm": (xmax - xmin) * mm_x + 2 * PIECE_MARGIN_MM,
+                "height_mm": (ymax - ymin) * mm_y + 2 * PIECE_MARGIN_MM,
+            })
+    candidates.sort(key=lambda piece: piece["width_mm"] * piece["height_mm"], reverse=True)
+    pieces = []
+    for candidate in candidates:
+        if not any(bbox_contains(piece["outline_bbox"], candidate["outline_bbox"])
+                   and within_piece(candidate["outline_points"], piece, OUTLINE_TOLERANCE_MM) for piece in pieces):
+            pieces.append(candidate)
+    drawn_points = [sample_points(subpath, mm_x, mm_y) for subpath in drawn] + drawn_elements(root)
+    stray = sum(1 for points in drawn_points
+                if not any(within_piece(points, piece, PIECE_MARGIN_MM) for piece in pieces))
+    return pieces, stray
+
+
+def orient(piece, bin_w, gap, allow_rotation):
+    """
+    Pick the footprint (w, h, rotated) of a piece: lying flat when it fits the bin width,
+    standing up when only that fits, so shelves stay low.
+    """
+    w, h = piece["width_mm"] + gap, piece["height_mm"] + gap
+    if not allow_rotation:
+        return w, h, False
+    if h > w and h <= bin_w:
+        return h, w, True
+    if w > bin_w and h <= bin_w:
+        return h, w, True
+    return w, h, False
+
+
+def pack_pieces(pieces, bin_w, bin_h=None, gap=PIECE_GAP_MM, allow_rotation=True):
+    """
+    Shelf packing (first fit, decreasing height) of pieces onto bins of bin_w x bin_h mm.
+    With bin_h None there is a single strip that grows downwards (roll or tiled output).
+    Pieces too large for a bin get a bin of their own, which is later split into pages.
+    Returns a list of sheets: {"width", "height", "placements"}; each placement gives the
+    drawn top-left corner (x, y), size and rotation of a piece in mm.
+    """
+    items = sorted(((piece,) + orient(piece, bin_w, gap, allow_rotation) for piece in pieces),
+                   key=lambda item: item[2], reverse=True)
+    sheets = []
+    for piece, w, h, rotated in items:
+        if w > bin_w or (bin_h and h > bin_h):
+            sheet = {"width": w, "height": h, "placements": [], "shelves": [[0.0, h, w]]}
+            sheets.append(sheet)
+            x, y = 0.0, 0.0
+        else:
+            x = y = sheet = None
+            for candidate in sheets:
+                for shelf in candidate["shelves"]:
+                    shelf_y, shelf_h, shelf_x = shelf
+                    if shelf_x + w <= bin_w and h <= shelf_h:
+                        sheet, x, y = candidate, shelf_x, shelf_y
+                        shelf[2] += w
+                        break
+                if sheet:
+                    break
+            if sheet is None:
+                for candidate in sheets:
+                    used = sum(shelf[1] for shelf in candidate["shelves"])
+                    if candidate["width"] == bin_w and (bin_h is None or used + h <= bin_h):
+                        sheet, x, y = candidate, 0.0, used
+                        break
+                if sheet is None:
+                    sheet = {"width": bin_w, "height": bin_h or 0.0, "placements": [], "shelves": []}
+                    sheets.append(sheet)
+                    x, y = 0.0, 0.0
+                sheet["shelves"].append([y, h, w])
+        drawn_w, drawn_h = (piece["height_mm"], piece["width_mm"]) if rotated else (piece["width_mm"],
+                                                                                     piece["height_mm"])
+        sheet["placements"].append({"piece": piece, "x": x + gap / 2, "y": y + gap / 2,
+                                    "width": drawn_w, "height": drawn_h, "rotated": rotated})
+        if bin_h is None:
+            sheet["height"] = max(sheet["height"], y + h)
+    for sheet in sheets:
+        del sheet["shelves"]
+    return sheets
+
+
+def covered_tiles(sheet, tile_w, tile_h):
+    """
+    Return the set of (row, col) tiles that some placed piece overlaps.
+    """
+    tiles = set()
+    for p in sheet["placements"]:
+        for row in range(int(p["y"] // tile_h), int(math.ceil((p["y"] + p["height"]) / tile_h))):
+            for col in range(int(p["x"] // tile_w), int(math.ceil((p["x"] + p["width"]) / tile_w))):
+                tiles.add((row, col))
+    return tiles
+
+
+def pack_for_tiles(pieces, paper, gap=PIECE_GAP_MM, allow_rotation=True):
+    """
+    Pack pieces onto a strip a whole number of tiles wide, trying a few widths
+    and keeping the one that needs the fewest printed tiles.
+    """
+    tile_w, tile_h = PAPER_SIZES[paper]
+    narrowest = max((min(p["width_mm"], p["height_mm"]) if allow_rotation else p["width_mm"]) + gap
+                    for p in pieces)
+    first = max(1, math.ceil(narrowest / tile_w))
+    best = None
+    for cols in range(first, first + EXTRA_TILE_COLUMNS + 1):
+        sheet = pack_pieces(pieces, cols * tile_w, None, gap, allow_rotation)[0]
+        tiles = len(covered_tiles(sheet, tile_w, tile_h))
+        if best is None or tiles < best[0]:
+            best = (tiles, sheet)
+    return best[1]
+
+
+def prefix_ids(elem, prefix):
+    """
+    Prefix every id under elem and the references to them, so several pages can share one document.
+    """
+    for el in elem.iter():
+        for name, value in list(el.attrib.items()):
+            if name == "id":
+                el.set(name, prefix + value)
+            elif "url(#" in value:
+                el.set(name, URL_REF_RE.sub(lambda m: f"url(#{prefix}{m.group(1)})", value))
+            elif name.rsplit("}", 1)[-1] == "href" and value.startswith("#"):
+                el.set(name, "#" + prefix + value[1:])
+
+
+def placement_transform(placement):
+    """
+    Map a piece from page units to its place on the sheet (in mm), turning it a quarter clockwise if rotated.
+    """
+    piece = placement["piece"]
+    mm_x, mm_y = piece["mm_per_unit"]
+    xmin, ymin = piece["bbox"][:2]
+    inner = f"scale({mm_x:.6f},{mm_y:.6f}) translate({-xmin:.3f},{-ymin:.3f})"
+    if placement["rotated"]:
+        return f"translate({placement['x'] + placement['width']:.3f},{placement['y']:.3f}) rotate(90) {inner}"
+    return f"translate({placement['x']:.3f},{placement['y']:.3f}) {inner}"
+
+
+def build_sheet_svg(sheet, svg_paths):
+    """
+    Build the SVG root of a packed sheet in mm. Each page used is embedded once;
+    every piece shows that page clipped to its outline widened by PIECE_MARGIN_MM, so notches and labels
+    on the cutting line survive, with the outline redrawn on top.
+    """
+    width, height = sheet["width"], sheet["height"]
+    root = Et.Element("svg", {"xmlns": SVG_NS, "width": f"{width:.3f}mm", "height": f"{height:.3f}mm",
+                              "viewBox": f"0 0 {width:.3f} {height:.3f}"})
+    defs = Et.SubElement(root, "defs")
+    for page in sorted({p["piece"]["page"] for p in sheet["placements"]}):
+        content = Et.SubElement(defs, "g", {"id": f"page{page}"})
+        content.extend(copy.deepcopy(list(Et.parse(svg_paths[page]).getroot())))
+        strip_svg_namespace(content)
+        prefix_ids(content, f"p{page}-")
+        content.set("id", f"page{page}")
+    for idx, placement in enumerate(sheet["placements"]):
+        piece = placement["piece"]
+        clip = Et.SubElement(defs, "clipPath", {"id": f"piece{idx}", "clipPathUnits": "userSpaceOnUse"})
+        Et.SubElement(clip, "path", {"d": piece["outline"]})
+        # A clip path ignores strokes, so the margin is a chain of overlapping ellipses along the outline
+        rx, ry = (PIECE_MARGIN_MM / scale for scale in piece["mm_per_unit"])
+        for x, y in piece["outline_points"]:
+            Et.SubElement(clip, "ellipse", {"cx": f"{x:.3f}", "cy": f"{y:.3f}", "rx": f"{rx:.3f}", "ry": f"{ry:.3f}"})
+        group = Et.SubElement(root, "g", {"transform": placement_transform(placement)})
+        clipped = Et.SubElement(group, "g", {"clip-path": f"url(#piece{idx})"})
+        Et.SubElement(clipped, "use", {"href": f"#page{piece['page']}"})
+        Et.SubElement(group, "path", {"d": piece["outline"], "fill": "none", "stroke": "black",
+                                      "stroke-width": f"{OUTLINE_WIDTH_MM / min(piece['mm_per_unit']):.4f}"})
+    return root
+
+
+def render_tiled_sheet(sheet, svg_paths, output_dir, paper, dpi):
+    """
+    Render a packed strip one row of tiles at a time and cut it into tiles, skipping rows and tiles
+    with nothing on them. Only one row is ever held in memory.
+    Returns the list of tile paths.
+    """
+    import cairosvg
+
+    tile_w, tile_h = PAPER_SIZES[paper]
+    tile_w_px, tile_h_px = page_size_px(paper, dpi)
+    cols = max(1, math.ceil(sheet["width"] / tile_w - 1e-6))
+    rows = max(1, math.ceil(sheet["height"] / tile_h))
+    used_rows = {row for row, _ in covered_tiles(sheet, tile_w, tile_h)}
+    root = build_sheet_svg(sheet, svg_paths)
+    root.set("preserveAspectRatio", "none")
+    root.set("width", f"{cols * tile_w:.3f}mm")
+    root.set("height", f"{tile_h:.3f}mm")
+    band_path = os.path.join(output_dir, "nested.png")
+    tiles = []
+    for row in range(rows):
+        if row not in used_rows:
+            continue
+        root.set("viewBox", f"0 {row * tile_h:.3f} {cols * tile_w:.3f} {tile_h:.3f}")
+        try:
+            cairosvg.svg2png(bytestring=Et.tostring(root), write_to=band_path,
+                             output_width=cols * tile_w_px, output_height=tile_h_px)
+            tiles.extend(tile_image(band_path, output_dir, paper=paper, dpi=dpi, skip_blank=True, first_row=row))
+        except Exception as e:
+            print(f"Error rendering nested row {row + 1}: {e}")
+    if os.path.exists(band_path):
+        os.remove(band_path)
+    return tiles
+
+
+def render_nested(svg_paths, scale_x, scale_y, upload_dir, profile, allow_rotation=True):
+    """
+    Render the pattern for an output profile with its pieces packed onto as few sheets as possible.
+    Returns the list of output file paths, or None when nesting would lose part of the pattern
+    (no closed outlines, outlines drawn as loose segments or cut at a page edge, drawing outside every piece),
+    in which case the page layout should be used.
+    """
+    pieces = []
+    for page, svg_path in enumerate(svg_paths):
+        try:
+            page_pieces, stray = extract_pieces(svg_path, scale_x, scale_y, page)
+        except Exception as e:
+            print(f"[nesting] Error finding pieces in {svg_path}: {e}, keeping the page layout")
+            return None
+        if stray:
+            print(f"[nesting] {stray} drawn elements on page {page + 1} are outside every piece, keeping the page layout")
+            return None
+        pieces.extend(page_pieces)
+    if not pieces:
+        print("[nesting] No closed piece outlines found, keeping the page layout")
+        return None
+    allow_rotation = profile.get("nest_rotation", allow_rotation)
+    resized_dir = os.path.join(upload_dir, "resized")
+    os.makedirs(resized_dir, exist_ok=True)
+
+    if profile["mode"] == "tiled":
+        sheet = pack_for_tiles(pieces, profile["paper"], allow_rotation=allow_rotation)
+        outputs = render_tiled_sheet(sheet, svg_paths, resized_dir, profile["paper"], profile["dpi"])
+        print(f"[nesting] {len(pieces)} pieces on {len(outputs)} tiles")
+        return outputs
+
+    import cairosvg
+
+    if profile["mode"] == "sheet":
+        page_w_mm, page_h_mm = PAPER_SIZES[profile["paper"]]
+        sheets = pack_pieces(pieces, page_w_mm, page_h_mm, allow_rotation=allow_rotation)
+    else:
+        page_w_mm, page_h_mm = profile["roll_width_mm"], None
+        sheets = pack_pieces(pieces, page_w_mm, None, allow_rotation=allow_rotation)
+    outputs = []
+    for idx, sheet in enumerate(sheets):
+        sheet_svg = Et.tostring(build_sheet_svg(sheet, svg_paths), encoding="unicode")
+        for page_svg in write_vector_pages(sheet_svg, 1.0, 1.0, resized_dir, f"nested_{profile['name']}_{idx + 1}",
+                                           page_w_mm, page_h_mm):
+            output_pdf = os.path.splitext(page_svg)[0] + ".pdf"
+            try:
+                cairosvg.svg2pdf(url=page_svg, write_to=output_pdf)
+                outputs.append(output_pdf)
+            except Exception as e:
+                print(f"Error converting {page_svg} to PDF: {e}")
+    print(f"[nesting] {len(pieces)} pieces on {len(sheets)} sheets")
+    return outputs
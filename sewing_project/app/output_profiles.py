@@ -0,0 +1,240 @@
+"""
+Output profiles for printing resized patterns: tiled raster pages for home printers,
+and vector sheets or roll strips for wide-format plotters generated directly from the scaled SVG.
+"""
+import copy
+import os
+import re
+import time
+import xml.etree.ElementTree as Et
+from .overlay import PAPER_SIZES, REFERENCE_LINE_CM
+from .resize import scale_svg
+from .utils import generate_scaled
+
+
+OUTPUT_PROFILES = {
+    "a4": {"label": "A4 (home printer)", "mode": "tiled", "paper": "A4", "dpi": 300},
+    "letter": {"label": "US Letter (home printer)", "mode": "tiled", "paper": "Letter", "dpi": 300},
+    "a3": {"label": "A3 (copy shop)", "mode": "tiled", "paper": "A3", "dpi": 300},
+    "a0": {"label": "A0 (plotter)", "mode": "sheet", "paper": "A0"},
+    "roll_610": {"label": "610 mm roll (plotter)", "mode": "roll", "roll_width_mm": 610.0},
+    "roll_914": {"label": "914 mm roll (plotter)", "mode": "roll", "roll_width_mm": 914.0},
+}
+DEFAULT_PROFILE = "a4"
+# DPI overrides outside this range crash the tiler (<= 0) or allocate enormous page images
+MIN_DPI = 72
+MAX_DPI = 600
+SVG_NS = "http://www.w3.org/2000/svg"
+UNIT_TO_MM = {
+    "mm": 1.0,
+    "cm": 10.0,
+    "in": 25.4,
+    "pt": 25.4 / 72,
+    "pc": 25.4 / 6,
+    "px": 25.4 / 96,
+    "": 25.4 / 96,
+}
+
+
+def get_profile(name, dpi=None, nest=False, nest_rotation=True):
+    """
+    Look up an output profile by name, optionally overriding its DPI (MIN_DPI to MAX_DPI).
+    With nest, the pattern pieces are packed onto as few sheets as possible (rotating them if nest_rotation).
+    Raises ValueError for unknown profiles and out-of-range DPI.
+    """
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {name}")
+    profile = dict(OUTPUT_PROFILES[name], name=name)
+    if dpi is not None:
+        if not MIN_DPI <= dpi <= MAX_DPI:
+            raise ValueError(f"DPI must be between {MIN_DPI} and {MAX_DPI}")
+        profile["dpi"] = int(dpi)
+    if nest:
+        profile["nest"] = True
+        profile["nest_rotation"] = nest_rotation
+    return profile
+
+
+def parse_length_mm(value):
+    """
+    Convert an SVG length such as '595pt' or '210mm' to millimetres.
+    Returns None for missing or relative (%) lengths.
+    """
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)\s*([a-z]*)\s*", value)
+    if not match or match.group(2) not in UNIT_TO_MM:
+        return None
+    return float(match.group(1)) * UNIT_TO_MM[match.group(2)]
+
+
+def svg_geometry(root):
+    """
+    Return the physical size (mm) and viewBox of a parsed SVG root.
+    Falls back to the viewBox in px when width/height are missing.
+    """
+    view_box = root.get("viewBox")
+    width_mm = parse_length_mm(root.get("width"))
+    height_mm = parse_length_mm(root.get("height"))
+    if view_box:
+        vx, vy, vw, vh = [float(v) for v in re.split(r"[\s,]+", view_box.strip())]
+    elif width_mm and height_mm:
+        # Without a viewBox one user unit is one CSS pixel
+        vx = vy = 0.0
+        vw = width_mm / UNIT_TO_MM["px"]
+        vh = height_mm / UNIT_TO_MM["px"]
+    else:
+        raise ValueError("SVG has neither a viewBox nor absolute width and height")
+    if width_mm is None:
+        width_mm = vw * UNIT_TO_MM["px"]
+    if height_mm is None:
+        height_mm = vh * UNIT_TO_MM["px"]
+    return width_mm, height_mm, (vx, vy, vw, vh)
+
+
+def add_vector_reference_line(root, x, y, units_per_mm):
+    """
+    Append the 3.03 cm reference line and label to an SVG root at user coordinates (x, y).
+    """
+    length = REFERENCE_LINE_CM * 10 * units_per_mm
+    group = Et.SubElement(root, "g", {"id": "reference-line"})
+    Et.SubElement(group, "line", {
+        "x1": f"{x:.3f}", "y1": f"{y:.3f}", "x2": f"{x + length:.3f}", "y2": f"{y:.3f}",
+        "stroke": "black", "stroke-width": f"{0.5 * units_per_mm:.3f}",
+    })
+    label = Et.SubElement(group, "text", {
+        "x": f"{x:.3f}", "y": f"{y - 3 * units_per_mm:.3f}",
+        "font-size": f"{4 * units_per_mm:.3f}", "font-family": "sans-serif",
+    })
+    label.text = f"{REFERENCE_LINE_CM} cm"
+
+
+def page_windows(content_w_mm, content_h_mm, page_w_mm, page_h_mm):
+    """
+    Split the content area into page-sized windows (x_mm, y_mm, w_mm, h_mm), row by row.
+    A page dimension of None means the page grows to fit the content (roll output).
+    """
+    if content_w_mm <= 0 or content_h_mm <= 0:
+        raise ValueError("Pattern has no printable area")
+    page_w_mm = page_w_mm or content_w_mm
+    page_h_mm = page_h_mm or content_h_mm
+    windows = []
+    y = 0.0
+    while y < content_h_mm or not windows:
+        x = 0.0
+        while x < content_w_mm or x == 0.0:
+            windows.append((x, y, page_w_mm, page_h_mm))
+            x += page_w_mm
+        y += page_h_mm
+    return windows
+
+
+def write_vector_pages(svg_content, scale_x, scale_y, output_dir, base_name, page_w_mm=None, page_h_mm=None):
+    """
+    Scale an SVG and split it into vector pages of the given physical size without rasterizing.
+    Each page is the scaled drawing with its viewBox moved to a page-sized window.
+    Returns the list of page SVG paths.
+    """
+    scaled_root = Et.fromstring(scale_svg(svg_content, scale_x, scale_y))
+    width_mm, height_mm, (vx, vy, vw, vh) = svg_geometry(scaled_root)
+    units_x = vw / width_mm if width_mm else 1.0
+    units_y = vh / height_mm if height_mm else 1.0
+    content_w_mm = width_mm * scale_x
+    content_h_mm = height_mm * scale_y
+    windows = page_windows(content_w_mm, content_h_mm, page_w_mm, page_h_mm)
+    page_paths = []
+
+    for idx, (x_mm, y_mm, w_mm, h_mm) in enumerate(windows):
+        page = copy.deepcopy(scaled_root)
+        page.set("xmlns", SVG_NS)
+        page.set("width", f"{w_mm:.3f}mm")
+        page.set("height", f"{h_mm:.3f}mm")
+        page.set("viewBox", f"{vx * scale_x + x_mm * units_x:.3f} {vy * scale_y + y_mm * units_y:.3f} "
+                            f"{w_mm * units_x:.3f} {h_mm * units_y:.3f}")
+        page.set("preserveAspectRatio", "none")
+        add_vector_reference_line(
+            page,
+            vx * scale_x + (x_mm + w_mm - 50) * units_x,
+            vy * scale_y + (y_mm + h_mm - 10) * units_y,
+            units_x,
+        )
+        suffix = f"_sheet{idx + 1}" if len(windows) > 1 else ""
+        page_path = os.path.join(output_dir, f"{base_name}{suffix}.svg")
+        with open(page_path, "w", encoding="utf-8") as f:
+            f.write(Et.tostring(page, encoding="unicode"))
+        page_paths.append(page_path)
+    return page_paths
+
+
+def generate_vector_output(svg_paths, scale_x, scale_y, upload_dir, profile):
+    """
+    Produce plotter-ready PDFs straight from the scaled SVGs for a sheet or roll profile.
+    Returns the list of PDF file paths.
+    """
+    import cairosvg
+
+    resized_dir = os.path.join(upload_dir, "resized")
+    os.makedirs(resized_dir, exist_ok=True)
+    if profile["mode"] == "sheet":
+        page_w_mm, page_h_mm = PAPER_SIZES[profile["paper"]]
+    else:
+        page_w_mm, page_h_mm = profile["roll_width_mm"], None
+    outputs = []
+
+    for svg_path in svg_paths:
+        with open(svg_path, "r", encoding="utf-8") as f:
+            svg_content = f.read()
+        base_name = f"{os.path.splitext(os.path.basename(svg_path))[0]}_{profile['name']}"
+        for page_svg in write_vector_pages(svg_content, scale_x, scale_y, resized_dir, base_name,
+                                           page_w_mm, page_h_mm):
+            output_pdf = os.path.splitext(page_svg)[0] + ".pdf"
+            try:
+                cairosvg.svg2pdf(url=page_svg, write_to=output_pdf)
+                outputs.append(output_pdf)
+            except Exception as e:
+                print(f"Error converting {page_svg} to PDF: {e}")
+    return outputs
+
+
+def render_for_profile(svg_paths, scale_x, scale_y, upload_dir, profile):
+    """
+    Render the scaled pattern for an output profile.
+    Tiled profiles go through the raster tiler; sheet and roll profiles stay vector.
+    Nesting profiles pack the pieces first and fall back to the page layout when no pieces are found.
+    Returns the list of output file paths to package for download.
+    """
+    if profile.get("nest"):
+        # Imported here because nesting builds on this module
+        from .nesting import render_nested
+
+        outputs = render_nested(svg_paths, scale_x, scale_y, upload_dir, profile)
+        if outputs is not None:
+            return outputs
+    if profile["mode"] == "tiled":
+        resized_pngs, _ = generate_scaled(svg_paths, scale_x, scale_y, upload_dir,
+                                          paper=profile["paper"], dpi=profile["dpi"])
+        return resized_pngs
+    return generate_vector_output(svg_paths, scale_x, scale_y, upload_dir, profile)
+
+
+def benchmark_profiles(svg_paths, scale_x, scale_y, work_dir, profile_names=None, repeat=1, nest=False):
+    """
+    Time render_for_profile for each profile on the same input, optionally with piece nesting.
+    Returns {profile_name: {"seconds": ..., "outputs": ..., "pages_per_second": ...}}.
+    """
+    results = {}
+    for name in profile_names or OUTPUT_PROFILES:
+        profile = get_profile(name, nest=nest)
+        profile_dir = os.path.join(work_dir, name)
+        os.makedirs(profile_dir, exist_ok=True)
+        start = time.perf_counter()
+        outputs = []
+        for _ in range(repeat):
+            outputs = render_for_profile(svg_paths, scale_x, scale_y, profile_dir, profile)
+        seconds = (time.perf_counter() - start) / repeat
+        results[name] = {
+            "seconds": seconds,
+            "outputs": len(outputs),
+            "pages_per_second": len(svg_paths) / seconds if seconds else 0.0,
+        }
+    return results
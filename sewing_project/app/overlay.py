@@ -0,0 +1,137 @@
+"""
+Pre-rendered print overlays for tiled pattern pages.
+Fonts and the reference line / registration mark stamp are built once per paper size and DPI
+and composited onto every tile instead of being redrawn each time.
+"""
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Paper sizes in millimetres (width, height), portrait orientation
+PAPER_SIZES = {
+    "A4": (210.0, 297.0),
+    "Letter": (215.9, 279.4),
+    "A3": (297.0, 420.0),
+    "A0": (841.0, 1189.0),
+}
+REFERENCE_LINE_CM = 3.03
+# Page stamps are kept for the DPI of the tiled output profiles only: a full page at 600 DPI is
+# hundreds of MB, so stamps for custom DPIs are rendered once per tiling run instead
+STAMP_CACHE_DPIS = (300,)
+FONT_CANDIDATES = ("Arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+
+
+def mm_to_px(mm, dpi):
+    """
+    Convert a length in millimetres to pixels at the given DPI.
+    """
+    return int(round(mm / 25.4 * dpi))
+
+
+def page_size_px(paper="A4", dpi=300):
+    """
+    Return the (width, height) of a paper size in pixels at the given DPI.
+    """
+    if paper not in PAPER_SIZES:
+        raise ValueError(f"Unknown paper size: {paper}")
+    width_mm, height_mm = PAPER_SIZES[paper]
+    return mm_to_px(width_mm, dpi), mm_to_px(height_mm, dpi)
+
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """
+    Load the label font once per size.
+    Tries a few common TrueType fonts before falling back to Pillow's default font.
+    """
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except IOError:
+            continue
+    return ImageFont.load_default()
+
+
+def font_size_for_dpi(dpi):
+    """
+    Scale the 32px label font used at 300 DPI to the given DPI.
+    """
+    return max(10, int(32 * dpi / 300))
+
+
+def draw_reference_line(draw, page_size, dpi=300):
+    """
+    Draw the 3.03 cm reference line and its label near the bottom-right corner.
+    """
+    line_length_px = int(REFERENCE_LINE_CM * dpi / 2.54)
+    padding = int(100 * dpi / 300)
+    start_x = page_size[0] - line_length_px - padding
+    start_y = page_size[1] - padding
+    draw.line([(start_x, start_y), (start_x + line_length_px, start_y)], fill="black",
+              width=max(1, int(5 * dpi / 300)))
+    draw.text((start_x, start_y - int(40 * dpi / 300)), f"{REFERENCE_LINE_CM} cm", fill="black",
+              font=load_font(font_size_for_dpi(dpi)))
+
+
+def draw_registration_marks(draw, page_size, dpi=300):
+    """
+    Draw small crosshair marks in each corner so neighbouring tiles can be aligned when taped together.
+    """
+    margin = int(40 * dpi / 300)
+    arm = int(25 * dpi / 300)
+    width = max(1, int(3 * dpi / 300))
+    for x in (margin, page_size[0] - margin):
+        for y in (margin, page_size[1] - margin):
+            draw.line([(x - arm, y), (x + arm, y)], fill="black", width=width)
+            draw.line([(x, y - arm), (x, y + arm)], fill="black", width=width)
+
+
+def render_page_stamp(paper="A4", dpi=300):
+    """
+    Render the transparent overlay shared by every tile of a paper size:
+    the reference line and the registration marks.
+    """
+    size = page_size_px(paper, dpi)
+    stamp = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(stamp)
+    draw_reference_line(draw, size, dpi)
+    draw_registration_marks(draw, size, dpi)
+    return stamp
+
+
+@lru_cache(maxsize=len(PAPER_SIZES) * len(STAMP_CACHE_DPIS))
+def cached_page_stamp(paper, dpi):
+    return render_page_stamp(paper, dpi)
+
+
+def get_page_stamp(paper="A4", dpi=300):
+    """
+    Return the page stamp for a paper size and DPI, cached for the profile DPIs (STAMP_CACHE_DPIS).
+    """
+    if dpi in STAMP_CACHE_DPIS:
+        return cached_page_stamp(paper, dpi)
+    return render_page_stamp(paper, dpi)
+
+
+@lru_cache(maxsize=256)
+def get_label_stamp(text, dpi=300):
+    """
+    Pre-render a small transparent label image, e.g. a tile's row/column.
+    """
+    font = load_font(font_size_for_dpi(dpi))
+    left, top, right, bottom = font.getbbox(text)
+    label = Image.new("RGBA", (right - left + 2, bottom - top + 2), (0, 0, 0, 0))
+    ImageDraw.Draw(label).text((-left + 1, -top + 1), text, fill="black", font=font)
+    return label
+
+
+def apply_overlay(page, paper="A4", dpi=300, label=None, stamp=None):
+    """
+    Composite the page stamp (and optional label) onto an RGBA page in place.
+    Pass stamp when overlaying many pages, so a stamp for an uncached DPI is only rendered once.
+    """
+    page.alpha_composite(stamp if stamp is not None else get_page_stamp(paper, dpi))
+    if label:
+        margin = int(80 * dpi / 300)
+        page.alpha_composite(get_label_stamp(label, dpi), (margin, margin))
+    return page
@@ -0,0 +1,117 @@
+"""
+Pattern handles: cache the converted page SVGs and summary of an uploaded pattern
+so resubmitting with new measurements only has to re-scale and re-render.
+The metadata and files live in the artifact store; each node keeps a local copy of the files it uses.
+"""
+import os
+import re
+import shutil
+from .artifact_store import config_value, get_store, link_or_copy
+from .downloads import file_sha256
+
+
+CACHE_DIRNAME = "pattern_cache"
+REF_PREFIX = "handles/"
+SESSION_KEY = "pattern_handles"
+MAX_SESSION_HANDLES = 20
+HANDLE_RE = re.compile(r"^[0-9a-f]{16}$")
+
+
+def file_handle(filepath):
+    """
+    Build a handle from the content hash of an uploaded file.
+    """
+    return file_sha256(filepath)[:16]
+
+
+def handle_dir(root_path, handle):
+    """
+    Return the cache directory of a handle, or None if the handle is malformed.
+    Handles live under PATTERN_CACHE_DIR, by default pattern_cache in the app directory.
+    """
+    if not HANDLE_RE.match(handle or ""):
+        return None
+    return os.path.join(config_value("PATTERN_CACHE_DIR", os.path.join(root_path, CACHE_DIRNAME)), handle)
+
+
+def load_handle(root_path, handle):
+    """
+    Load a cached pattern's metadata, with absolute source and SVG page paths.
+    Files missing from this node's cache directory are fetched from the artifact store.
+    Returns None if the handle is unknown.
+    """
+    directory = handle_dir(root_path, handle)
+    meta = get_store().get_ref(REF_PREFIX + handle) if directory else None
+    if meta is None:
+        return None
+    meta["handle"] = handle
+    meta["source_path"] = fetch(os.path.join(directory, meta["filename"]), meta["source_key"])
+    meta["svg_paths"] = [fetch(os.path.join(directory, "svg_pages", name), key)
+                         for name, key in zip(meta["svg_pages"], meta["svg_keys"])]
+    return meta
+
+
+def fetch(path, key):
+    """
+    Make sure a stored file is present at path in the local cache directory.
+    """
+    if not os.path.exists(path):
+        link_or_copy(get_store().local_path(key), path)
+    return path
+
+
+def save_handle(root_path, handle, filepath, filename, file_type, summary, svg_paths):
+    """
+    Put the uploaded file and its converted SVG pages into the artifact store and this node's
+    cache directory, and record the summary. Returns the stored metadata.
+    """
+    store = get_store()
+    directory = handle_dir(root_path, handle)
+    pages_dir = os.path.join(directory, "svg_pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    shutil.copyfile(filepath, os.path.join(directory, filename))
+    svg_pages = []
+    svg_keys = []
+    for svg_path in svg_paths:
+        name = os.path.basename(svg_path)
+        shutil.copyfile(svg_path, os.path.join(pages_dir, name))
+        svg_pages.append(name)
+        svg_keys.append(store.put_file(svg_path))
+    meta = {
+        "filename": filename,
+        "file_type": file_type,
+        "summary": summary,
+        "source_key": store.put_file(filepath),
+        "svg_pages": svg_pages,
+        "svg_keys": svg_keys,
+    }
+    update_handle(root_path, handle, **meta)
+    return load_handle(root_path, handle)
+
+
+def update_handle(root_path, handle, **fields):
+    """
+    Merge fields into a handle's stored metadata, e.g. the instructions from the first upload.
+    """
+    if handle_dir(root_path, handle) is None:
+        return
+    store = get_store()
+    meta = store.get_ref(REF_PREFIX + handle) or {}
+    meta.update(fields)
+    store.put_ref(REF_PREFIX + handle, meta)
+
+
+def remember_handle(session, handle):
+    """
+    Record a handle in the user's session so only they can rescale it.
+    """
+    handles = [h for h in session.get(SESSION_KEY, []) if h != handle]
+    handles.append(handle)
+    session[SESSION_KEY] = handles[-MAX_SESSION_HANDLES:]
+
+
+def owns_handle(session, handle):
+    """
+    Check whether a handle was created in this session.
+    """
+    return handle in session.get(SESSION_KEY, [])
@@ -1,13 +1,14 @@
 """
 Generates SVG patterns for bikini tops and bottoms based on given measurements.
 """
-import svgwrite
 
 def generate_bikini_top(width, height, path_logic=None):
     """
     Generate an SVG for a bikini top using simple geometric shapes.
     Draws two triangle cups and vertical straps.
     """
+    import svgwrite
+
     svg = svgwrite.Drawing(size=("400mm", "400mm"))
     # Draw two triangle cups for the bikini top
     left_top_x = 10 + width * 0.1
@@ -43,6 +44,8 @@ def generate_bikini_top(width, height, path_logic=None):
 
 def generate_bikini_bottom(width: float, height: float) -> str:
     """Generate SVG for bikini bottom pattern based on width and height."""
+    import svgwrite
+
     svg = svgwrite.Drawing(size=("400mm", "400mm"))
 
     top_width = width
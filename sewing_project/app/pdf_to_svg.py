@@ -1,67 +1,159 @@
 import os
 import subprocess
-from PyPDF2 import PdfReader, PdfWriter
-from PyPDF2.generic import NameObject, DictionaryObject
-from pdf2image import convert_from_path
-import pytesseract
+from .svg_optimize import optimize_svg_files, format_stats
 
 
-def get_required_rotation(pdf_path, page_number):
+OSD_DPI = 100
+OSD_CHUNK_PAGES = 8
+# Above these, pdf2svg output is cheaper to rasterize from the PDF than to scale and render as SVG
+MAX_SVG_PAGE_BYTES = 20 * 1024 * 1024
+MAX_SVG_PAGE_ELEMENTS = 50000
+
+
+def osd_rotation(img):
     """
-    Render one page very low-res, ask Tesseract which way is up.
+    Ask Tesseract which way is up for one rendered page.
     Returns: 0, 90, or -90 (degrees).
     """
+    import pytesseract
+
     try:
-        img = convert_from_path(pdf_path, dpi=100,
-                                first_page=page_number,
-                                last_page=page_number)[0]
         osd = pytesseract.image_to_osd(img)
         if "Rotate: 90" in osd:
             return 90          # needs clockwise rotation
         if "Rotate: 270" in osd:
             return -90         # needs counter-clockwise rotation
     except Exception as e:
-        # print(f"OSD failed on page {page_number}: {e}")
+        # print(f"OSD failed: {e}")
         pass
     return 0                   # assume right-way-up
 
 
-def convert_pdf_to_svgs(pdf_path, output_dir):
+def get_required_rotations(pdf_path, page_count):
     """
-    Convert each page of a PDF to an individual SVG using pdf2svg.
-    Returns a list of SVG file paths.
+    Render the pages very low-res in chunks (one poppler call per chunk, not per page)
+    and ask Tesseract which way is up for each.
+    Returns a list of 0, 90, or -90 (degrees), one per page.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    svg_paths = []
+    from pdf2image import convert_from_path
+
+    rotations = []
+    for first_page in range(1, page_count + 1, OSD_CHUNK_PAGES):
+        last_page = min(first_page + OSD_CHUNK_PAGES - 1, page_count)
+        try:
+            images = convert_from_path(pdf_path, dpi=OSD_DPI, first_page=first_page, last_page=last_page,
+                                       thread_count=min(4, last_page - first_page + 1))
+        except Exception as e:
+            print(f"OSD render failed on pages {first_page}-{last_page}: {e}")
+            images = []
+        chunk = [osd_rotation(img) for img in images]
+        rotations.extend(chunk + [0] * (last_page - first_page + 1 - len(chunk)))
+    return rotations
+
+
+def prepare_source_pdf(pdf_path, output_dir):
+    """
+    Apply auto-rotation and missing /Resources fixes to the whole document in memory.
+    Writes a single patched PDF only when something changed; otherwise the original file is used as-is.
+    Returns (source_pdf_path, page_count, is_temporary).
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import NameObject, DictionaryObject
 
     reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    rotations = get_required_rotations(pdf_path, page_count)
+    missing_resources = ["/Resources" not in page for page in reader.pages]
+    if not any(rotations) and not any(missing_resources):
+        return pdf_path, page_count, False
+
+    writer = PdfWriter()
     for i, page in enumerate(reader.pages):
-        rotation = get_required_rotation(pdf_path, i + 1)
-        if rotation:
-            page.rotate(rotation)
-            print(f"[auto-rotate] page {i + 1} rotated {rotation}°")
-        single_page_pdf = os.path.join(output_dir, f"temp_page_{i + 1}.pdf")
-        output_svg = os.path.join(output_dir, f"page_{i + 1}.svg")
-        writer = PdfWriter()
-        # Ensure /Resources is present for Inkscape
-        if "/Resources" not in page:
+        if rotations[i]:
+            page.rotate(rotations[i])
+            print(f"[auto-rotate] page {i + 1} rotated {rotations[i]}°")
+        # Ensure /Resources is present for pdf2svg
+        if missing_resources[i]:
             page[NameObject("/Resources")] = writer._add_object(DictionaryObject())
         writer.add_page(page)
-        with open(single_page_pdf, "wb") as f:
-            writer.write(f)
-        cmd = [
-            "pdf2svg",
-            single_page_pdf,
-            output_svg,
-            "1"
-        ]
+    patched_pdf = os.path.join(output_dir, "temp_patched.pdf")
+    with open(patched_pdf, "wb") as f:
+        writer.write(f)
+    return patched_pdf, page_count, True
+
+
+def convert_pages_individually(source_pdf, output_dir, page_count):
+    """
+    Fallback when converting the whole document at once fails: convert page by page,
+    still from the one patched document, so a single bad page does not lose the others.
+    """
+    for i in range(1, page_count + 1):
+        output_svg = os.path.join(output_dir, f"page_{i}.svg")
         try:
-            subprocess.run(cmd, check=True)
-            if os.path.exists(output_svg):
-                svg_paths.append(output_svg)
+            subprocess.run(["pdf2svg", source_pdf, output_svg, str(i)], check=True)
         except subprocess.CalledProcessError as e:
-            print(f"Failed to convert page {i+1}: {e}")
-        # Only remove temp PDF after confirming SVG conversion
-        if os.path.exists(single_page_pdf):
-            os.remove(single_page_pdf)
-    return svg_paths
\ No newline at end of file
+            print(f"Failed to convert page {i}: {e}")
+
+
+def convert_pdf_to_svgs(pdf_path, output_dir, optimize=True):
+    """
+    Convert each page of a PDF to an individual SVG using pdf2svg.
+    Rotations are applied once to the whole document and pdf2svg runs a single time for all pages.
+    The pages are then shrunk in place by the SVG optimizer unless optimize is False. Conversions that
+    svg_conversion_is_pathological rejects go to the raster fallback, so they are not parsed and optimized.
+    Returns a list of SVG file paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    source_pdf, page_count, is_temporary = prepare_source_pdf(pdf_path, output_dir)
+    cmd = [
+        "pdf2svg",
+        source_pdf,
+        os.path.join(output_dir, "page_%d.svg"),
+        "all"
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Failed to convert all pages at once, retrying page by page: {e}")
+        convert_pages_individually(source_pdf, output_dir, page_count)
+    finally:
+        if is_temporary and os.path.exists(source_pdf):
+            os.remove(source_pdf)
+    svg_paths = [os.path.join(output_dir, f"page_{i}.svg") for i in range(1, page_count + 1)]
+    svg_paths = [path for path in svg_paths if os.path.exists(path)]
+    if optimize and svg_paths:
+        # The byte scan is cheap; the optimizer loads every page into a DOM
+        if svg_conversion_is_pathological(svg_paths):
+            print("[svg-optimize] skipped: conversion too large, the raster fallback will be used")
+        else:
+            print(f"[svg-optimize] {format_stats(optimize_svg_files(svg_paths))}")
+    return svg_paths
+
+
+def count_svg_elements(svg_path, tags=(b"<path", b"<use", b"<image")):
+    """
+    Cheaply count drawing elements in an SVG by scanning its bytes, without parsing it.
+    """
+    count = 0
+    # Carry over len(tag) - 1 bytes per tag so a tag split across chunks is counted exactly once
+    tails = {tag: b"" for tag in tags}
+    with open(svg_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            for tag in tags:
+                data = tails[tag] + chunk
+                count += data.count(tag)
+                tails[tag] = data[-(len(tag) - 1):]
+    return count
+
+
+def svg_conversion_is_pathological(svg_paths, max_bytes=MAX_SVG_PAGE_BYTES, max_elements=MAX_SVG_PAGE_ELEMENTS):
+    """
+    Decide whether pdf2svg output is too large or too detailed to process as vectors.
+    Also true when no pages converted at all.
+    """
+    if not svg_paths:
+        return True
+    for svg_path in svg_paths:
+        if os.path.getsize(svg_path) > max_bytes or count_svg_elements(svg_path) > max_elements:
+            return True
+    return False
@@ -0,0 +1,169 @@
+"""
+Preview tier for uploaded patterns: a fast low-resolution PNG of each scaled page for the result page,
+with the full print render deferred until the ZIP is actually downloaded.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from .resize import scale_svg, resize_image
+from .output_profiles import render_for_profile
+from .utils import zip_pngs, iter_raster_tiles
+from .artifact_store import config_value, get_store
+from .pattern_cache import load_handle
+
+
+PREVIEW_MAX_WIDTH = 900
+JOB_REF_PREFIX = "print_jobs/"
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+RENDERS_DIRNAME = "sewing_renders"
+
+
+def render_previews(svg_paths, scale_x, scale_y, upload_dir, max_width=PREVIEW_MAX_WIDTH):
+    """
+    Scale each page SVG and render it to a small PNG for display.
+    Returns the list of preview PNG filenames inside the resized directory.
+    """
+    import cairosvg
+
+    resized_dir = os.path.join(upload_dir, "resized")
+    os.makedirs(resized_dir, exist_ok=True)
+    previews = []
+    for svg_path in svg_paths:
+        with open(svg_path, "r", encoding="utf-8") as f:
+            scaled_svg = scale_svg(f.read(), scale_x, scale_y)
+        preview_name = f"{os.path.splitext(os.path.basename(svg_path))[0]}_preview.png"
+        try:
+            cairosvg.svg2png(bytestring=scaled_svg.encode("utf-8"),
+                             write_to=os.path.join(resized_dir, preview_name),
+                             output_width=max_width)
+            previews.append(preview_name)
+        except Exception as e:
+            print(f"Error rendering preview for {svg_path}: {e}")
+    return previews
+
+
+def render_raster_previews(pdf_path, scale_x, scale_y, upload_dir, max_width=PREVIEW_MAX_WIDTH):
+    """
+    Preview for the raster fallback: render the PDF pages straight to small PNGs with poppler,
+    then stretch them to the scaled proportions. Like the SVG previews they are max_width wide.
+    Returns the list of preview PNG filenames inside the resized directory.
+    """
+    from pdf2image import convert_from_path
+
+    resized_dir = os.path.join(upload_dir, "resized")
+    os.makedirs(resized_dir, exist_ok=True)
+    previews = []
+    try:
+        paths = convert_from_path(pdf_path, size=(max_width, None), output_folder=resized_dir,
+                                  paths_only=True, fmt="png", output_file="raster_preview_")
+    except Exception as e:
+        print(f"Error rendering raster preview for {pdf_path}: {e}")
+        return previews
+    for idx, path in enumerate(paths):
+        preview_name = f"page_{idx + 1}_preview.png"
+        preview_path = os.path.join(resized_dir, preview_name)
+        try:
+            resize_image(path, preview_path, scale_y=scale_y / scale_x)
+        except Exception as e:
+            print(f"Error scaling raster preview page {idx + 1}: {e}")
+            continue
+        finally:
+            os.remove(path)
+        previews.append(preview_name)
+    return previews
+
+
+def print_job_id(handle, scale_x, scale_y, profile):
+    """
+    Identify a print render by what it is made from, so the same pattern, scale and profile
+    map to one ZIP no matter which node or user asks for it.
+    """
+    spec = json.dumps([handle, scale_x, scale_y, profile], sort_keys=True)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:32]
+
+
+def schedule_print_render(handle, zip_filename, filename, scale_x, scale_y, profile, raster=False):
+    """
+    Record everything needed to build the print ZIP later, without rendering it now.
+    When raster is set, tiled profiles are rendered from the source PDF instead of the SVG pages.
+    Returns the job id used in the download URL.
+    """
+    store = get_store()
+    job_id = print_job_id(handle, scale_x, scale_y, profile)
+    if store.get_ref(JOB_REF_PREFIX + job_id) is None:
+        store.put_ref(JOB_REF_PREFIX + job_id, {
+            "handle": handle,
+            "filename": filename,
+            "zip_filename": zip_filename,
+            "scale_x": scale_x,
+            "scale_y": scale_y,
+            "profile": profile,
+            "raster": raster,
+        })
+    return job_id
+
+
+def load_print_job(root_path, job_id):
+    """
+    Return a print job, or None if it is unknown. Jobs not rendered yet get the local
+    svg_paths (and raster_pdf) of their pattern handle filled in.
+    """
+    if not JOB_ID_RE.match(job_id or ""):
+        return None
+    job = get_store().get_ref(JOB_REF_PREFIX + job_id)
+    if job is None or job.get("zip_key"):
+        return job
+    meta = load_handle(root_path, job["handle"])
+    if meta is None:
+        return None
+    job["svg_paths"] = meta["svg_paths"]
+    job["raster_pdf"] = meta["source_path"] if job["raster"] else None
+    return job
+
+
+def get_renders_dir():
+    """
+    Node-local directory for print render locks and work directories: RENDER_DIR, by default
+    in the system temp directory. Nothing else writes or cleans it.
+    """
+    renders_dir = config_value("RENDER_DIR", os.path.join(tempfile.gettempdir(), RENDERS_DIRNAME))
+    os.makedirs(renders_dir, exist_ok=True)
+    return renders_dir
+
+
+def ensure_print_render(job_id, job):
+    """
+    Build the print ZIP for a job loaded by load_print_job and put it in the artifact store,
+    unless that has already happened. Concurrent requests on one node wait on a file lock so the
+    render runs once; nodes racing on the same job store the same content-addressed ZIP.
+    Returns the job with its zip_key set.
+    """
+    if job.get("zip_key"):
+        return job
+    store = get_store()
+    renders_dir = get_renders_dir()
+    with open(os.path.join(renders_dir, job_id + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another request may have finished the render while we waited for the lock
+        stored = store.get_ref(JOB_REF_PREFIX + job_id) or {}
+        if stored.get("zip_key"):
+            return stored
+        # Render in a private directory so concurrent jobs never mix their tiles
+        work_dir = tempfile.mkdtemp(dir=renders_dir)
+        try:
+            profile = job["profile"]
+            if job.get("raster_pdf") and profile["mode"] == "tiled":
+                outputs = list(iter_raster_tiles(job["raster_pdf"], job["scale_x"], job["scale_y"], work_dir,
+                                                 paper=profile["paper"], dpi=profile["dpi"]))
+            else:
+                outputs = render_for_profile(job["svg_paths"], job["scale_x"], job["scale_y"], work_dir, profile)
+            _, zip_path = zip_pngs(outputs, work_dir, job["filename"])
+            stored = dict(stored, zip_key=store.put_file(zip_path))
+            store.put_ref(JOB_REF_PREFIX + job_id, stored)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return stored
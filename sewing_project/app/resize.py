@@ -2,35 +2,40 @@
 Utility functions for resizing sewing patterns: scaling SVGs, resizing and tiling images, and converting to PDF.
 """
 import xml.etree.ElementTree as Et
-from PIL import Image, ImageDraw, ImageFont
-from pdf2image import convert_from_path
+from PIL import Image
 import os
 import math
 from .pattern_generator import strip_svg_namespace
+from .overlay import draw_reference_line, page_size_px, get_page_stamp, apply_overlay
 
 
-def add_reference_line(draw, tile_size):
+RASTER_CHUNK_PAGES = 4
+
+
+def add_reference_line(draw, tile_size, dpi=300):
     """
     Draws a horizontal 3.03 cm reference line near the bottom-right corner of the image.
     Adds a label with the length in cm.
     """
-    line_length_cm = 3.03
-    dpi = 300
-    pixels_per_cm = dpi / 2.54
-    line_length_px = int(line_length_cm * pixels_per_cm)
-    padding = 100
-    start_x = tile_size[0] - line_length_px - padding
-    start_y = tile_size[1] - padding
-    end_x = start_x + line_length_px
-    end_y = start_y
-    draw.line([(start_x, start_y), (end_x, end_y)], fill="black", width=5)
+    draw_reference_line(draw, tile_size, dpi)
 
-    try:
-        font = ImageFont.truetype("Arial.ttf", 32)
-    except IOError:
-        font = ImageFont.load_default()
 
-    draw.text((start_x, start_y - 40), f"{line_length_cm} cm", fill="black", font=font)
+def iter_pdf_page_images(pdf_path, output_folder, dpi=300, chunk_pages=RASTER_CHUNK_PAGES, thread_count=2):
+    """
+    Render a PDF to PNG files a few pages at a time and yield each page's path in order.
+    Pages go straight to disk via poppler, so at most one chunk is being rendered at once
+    and no decoded page images are held in memory.
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    page_count = pdfinfo_from_path(pdf_path)["Pages"]
+    for first_page in range(1, page_count + 1, chunk_pages):
+        last_page = min(first_page + chunk_pages - 1, page_count)
+        yield from convert_from_path(
+            pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+            output_folder=output_folder, paths_only=True, fmt="png",
+            output_file=f"raster_{first_page}_", thread_count=min(thread_count, last_page - first_page + 1),
+        )
 
 
 def convert_pdf_to_images(pdf_path, output_folder):
@@ -38,13 +43,12 @@ def convert_pdf_to_images(pdf_path, output_folder):
     Converts each page of a PDF into a 300 DPI PNG image.
     Saves the images and returns a list of their paths.
     """
-    images = convert_from_path(pdf_path, dpi=300)
     image_paths = []
 
-    for idx, img in enumerate(images):
+    for idx, rendered_path in enumerate(iter_pdf_page_images(pdf_path, output_folder, dpi=300)):
         image_filename = f"page_{idx+1}.png"
         image_path = os.path.join(output_folder, image_filename)
-        img.save(image_path, "PNG")
+        os.replace(rendered_path, image_path)
         image_paths.append(image_path)
     return image_paths
 
@@ -88,48 +92,58 @@ def resize_image(image_path, output_img, scale_x=1.0, scale_y=1.0):
     img_resized.save(output_img)
 
 
-def tile_image_to_a4(image_path, output_dir):
+def tile_image(image_path, output_dir, paper="A4", dpi=300, skip_blank=False, first_row=0):
     """
-    Splits an image into A4-sized tiles at 300 DPI.
-    Adds a reference line and saves each tile as a PNG.
+    Splits an image into page-sized tiles for the given paper size and DPI.
+    Composites the reference line, registration marks and a tile label onto each tile and saves it as a PNG.
+    With skip_blank, fully transparent tiles are not written. first_row offsets the row labels
+    when the image is one band of a larger layout.
     Returns the list of tile image paths.
     """
-    a4_width_px = 2480  # A4 at 300 DPI
-    a4_height_px = 3508
-    image = Image.open(image_path)
+    page_width_px, page_height_px = page_size_px(paper, dpi)
+    stamp = get_page_stamp(paper, dpi)
+    image = Image.open(image_path).convert("RGBA")
     image_width, image_height = image.size
     # Calculate number of tiles needed
-    cols = math.ceil(image_width / a4_width_px)
-    rows = math.ceil(image_height / a4_height_px)
+    cols = math.ceil(image_width / page_width_px)
+    rows = math.ceil(image_height / page_height_px)
     base_name = os.path.splitext(os.path.basename(image_path))[0]
     tiled_paths = []
 
     for row in range(rows):
 
         for col in range(cols):
-            left = col * a4_width_px
-            upper = row * a4_height_px
-            right = min(left + a4_width_px, image_width)
-            lower = min(upper + a4_height_px, image_height)
+            left = col * page_width_px
+            upper = row * page_height_px
+            right = min(left + page_width_px, image_width)
+            lower = min(upper + page_height_px, image_height)
             tile = image.crop((left, upper, right, lower))
-            # Convert to RGBA to handle transparency safely
-            tile = tile.convert("RGBA")
-            # Create white background and paste
-            background = Image.new("RGBA", (a4_width_px, a4_height_px), (255, 255, 255, 255))
-            paste_x = (a4_width_px - tile.width) // 2
-            paste_y = (a4_height_px - tile.height) // 2
+            if skip_blank and tile.getchannel("A").getbbox() is None:
+                continue
+            # A new white page is cheaper than copying a cached one
+            background = Image.new("RGBA", (page_width_px, page_height_px), (255, 255, 255, 255))
+            paste_x = (page_width_px - tile.width) // 2
+            paste_y = (page_height_px - tile.height) // 2
             background.paste(tile, (paste_x, paste_y), mask=tile)
+            apply_overlay(background, paper, dpi, label=f"r{first_row + row + 1} c{col + 1}", stamp=stamp)
             # Converts back to RGB
             tile = background.convert("RGB")
-            draw = ImageDraw.Draw(tile)
-            add_reference_line(draw, tile.size)
-            tile_filename = f"{base_name}_tile_r{row}_c{col}.png"
+            tile_filename = f"{base_name}_tile_r{first_row + row}_c{col}.png"
             tile_path = os.path.join(output_dir, tile_filename)
             tile.save(tile_path, "PNG")
             tiled_paths.append(tile_path)
     return tiled_paths
 
 
+def tile_image_to_a4(image_path, output_dir):
+    """
+    Splits an image into A4-sized tiles at 300 DPI.
+    Adds a reference line and saves each tile as a PNG.
+    Returns the list of tile image paths.
+    """
+    return tile_image(image_path, output_dir, paper="A4", dpi=300)
+
+
 def images_to_pdf(image_paths, output_pdf_path):
     """
     Combines a list of image paths into a single PDF.
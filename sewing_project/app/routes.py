@@ -1,166 +1,463 @@
-from flask import Flask, render_template, request, send_from_directory
+from flask import (Blueprint, Response, current_app, render_template, request, session, stream_with_context,
+                   url_for)
 from .ai_calls import (get_pattern_parameters, generate_pattern_params_bikini_top,
                        generate_pattern_params_bikini_bottom, SIZE_CHART)
 from .pattern_generator import generate_bikini_top, generate_bikini_bottom
+from .drafting import DRAFTERS, REQUIRED_MEASUREMENTS, check_measurements, draft_pattern
+import json
 import os
-from .gemini_calls import get_sewing_instructions
-from .pdf_to_svg import convert_pdf_to_svgs
+import shutil
+import tempfile
+import uuid
+from .gemini_calls import stream_sewing_instructions
+from .instructions import start_generation
+from .pdf_to_svg import convert_pdf_to_svgs, svg_conversion_is_pathological
 from .svg_extract import summarize_svg_pattern
 from .resize import safe_float
-from .utils import (build_user_meas_str, clean_upload_dir, is_file_allowed,
+from .output_profiles import OUTPUT_PROFILES, DEFAULT_PROFILE, get_profile
+from .preview import (render_previews, render_raster_previews, schedule_print_render, ensure_print_render,
+                      load_print_job)
+from .admission import (AdmissionRejected, admission_slot, estimate_upload_cost, estimate_render_cost,
+                        metrics_text)
+from .utils import (build_user_meas_str, is_file_allowed,
                     prepare_upload_path, save_uploaded_file, get_scale_factors,
                     extract_user_meas, get_summary_svg_paths, prepare_resize_params,
-                    generate_scaled, scale_and_save_svg, zip_pngs, build_render_context,
-                    parse_dimensions)
-from .database.db_helper import save_upload_to_db
+                    scale_and_save_svg, get_zip_filename, build_render_context,
+                    parse_dimensions, parse_scale_factors, derive_scale_factors, apply_torso_height)
+from .pattern_cache import file_handle, load_handle, save_handle, update_handle, remember_handle, owns_handle
+from .downloads import send_artifact
+from .artifact_store import KEY_RE, get_store
+from .database.db_helper import save_upload_to_db, save_instructions_to_db, database_id
 
 
-app = Flask(__name__)
+bp = Blueprint("main", __name__)
+INSTRUCTION_JOBS_KEY = "instruction_jobs"
+INSTRUCTION_REF_PREFIX = "instructions/"
+ARTIFACT_CSP = "default-src 'none'; img-src data:; style-src 'unsafe-inline'; sandbox"
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     return render_template("index.html")
 
 
-@app.route("/download_zip/<filename>")
-def download_zip(filename):
-    zip_dir = os.path.join(app.root_path, "uploads", "resized")
-    return send_from_directory(zip_dir, filename, as_attachment=True)
+@bp.app_template_global()
+def artifact_url(key, name=None, inline=False):
+    """
+    Template helper: URL of a stored artifact, downloaded as name or shown inline.
+    """
+    params = {"name": name} if name else {}
+    if inline:
+        params["inline"] = 1
+    return url_for("main.artifact", key=key, **params)
+
+
+def send_stored(key, download_name=None, as_attachment=True):
+    """
+    Serve an artifact from the store. Its key is a content hash, so it can be cached forever.
+    Artifacts are user-supplied content, so the response is sandboxed: an uploaded SVG opened
+    directly cannot run scripts in the app's origin.
+    """
+    if not KEY_RE.match(key):
+        return "Unknown file", 404
+    try:
+        path = get_store().local_path(key)
+    except FileNotFoundError:
+        return "Unknown file", 404
+    response = send_artifact(os.path.dirname(path), os.path.basename(path), as_attachment=as_attachment,
+                             download_name=download_name, immutable=True)
+    response.headers["Content-Security-Policy"] = ARTIFACT_CSP
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+@bp.app_errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    headers = {"Retry-After": str(error.retry_after)} if error.retry_after else {}
+    return str(error), error.status, headers
+
+
+@bp.route("/metrics")
+def metrics():
+    return Response(metrics_text(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/download_zip/<job_id>")
+def download_zip(job_id):
+    job = load_print_job(current_app.root_path, job_id)
+    if job is None:
+        return "Unknown download", 404
+    if not job.get("zip_key"):
+        # The print render is produced on first download, not during upload
+        with admission_slot(estimate_render_cost(job)):
+            job = ensure_print_render(job_id, job)
+    return send_stored(job["zip_key"], job["zip_filename"])
+
+
+@bp.route("/artifact/<key>")
+def artifact(key):
+    return send_stored(key, request.args.get("name"), as_attachment=not request.args.get("inline"))
+
+
+def get_profile_from_form(form, default=DEFAULT_PROFILE, default_dpi=None):
+    """
+    Read the output profile, optional DPI override and piece nesting choice from a submitted form.
+    Both the upload and the rescale form carry the nesting checkbox, so unticking it turns nesting off;
+    a rescale without a DPI keeps the one stored with the pattern (default_dpi).
+    Raises ValueError for unknown profiles and out-of-range DPI.
+    """
+    return get_profile(form.get("output_profile") or default, dpi=safe_float(form.get("dpi"), default_dpi),
+                       nest=bool(form.get("nest")))
 
 
-@app.route("/upload", methods=["GET", "POST"])
+def check_profile_for_pattern(meta, profile):
+    """
+    PDFs on the raster fallback can only be printed as tiles: sheet and roll profiles would render
+    the SVG conversion that was judged pathological. Raises ValueError for those.
+    """
+    if meta.get("raster_fallback") and profile["mode"] != "tiled":
+        raise ValueError("this PDF is too complex for plotter output, choose a tiled profile (A4, Letter or A3)")
+
+
+def prepare_pdf_outputs(meta, filename, scale_x, scale_y, profile):
+    """
+    Render the previews and schedule the print job for a PDF pattern handle.
+    PDFs whose SVG conversion was pathological use the raster fallback: previews come straight
+    from the PDF and tiles are rendered from it page by page.
+    Previews are rendered in a private directory, so concurrent requests never see each other's files.
+    Returns (preview artifact keys, print job id, zip filename).
+    """
+    raster_pdf = meta["source_path"] if meta.get("raster_fallback") else None
+    work_dir = tempfile.mkdtemp(prefix="previews_")
+    try:
+        if raster_pdf:
+            previews = render_raster_previews(raster_pdf, scale_x, scale_y, work_dir)
+        else:
+            previews = render_previews(meta["svg_paths"], scale_x, scale_y, work_dir)
+        store = get_store()
+        preview_keys = [store.put_file(os.path.join(work_dir, "resized", name)) for name in previews]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    zip_filename = get_zip_filename(filename)
+    job_id = schedule_print_render(meta["handle"], zip_filename, filename, scale_x, scale_y, profile,
+                                   raster=bool(raster_pdf))
+    return preview_keys, job_id, zip_filename
+
+
+@bp.route("/upload", methods=["GET", "POST"])
 def upload_file():
     """
     Handle file upload, AI-based resizing, and display the result.
     Supports both PDF and SVG formats.
     """
     if request.method == "POST":
-        # Get pattern type and measurements from user
-        pattern_type, bust, waist, hips, original_size = extract_user_meas(request)
+        # Every upload works in its own directory, so concurrent requests never see each other's files
+        upload_dir = tempfile.mkdtemp(prefix="upload_")
+        try:
+            return process_upload(upload_dir)
+        finally:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+    return render_template("upload.html", profiles=OUTPUT_PROFILES, default_profile=DEFAULT_PROFILE)
 
-        file = request.files.get("svg_file")
-        if not file or not is_file_allowed(file.filename, {"svg", "pdf"}):
-            return "Please upload a valid SVG or PDF file.", 400
 
-        filename, filepath, upload_dir = prepare_upload_path(file.filename, app.root_path)
-        clean_upload_dir(upload_dir)
-        try:
-            save_uploaded_file(file, filepath)
-        except ValueError:
-            return "Unsupported file type", 400
-        print(f"Uploaded filename: {filename}")
+def process_upload(upload_dir):
+    """
+    Save, convert and scale a submitted pattern in upload_dir and render the result page.
+    Everything worth keeping goes to the pattern handle and the artifact store; upload_dir is deleted afterwards.
+    """
+    # Get pattern type and measurements from user
+    pattern_type, bust, waist, hips, original_size = extract_user_meas(request)
+    torso_height = safe_float(request.form.get("torso_height"))
+
+    file = request.files.get("svg_file")
+    if not file or not is_file_allowed(file.filename, {"svg", "pdf"}):
+        return "Please upload a valid SVG or PDF file.", 400
+
+    filename, filepath = prepare_upload_path(file.filename, upload_dir)
+    try:
+        file_type = save_uploaded_file(file, filepath)
+    except ValueError:
+        return "Unsupported file type", 400
+    print(f"Uploaded filename: {filename}")
+    handle = file_handle(filepath)
+    cached = load_handle(current_app.root_path, handle)
+    try:
+        cost = estimate_upload_cost(filepath, file_type)
+    except Exception as e:
+        print(f"Error estimating job cost: {e}")
+        return "Could not read the uploaded file", 400
+    if cached is None:
         try:
-            summary, svg_paths = get_summary_svg_paths(
-                filepath,
-                upload_dir,
-                convert_pdf_to_svgs,
-                summarize_svg_pattern
-            )
+            # Large PDFs queue in their own lane so quick SVG resizes are not stuck behind them
+            with admission_slot(cost):
+                summary, svg_paths = get_summary_svg_paths(
+                    filepath,
+                    upload_dir,
+                    convert_pdf_to_svgs,
+                    summarize_svg_pattern
+                )
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"Error in get_summary_and_svg_paths: {e}")
             return "Failed to process uploaded file", 500
-        if filename.lower().endswith(".pdf"):
-            trimmed_summary = "\n".join(summary.splitlines()[:10])
-            user_meas_str = build_user_meas_str(bust, waist, hips)
-            scale_x, scale_y = get_scale_factors(original_size, bust, hips, SIZE_CHART)
-            resize_response = get_pattern_parameters(pattern_type, trimmed_summary, user_meas_str, original_size)
-            resized_pngs, resized_svgs = generate_scaled(svg_paths, scale_x, scale_y, upload_dir)
-            zip_filename, zip_path = zip_pngs(resized_pngs, upload_dir, filename)
-            instructions = get_sewing_instructions(pattern_type, user_meas_str)
-            save_upload_to_db(
-                filename, "pdf", pattern_type, zip_filename,
-                bust, waist, hips, safe_float(request.form.get("torso_height")), original_size,
-                scale_x, scale_y, resize_response, instructions
-            )
-            return render_template(
-                "upload_result.html",
-                **build_render_context(filename, bust, waist, hips, instructions, zip_filename=zip_filename)
-            )
-        # For gpt
-        trimmed_summary, user_meas_str, scale_x, scale_y, resize_response = prepare_resize_params(
-            summary, bust, waist, hips, original_size, pattern_type, SIZE_CHART
+        if not svg_paths:
+            # Not cached, so a later upload of the same file gets a fresh conversion attempt
+            print(f"No SVG pages were created for {filename}")
+            return "Could not convert the uploaded PDF", 500
+        cached = save_handle(current_app.root_path, handle, filepath, filename, file_type, summary, svg_paths)
+        if file_type == "pdf":
+            cached["raster_fallback"] = svg_conversion_is_pathological(cached["svg_paths"])
+            update_handle(current_app.root_path, handle, raster_fallback=cached["raster_fallback"])
+    summary, svg_paths = cached["summary"], cached["svg_paths"]
+    remember_handle(session, handle)
+    if file_type == "pdf":
+        trimmed_summary = "\n".join(summary.splitlines()[:10])
+        user_meas_str = build_user_meas_str(bust, waist, hips)
+        scale_x, scale_y = get_scale_factors(original_size, bust, hips, SIZE_CHART)
+        resize_response = get_pattern_parameters(pattern_type, trimmed_summary, user_meas_str, original_size)
+        try:
+            profile = get_profile_from_form(request.form)
+            check_profile_for_pattern(cached, profile)
+        except ValueError as e:
+            return f"Unsupported output profile: {e}", 400
+        with admission_slot(cost):
+            previews, print_job, zip_filename = prepare_pdf_outputs(cached, filename, scale_x, scale_y, profile)
+        upload_id = save_upload_to_db(
+            filename, "pdf", pattern_type, zip_filename,
+            bust, waist, hips, torso_height, original_size,
+            scale_x, scale_y, resize_response, None
         )
-        # Parse scale factors
-        scale_x = scale_y = 1.0
-        for line in resize_response.splitlines():
-            if "scale_x" in line:
-                scale_x = float(line.split("=", 1)[1].strip())
-            if "scale_y" in line:
-                scale_y = float(line.split("=", 1)[1].strip())
-        if scale_y == 1.0:
-            vertical = safe_float(request.form.get("torso_height"))
-            base_vertical = 30
-            if vertical and base_vertical:
-                scale_y = vertical / base_vertical
-        scaled_svg, output_path = scale_and_save_svg(filepath, filename, scale_x, scale_y)
-        # For gemini
-        instructions = get_sewing_instructions(pattern_type, user_meas_str)
-        save_upload_to_db(
-            filename, "svg", pattern_type, None,
-            bust, waist, hips, safe_float(request.form.get("torso_height")), original_size,
-            scale_x, scale_y, resize_response, instructions
+        update_handle(current_app.root_path, handle, pattern_type=pattern_type, original_size=original_size,
+                      output_profile=profile["name"], dpi=profile.get("dpi"), nest=profile.get("nest", False))
+        return render_template(
+            "upload_result.html",
+            **build_render_context(filename, bust, waist, hips, None, print_job=print_job,
+                                   handle=handle, previews=previews, nest=profile.get("nest", False),
+                                   dpi=profile.get("dpi"),
+                                   instructions_stream=queue_instructions(upload_id, pattern_type,
+                                                                          user_meas_str, handle))
         )
-        print(f"Received pattern_type: {pattern_type}")
-        print("Download filename:", filename)
+    # For gpt
+    resize_response, user_meas_str = prepare_resize_params(
+        pattern_type, summary, bust, waist, hips, original_size, get_pattern_parameters
+    )
+    scale_x, scale_y = parse_scale_factors(resize_response)
+    # Rescales start from these factors, so they agree with what this upload produced
+    base_scale = {"scale_x": scale_x, "scale_y": scale_y, "bust": bust, "hips": hips}
+    scale_y = apply_torso_height(scale_y, torso_height)
+    _, output_path = scale_and_save_svg(filepath, filename, scale_x, scale_y,
+                                        os.path.join(upload_dir, "scaled"))
+    scaled_key = get_store().put_file(output_path)
+    upload_id = save_upload_to_db(
+        filename, "svg", pattern_type, None,
+        bust, waist, hips, torso_height, original_size,
+        scale_x, scale_y, resize_response, None
+    )
+    update_handle(current_app.root_path, handle, pattern_type=pattern_type, original_size=original_size,
+                  base_scale=base_scale)
+    print(f"Received pattern_type: {pattern_type}")
+    print("Download filename:", filename)
+    # For gemini: instructions stream in after the page has rendered
+    return render_template(
+        "upload_result.html",
+        **build_render_context(filename, bust, waist, hips, None, handle=handle, scaled_key=scaled_key,
+                               instructions_stream=queue_instructions(upload_id, pattern_type,
+                                                                      user_meas_str, handle))
+    )
+
+
+@bp.route("/rescale/<handle>", methods=["POST"])
+def rescale(handle):
+    """
+    Re-scale a previously uploaded pattern with new measurements.
+    Reuses the cached page SVGs and summary of the handle, so only the scaling and rendering run again.
+    """
+    meta = load_handle(current_app.root_path, handle)
+    if meta is None or not owns_handle(session, handle):
+        return "Unknown pattern handle", 404
+    _, bust, waist, hips, original_size = extract_user_meas(request)
+    original_size = original_size or meta.get("original_size")
+    pattern_type = meta.get("pattern_type")
+    torso_height = safe_float(request.form.get("torso_height"))
+    instructions = meta.get("instructions")
+    user_meas_str = build_user_meas_str(bust, waist, hips)
+    filename = meta["filename"]
+    scale_x, scale_y = get_scale_factors(original_size, bust, hips, SIZE_CHART)
+
+    if meta["file_type"] == "pdf":
+        try:
+            profile = get_profile_from_form(request.form, meta.get("output_profile", DEFAULT_PROFILE),
+                                            meta.get("dpi"))
+            check_profile_for_pattern(meta, profile)
+        except ValueError as e:
+            return f"Unsupported output profile: {e}", 400
+        with admission_slot(estimate_upload_cost(meta["source_path"], "pdf")):
+            previews, print_job, zip_filename = prepare_pdf_outputs(meta, filename, scale_x, scale_y, profile)
+        upload_id = save_upload_to_db(
+            filename, "pdf", pattern_type, zip_filename,
+            bust, waist, hips, torso_height, original_size,
+            scale_x, scale_y, f"scale_x = {scale_x}\nscale_y = {scale_y}", instructions,
+            source="size_chart"
+        )
+        update_handle(current_app.root_path, handle, dpi=profile.get("dpi"), nest=profile.get("nest", False))
+        stream = None if instructions else queue_instructions(upload_id, pattern_type, user_meas_str, handle)
         return render_template(
             "upload_result.html",
-            bust=bust,
-            waist=waist,
-            hips=hips,
-            scaled_svg=scaled_svg,
-            filename=filename,
-            instructions=instructions,
-            zipfile=None
+            **build_render_context(filename, bust, waist, hips, instructions, print_job=print_job,
+                                   handle=handle, previews=previews, nest=profile.get("nest", False),
+                                   dpi=profile.get("dpi"),
+                                   instructions_stream=stream)
         )
+    # SVG uploads were scaled with the AI's factors; derive from those rather than the size chart
+    scale_source = "size_chart"
+    if meta.get("base_scale"):
+        scale_x, scale_y = derive_scale_factors(meta["base_scale"], bust, hips)
+        scale_source = "derived"
+    scale_y = apply_torso_height(scale_y, torso_height)
+    scaled_dir = tempfile.mkdtemp(prefix="rescale_")
+    try:
+        _, output_path = scale_and_save_svg(meta["source_path"], filename, scale_x, scale_y, scaled_dir)
+        scaled_key = get_store().put_file(output_path)
+    finally:
+        shutil.rmtree(scaled_dir, ignore_errors=True)
+    upload_id = save_upload_to_db(
+        filename, "svg", pattern_type, None,
+        bust, waist, hips, torso_height, original_size,
+        scale_x, scale_y, f"scale_x = {scale_x}\nscale_y = {scale_y}", instructions,
+        source=scale_source
+    )
+    stream = None if instructions else queue_instructions(upload_id, pattern_type, user_meas_str, handle)
+    return render_template(
+        "upload_result.html",
+        **build_render_context(filename, bust, waist, hips, instructions, handle=handle, scaled_key=scaled_key,
+                               instructions_stream=stream)
+    )
 
-    return render_template("upload.html")
 
+def queue_instructions(upload_id, pattern_type, user_meas_str, handle=None):
+    """
+    Record what to ask the AI for in the artifact store under a new job id, so any node can stream it,
+    and return the stream URL for the result page. The user's session lists the job ids they may stream.
+    upload_id is only meaningful in this node's database, so it is stored together with that database's id.
+    """
+    job_id = uuid.uuid4().hex
+    get_store().put_ref(INSTRUCTION_REF_PREFIX + job_id, {
+        "pattern_type": pattern_type,
+        "measurements": user_meas_str,
+        "handle": handle,
+        "database": database_id(),
+        "upload_id": upload_id,
+    })
+    # Keep only the most recent jobs so the session cookie stays small
+    session[INSTRUCTION_JOBS_KEY] = (list(session.get(INSTRUCTION_JOBS_KEY, [])) + [job_id])[-5:]
+    return url_for("main.stream_instructions", job_id=job_id)
 
-@app.route("/download/<filename>")
-def download_scaled(filename):
-    scaled_dir = os.path.join(os.path.dirname(app.root_path), "scaled")
-    return send_from_directory(scaled_dir, filename, as_attachment=True)
 
+def sse_event(data, event=None):
+    """
+    Format one Server-Sent Event. Data is JSON-encoded so newlines survive.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-@app.route("/generate", methods = ["POST"])
-def generate():
+
+@bp.route("/instructions/<job_id>/stream")
+def stream_instructions(job_id):
     """
-    Generate a pattern SVG (e.g., bikini top/bottom) based on user input and AI logic.
+    Stream sewing instructions for an upload as Server-Sent Events while the AI generates them.
+    Generation runs in the background, once per job on this node, and finishes even if the browser
+    disconnects; further tabs and reconnects follow the same generation. The completed text is saved
+    with the job in the artifact store and to the pattern handle, if any; the node whose database
+    recorded the upload also saves it to ai_responses.
     """
-    pattern_type = request.form["pattern"]
+    if job_id not in session.get(INSTRUCTION_JOBS_KEY, []):
+        return "Unknown upload", 404
+    store = get_store()
+    job = store.get_ref(INSTRUCTION_REF_PREFIX + job_id)
+    if job is None:
+        return "Unknown upload", 404
+    app = current_app._get_current_object()
+
+    def generate():
+        return stream_sewing_instructions(job["pattern_type"], job["measurements"])
+
+    def save(instructions):
+        with app.app_context():
+            store.put_ref(INSTRUCTION_REF_PREFIX + job_id, dict(job, instructions=instructions))
+            if job["database"] == database_id():
+                save_instructions_to_db(job["upload_id"], instructions)
+            if job["handle"]:
+                update_handle(app.root_path, job["handle"], instructions=instructions)
+
+    def stored_text():
+        return (store.get_ref(INSTRUCTION_REF_PREFIX + job_id) or {}).get("instructions")
 
+    def events():
+        if job.get("instructions") is not None:
+            yield sse_event(job["instructions"])
+            yield sse_event({}, event="done")
+            return
+        generation = start_generation(job_id, generate, save, stored_text)
+        try:
+            for chunk in generation.follow():
+                yield sse_event(chunk)
+        except RuntimeError:
+            yield sse_event("Could not generate sewing instructions.", event="error")
+            return
+        yield sse_event({}, event="done")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def generate_ai_styled(pattern_type):
+    """
+    Optional stylistic layer: ask the AI for the piece dimensions and draw the legacy shapes.
+    Returns (svg, error_response).
+    """
     if pattern_type == "bikini_top":
         bust_str = request.form.get("bust", "").strip()
         if not bust_str:
-            return "Error: Bust measurement is required for bikini top.", 400
-        bust = float(bust_str)
-        user_meas_str = f"bust = {bust}"
-        ai_response = generate_pattern_params_bikini_top(user_measurements=user_meas_str)
-        try:
-            dims = parse_dimensions(ai_response, ["width", "height"])
-            width = dims["width"]
-            height = dims["height"]
-            svg = generate_bikini_top(width, height)
-        except Exception as e:
-            return f"Error parsing AI response: {e}", 500
-
-    elif pattern_type == "bikini_bottom":
-        waist_str = request.form.get("waist","").strip()
+            return None, ("Error: Bust measurement is required for bikini top.", 400)
+        ai_response = generate_pattern_params_bikini_top(user_measurements=f"bust = {float(bust_str)}")
+        draw = generate_bikini_top
+    else:
+        waist_str = request.form.get("waist", "").strip()
         if not waist_str:
-            return "Error: Waist measurement is required for bikini bottom.", 400
-        waist = float(waist_str)
-        ai_response = generate_pattern_params_bikini_bottom(user_measurements=waist)
-        try:
-            dims = parse_dimensions(ai_response, ["width", "height"])
-            width = dims["width"]
-            height = dims["height"]
+            return None, ("Error: Waist measurement is required for bikini bottom.", 400)
+        ai_response = generate_pattern_params_bikini_bottom(user_measurements=float(waist_str))
+        draw = generate_bikini_bottom
+    try:
+        dims = parse_dimensions(ai_response, ["width", "height"])
+        return draw(dims["width"], dims["height"]), None
+    except Exception as e:
+        return None, (f"Error parsing AI response: {e}", 500)
 
-            svg = generate_bikini_bottom(width, height)
 
-        except Exception as e:
-            return f"Error parsing AI response: {e}", 500
+@bp.route("/generate", methods = ["POST"])
+def generate():
+    """
+    Generate a pattern SVG (bikini top/bottom, corset) from the user's measurements.
+    Drafted locally by default; the AI is only used when a stylised bikini is requested.
+    """
+    pattern_type = request.form["pattern"]
+    if pattern_type not in DRAFTERS:
+        return render_template("result.html", svg="<p>Invalid pattern</p>")
+    measurements = {k: safe_float(request.form.get(k), None) for k in ("bust", "waist", "hips")}
+    try:
+        check_measurements(**measurements)
+    except ValueError as e:
+        return f"Error: {e}", 400
+
+    if request.form.get("ai_style") and pattern_type in ("bikini_top", "bikini_bottom"):
+        svg, error = generate_ai_styled(pattern_type)
+        if error:
+            return error
     else:
-        svg = "<p>Invalid pattern</p>"
+        required = REQUIRED_MEASUREMENTS[pattern_type]
+        if not any(measurements[k] for k in required):
+            return f"Error: {' or '.join(required).capitalize()} measurement is required.", 400
+        svg = draft_pattern(pattern_type, **measurements)
     print("Rendering SVG:", svg[:200])
     return render_template("result.html", svg = svg)
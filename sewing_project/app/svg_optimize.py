@@ -0,0 +1,310 @@
+"""
+Optimizer pass for pdf2svg output: rounds coordinates, flattens redundant groups, deduplicates glyph symbols,
+drops invisible elements and optionally simplifies straight-line paths, so every later stage has less to parse and render.
+"""
+import os
+import re
+import time
+import xml.etree.ElementTree as Et
+
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+
+G = f"{{{SVG_NS}}}g"
+DEFS = f"{{{SVG_NS}}}defs"
+SYMBOL = f"{{{SVG_NS}}}symbol"
+USE = f"{{{SVG_NS}}}use"
+PATH = f"{{{SVG_NS}}}path"
+XLINK_HREF = f"{{{XLINK_NS}}}href"
+NUMERIC_ATTRIBUTES = ("d", "points", "transform", "x", "y", "x1", "y1", "x2", "y2",
+                      "cx", "cy", "r", "rx", "ry", "width", "height", "style", "stroke-width")
+NUMBER_RE = re.compile(r"-?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?")
+LINE_ONLY_PATH_RE = re.compile(r"^[MLZmlz\d\s.,eE+-]+$")
+
+
+def round_numbers(value, precision):
+    """
+    Round every decimal number in an attribute value and strip trailing zeros.
+    """
+    def fmt(match):
+        text = f"{float(match.group()):.{precision}f}".rstrip("0").rstrip(".")
+        return "0" if text in ("-0", "") else text
+    return NUMBER_RE.sub(fmt, value)
+
+
+def is_invisible(elem):
+    """
+    Check whether an element and everything inside it can never render.
+    Hidden visibility does not count: a child can set visibility="visible" and still be drawn.
+    """
+    style = elem.get("style", "").replace(" ", "")
+    return (
+        elem.get("display") == "none"
+        or elem.get("opacity") in ("0", "0.0")
+        or "display:none" in style
+        or re.search(r"(^|;)opacity:0(\.0*)?(;|$)", style) is not None
+    )
+
+
+def remove_invisible(parent):
+    """
+    Recursively drop invisible elements and groups left empty, outside of <defs>.
+    """
+    for child in list(parent):
+        if child.tag == DEFS:
+            continue
+        if is_invisible(child):
+            parent.remove(child)
+            continue
+        remove_invisible(child)
+        if child.tag == G and len(child) == 0:
+            parent.remove(child)
+
+
+def flatten_groups(parent):
+    """
+    Splice attribute-less groups into their parent, and push a transform-only group's
+    transform down onto its single child.
+    """
+    index = 0
+    while index < len(parent):
+        child = parent[index]
+        flatten_groups(child)
+        if child.tag == G and not child.attrib:
+            parent.remove(child)
+            for offset, grandchild in enumerate(list(child)):
+                parent.insert(index + offset, grandchild)
+            index += len(child)
+            continue
+        if child.tag == G and set(child.attrib) == {"transform"} and len(child) == 1:
+            grandchild = child[0]
+            transform = child.get("transform")
+            if grandchild.get("transform"):
+                transform = f"{transform} {grandchild.get('transform')}"
+            grandchild.set("transform", transform)
+            parent.remove(child)
+            parent.insert(index, grandchild)
+        index += 1
+
+
+def symbol_key(symbol):
+    """
+    Content key of a symbol, ignoring its id.
+    """
+    attrs = sorted((k, v) for k, v in symbol.attrib.items() if k != "id")
+    return repr(attrs) + "".join(Et.tostring(child, encoding="unicode") for child in symbol)
+
+
+def is_empty_symbol(symbol):
+    """
+    A symbol draws nothing when it has no children or only empty paths (e.g. space glyphs).
+    """
+    return all(child.tag == PATH and not child.get("d", "").strip() for child in symbol)
+
+
+def dedupe_symbols(root):
+    """
+    Merge identical <symbol> definitions, rewrite <use> references to the survivor,
+    and drop symbols that draw nothing together with the <use> elements pointing at them.
+    Returns the number of symbols removed.
+    """
+    parents = {child: parent for parent in root.iter() for child in parent}
+    canonical = {}
+    replacements = {}
+    empty_ids = set()
+    for symbol in list(root.iter(SYMBOL)):
+        symbol_id = symbol.get("id")
+        if not symbol_id:
+            continue
+        if is_empty_symbol(symbol):
+            empty_ids.add(symbol_id)
+            parents[symbol].remove(symbol)
+            continue
+        key = symbol_key(symbol)
+        if key in canonical:
+            replacements[symbol_id] = canonical[key]
+            parents[symbol].remove(symbol)
+        else:
+            canonical[key] = symbol_id
+
+    for use in list(root.iter(USE)):
+        href_attr = XLINK_HREF if use.get(XLINK_HREF) is not None else "href"
+        target = (use.get(href_attr) or "").lstrip("#")
+        if target in empty_ids:
+            parents[use].remove(use)
+        elif target in replacements:
+            use.set(href_attr, "#" + replacements[target])
+    return len(replacements) + len(empty_ids)
+
+
+def rdp(points, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification of a list of (x, y) points.
+    """
+    if len(points) < 3:
+        return points
+    (x1, y1), (x2, y2) = points[0], points[-1]
+    dx, dy = x2 - x1, y2 - y1
+    length = (dx * dx + dy * dy) ** 0.5
+    max_dist, max_index = 0.0, 0
+    for i in range(1, len(points) - 1):
+        px, py = points[i]
+        if length:
+            dist = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / length
+        else:
+            dist = ((px - x1) ** 2 + (py - y1) ** 2) ** 0.5
+        if dist > max_dist:
+            max_dist, max_index = dist, i
+    if max_dist <= tolerance:
+        return [points[0], points[-1]]
+    return rdp(points[:max_index + 1], tolerance)[:-1] + rdp(points[max_index:], tolerance)
+
+
+def parse_points(text):
+    """
+    Parse 'x1,y1 x2,y2 ...' into a list of (x, y) tuples.
+    """
+    numbers = [float(n) for n in re.findall(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?", text)]
+    return list(zip(numbers[0::2], numbers[1::2]))
+
+
+def format_points(points):
+    """
+    Format (x, y) tuples back into an SVG points list.
+    """
+    return " ".join(f"{x:g},{y:g}" for x, y in points)
+
+
+def simplify_polylines(root, tolerance):
+    """
+    Simplify polylines, polygons and absolute straight-line-only paths (M/L/Z) with RDP.
+    """
+    for elem in root.iter():
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if tag in ("polyline", "polygon") and elem.get("points"):
+            elem.set("points", format_points(rdp(parse_points(elem.get("points")), tolerance)))
+        elif tag == "path":
+            d = elem.get("d", "")
+            if not d or not LINE_ONLY_PATH_RE.match(d) or re.search(r"[mlz]", d):
+                continue
+            subpaths = []
+            for part in re.split(r"(?=M)", d.replace("L", " ")):
+                if not part.strip():
+                    continue
+                closed = "Z" in part
+                points = rdp(parse_points(part.replace("M", "").replace("Z", "")), tolerance)
+                if points:
+                    head, rest = points[0], points[1:]
+                    subpath = f"M {head[0]:g} {head[1]:g}" + "".join(f" L {x:g} {y:g}" for x, y in rest)
+                    subpaths.append(subpath + (" Z" if closed else ""))
+            elem.set("d", " ".join(subpaths))
+
+
+def serialize_svg(root):
+    """
+    Serialize an optimized SVG root with SVG as the default namespace and the usual xlink prefix.
+    Prefixes are written per document rather than registered with ElementTree, which would change
+    how every other module serializes XML.
+    """
+    if not root.tag.startswith(f"{{{SVG_NS}}}"):
+        return Et.tostring(root, encoding="unicode")
+    uses_xlink = False
+    for elem in root.iter():
+        if elem.tag.startswith(f"{{{SVG_NS}}}"):
+            elem.tag = elem.tag.split("}", 1)[1]
+        for name in [name for name in elem.attrib if name.startswith(f"{{{XLINK_NS}}}")]:
+            elem.set("xlink:" + name.split("}", 1)[1], elem.attrib.pop(name))
+            uses_xlink = True
+    root.set("xmlns", SVG_NS)
+    if uses_xlink:
+        root.set("xmlns:xlink", XLINK_NS)
+    return Et.tostring(root, encoding="unicode")
+
+
+def optimize_svg(svg_content, precision=3, simplify_tolerance=None):
+    """
+    Optimize an SVG string.
+    Returns (optimized SVG string, stats dict with element and byte counts before and after).
+    """
+    root = Et.fromstring(svg_content)
+    elements_before = sum(1 for _ in root.iter())
+
+    remove_invisible(root)
+    symbols_removed = dedupe_symbols(root)
+    flatten_groups(root)
+    if simplify_tolerance:
+        simplify_polylines(root, simplify_tolerance)
+    for elem in root.iter():
+        for attr in NUMERIC_ATTRIBUTES:
+            value = elem.get(attr)
+            if value:
+                # Transforms carry scale factors, where 3 decimals would distort the printed size
+                elem.set(attr, round_numbers(value, precision + 3 if attr == "transform" else precision))
+
+    elements_after = sum(1 for _ in root.iter())
+    optimized = serialize_svg(root)
+    stats = {
+        "elements_before": elements_before,
+        "elements_after": elements_after,
+        "bytes_before": len(svg_content.encode("utf-8")),
+        "bytes_after": len(optimized.encode("utf-8")),
+        "symbols_removed": symbols_removed,
+    }
+    return optimized, stats
+
+
+def optimize_svg_files(svg_paths, precision=3, simplify_tolerance=None):
+    """
+    Optimize SVG files in place. Files that fail to parse are left untouched.
+    Returns the summed stats across all files.
+    """
+    totals = {"elements_before": 0, "elements_after": 0, "bytes_before": 0, "bytes_after": 0, "symbols_removed": 0}
+    for svg_path in svg_paths:
+        with open(svg_path, "r", encoding="utf-8") as f:
+            svg_content = f.read()
+        try:
+            optimized, stats = optimize_svg(svg_content, precision, simplify_tolerance)
+        except Et.ParseError as e:
+            print(f"Skipping SVG optimization for {svg_path}: {e}")
+            continue
+        tmp_path = svg_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(optimized)
+        os.replace(tmp_path, svg_path)
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def format_stats(stats):
+    """
+    One-line human readable summary of optimizer stats.
+    """
+    def pct(before, after):
+        return 100.0 * (before - after) / before if before else 0.0
+    return (f"elements {stats['elements_before']} -> {stats['elements_after']} "
+            f"(-{pct(stats['elements_before'], stats['elements_after']):.1f}%), "
+            f"bytes {stats['bytes_before']} -> {stats['bytes_after']} "
+            f"(-{pct(stats['bytes_before'], stats['bytes_after']):.1f}%)")
+
+
+def compare_render_time(svg_content, optimized_content, repeat=3):
+    """
+    Time rendering the original and the optimized SVG to PNG with cairosvg.
+    Returns {"before": seconds, "after": seconds, "speedup": ratio}.
+    """
+    import cairosvg
+
+    def best_time(content):
+        data = content.encode("utf-8")
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cairosvg.svg2png(bytestring=data)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    before = best_time(svg_content)
+    after = best_time(optimized_content)
+    return {"before": before, "after": after, "speedup": before / after if after else 0.0}
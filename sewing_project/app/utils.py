@@ -4,10 +4,9 @@ Used throughout the pattern upload and resizing flow.
 """
 import os
 from werkzeug.utils import secure_filename
-from .resize import safe_float, scale_svg, resize_image, tile_image_to_a4
+from .resize import safe_float, scale_svg, resize_image, tile_image, iter_pdf_page_images
 from zipfile import ZipFile
 import re
-import cairosvg
 
 
 def build_user_meas_str(bust, waist, hips):
@@ -24,15 +23,6 @@ def build_user_meas_str(bust, waist, hips):
     return ", ".join(measurements)
 
 
-def clean_upload_dir(upload_dir):
-    """
-    Delete all files in the given upload directory.
-    """
-    for root, dirs, files in os.walk(upload_dir):
-        for file in files:
-            os.remove(os.path.join(root, file))
-
-
 def is_file_allowed(filename, allowed_extensions):
     """
     Check if a file's extension is in the allowed list.
@@ -40,16 +30,13 @@ def is_file_allowed(filename, allowed_extensions):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
 
-def prepare_upload_path(raw_filename, root_path):
+def prepare_upload_path(raw_filename, upload_dir):
     """
-    Create a clean upload directory and return the secure filename, full filepath, and upload directory path.
+    Return the secure filename and the full filepath for saving an upload in the request's upload directory.
     """
     filename = secure_filename(raw_filename)
-    upload_dir = os.path.join(root_path, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-    clean_upload_dir(upload_dir)
     filepath = os.path.join(upload_dir, filename)
-    return filename, filepath, upload_dir
+    return filename, filepath
 
 
 def save_uploaded_file(file, filepath):
@@ -83,6 +70,41 @@ def get_scale_factors(original_size, bust, hips, size_chart):
     return scale_x, scale_y
 
 
+def derive_scale_factors(base, bust, hips):
+    """
+    Re-derive scale_x and scale_y for new measurements from the factors an earlier upload was scaled with.
+    base holds that upload's scale_x, scale_y, bust and hips; a factor is kept when its measurement is missing.
+    """
+    scale_x, scale_y = base["scale_x"], base["scale_y"]
+    if bust and base.get("bust"):
+        scale_x *= bust / base["bust"]
+    if hips and base.get("hips"):
+        scale_y *= hips / base["hips"]
+    return scale_x, scale_y
+
+
+def parse_scale_factors(resize_response):
+    """
+    Read scale_x and scale_y from an AI resize response, defaulting to 1.0.
+    """
+    scale_x = scale_y = 1.0
+    for line in resize_response.splitlines():
+        if "scale_x" in line:
+            scale_x = float(line.split("=", 1)[1].strip())
+        if "scale_y" in line:
+            scale_y = float(line.split("=", 1)[1].strip())
+    return scale_x, scale_y
+
+
+def apply_torso_height(scale_y, torso_height, base_vertical=30):
+    """
+    Fall back to scaling vertically by torso height when no vertical scale was found.
+    """
+    if scale_y == 1.0 and torso_height and base_vertical:
+        return torso_height / base_vertical
+    return scale_y
+
+
 def extract_user_meas(request):
     """
     Extract pattern type and measurements from a Flask request.
@@ -122,11 +144,14 @@ def prepare_resize_params(pattern_type, summary, bust, waist, hips, original_siz
     return resize_response, user_meas_str
 
 
-def generate_scaled(svg_paths, scale_x, scale_y, upload_dir):
+def generate_scaled(svg_paths, scale_x, scale_y, upload_dir, paper="A4", dpi=300):
     """
-    Scale and convert SVGs to PNG, resize and tile them for printing.
+    Scale and convert SVGs to PNG, resize and tile them for printing on the given paper size.
     Returns lists of resized PNG and SVG file paths.
     """
+    import cairosvg
+
+    upscale = 3.0 * dpi / 300
     resized_svgs = []
     resized_pngs = []
     resized_dir = os.path.join(upload_dir, "resized")
@@ -144,34 +169,64 @@ def generate_scaled(svg_paths, scale_x, scale_y, upload_dir):
         try:
             cairosvg.svg2png(url=output_svg, write_to=output_png)
             resized_png_path = output_png.replace(".png", "_resized.png")
-            resize_image(output_png, resized_png_path, scale_x=3.0, scale_y=3.0)
-            tiled_paths = tile_image_to_a4(resized_png_path, resized_dir)
+            resize_image(output_png, resized_png_path, scale_x=upscale, scale_y=upscale)
+            tiled_paths = tile_image(resized_png_path, resized_dir, paper=paper, dpi=dpi)
             resized_pngs.extend(tiled_paths)
         except Exception as e:
             print(f"Error converting {output_svg} to PNG: {e}")
     return resized_pngs, resized_svgs
 
-def scale_and_save_svg(filepath, filename, scale_x, scale_y):
+def iter_raster_tiles(pdf_path, scale_x, scale_y, upload_dir, paper="A4", dpi=300):
+    """
+    Raster fallback for PDFs that convert poorly to SVG: render pages in chunks at print DPI,
+    scale each page and feed it straight into the tiler, yielding tile paths as they are written.
+    Intermediate page images are deleted as soon as their tiles exist.
+    """
+    resized_dir = os.path.join(upload_dir, "resized")
+    raster_dir = os.path.join(upload_dir, "raster_pages")
+    os.makedirs(resized_dir, exist_ok=True)
+    os.makedirs(raster_dir, exist_ok=True)
+    for idx, page_path in enumerate(iter_pdf_page_images(pdf_path, raster_dir, dpi=dpi)):
+        scaled_path = os.path.join(raster_dir, f"page_{idx + 1}.png")
+        try:
+            resize_image(page_path, scaled_path, scale_x=scale_x, scale_y=scale_y)
+            yield from tile_image(scaled_path, resized_dir, paper=paper, dpi=dpi)
+        except Exception as e:
+            print(f"Error tiling raster page {idx + 1}: {e}")
+        finally:
+            for path in (page_path, scaled_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def scale_and_save_svg(filepath, filename, scale_x, scale_y, output_dir):
     """
-    Apply scaling to an SVG file and save the result.
+    Apply scaling to an SVG file and save the result in output_dir.
     """
     with open(filepath, "r", encoding="utf-8") as f:
         svg_content = f.read()
     scaled_svg = scale_svg(svg_content, scale_x, scale_y)
-    output_path = os.path.join("scaled", f"scaled_{filename}")
-    os.makedirs("scaled", exist_ok=True)
+    output_path = os.path.join(output_dir, f"scaled_{filename}")
+    os.makedirs(output_dir, exist_ok=True)
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(scaled_svg)
     return scaled_svg, output_path
 
 
+def get_zip_filename(filename):
+    """
+    Return the download ZIP filename for an uploaded pattern file.
+    """
+    return f"resized_{os.path.splitext(filename)[0]}.zip"
+
+
 def zip_pngs(resized_pngs, upload_dir, filename):
     """
     Zip the list of resized PNG files and return the ZIP filename and path.
     """
     resized_dir = os.path.join(upload_dir, "resized")
     os.makedirs(resized_dir, exist_ok=True)
-    zip_filename = f"resized_{os.path.splitext(filename)[0]}.zip"
+    zip_filename = get_zip_filename(filename)
     zip_path = os.path.join(resized_dir, zip_filename)
     with ZipFile(zip_path, 'w') as zipf:
         for png_file in resized_pngs:
@@ -182,7 +237,9 @@ def zip_pngs(resized_pngs, upload_dir, filename):
     return zip_filename, zip_path
 
 
-def build_render_context(filename, bust, waist, hips, instructions, zip_filename=None, scaled_svg=None):
+def build_render_context(filename, bust, waist, hips, instructions, print_job=None,
+                         handle=None, previews=None, instructions_stream=None, scaled_key=None, nest=False,
+                         dpi=None):
     """
     Prepare data dictionary to render the result HTML page.
     """
@@ -192,8 +249,13 @@ def build_render_context(filename, bust, waist, hips, instructions, zip_filename
         "waist": waist,
         "hips": hips,
         "instructions": instructions,
-        "zipfile": zip_filename,
-        "scaled_svg": scaled_svg
+        "print_job": print_job,
+        "scaled_key": scaled_key,
+        "handle": handle,
+        "previews": previews or [],
+        "nest": nest,
+        "dpi": dpi,
+        "instructions_stream": instructions_stream
     }
 
 
@@ -0,0 +1,237 @@
+"""
+Batch resizing of a pattern library for standard sizes, without going through the web form.
+Every pattern file is converted once and rendered for each measurement set across a process pool.
+Finished outputs are keyed by content hash, so re-running the same command resumes where it stopped.
+
+Usage:
+    python batch_resize.py --input-dir patterns/ --original-size 38 --sizes 34 36 40 42 --output-dir graded/
+    python batch_resize.py --manifest jobs.csv --output-dir graded/ --workers 8
+
+Manifest CSV columns: file, original_size, bust, waist, hips (one row per file x measurement set).
+Rows without a known original_size fail instead of producing unscaled output.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.ai_calls import SIZE_CHART
+from app.database.db_helper import save_uploads_to_db
+from app.downloads import file_sha256
+from app.output_profiles import OUTPUT_PROFILES, DEFAULT_PROFILE, get_profile, render_for_profile
+from app.pdf_to_svg import convert_pdf_to_svgs
+from app.resize import safe_float
+from app.utils import get_scale_factors, zip_pngs
+
+
+PATTERN_EXTENSIONS = (".pdf", ".svg")
+RESULT_FILENAME = "result.json"
+
+
+def job_key(content_hash, measurements, profile_name):
+    """
+    Build the output key for one file x measurement set x profile.
+    """
+    raw = json.dumps([content_hash, measurements, profile_name], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def jobs_from_dir(input_dir, original_size, sizes):
+    """
+    Pair every PDF/SVG in a directory with the size chart measurements of each target size.
+    """
+    jobs = defaultdict(list)
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(PATTERN_EXTENSIONS):
+            continue
+        for size in sizes:
+            target = SIZE_CHART[size]
+            jobs[os.path.join(input_dir, name)].append({
+                "label": size,
+                "original_size": original_size,
+                "bust": target["bust"],
+                "waist": target["waist"],
+                "hips": target["hips"],
+            })
+    return jobs
+
+
+def jobs_from_manifest(manifest_path):
+    """
+    Read file x measurement set rows from a CSV manifest. Relative paths are resolved against the manifest.
+    """
+    jobs = defaultdict(list)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            path = os.path.join(base_dir, row["file"])
+            jobs[path].append({
+                "label": row.get("label") or f"row{i + 1}",
+                "original_size": row.get("original_size") or None,
+                "bust": safe_float(row.get("bust")),
+                "waist": safe_float(row.get("waist")),
+                "hips": safe_float(row.get("hips")),
+            })
+    return jobs
+
+
+def process_file(path, measurement_sets, output_dir, profile):
+    """
+    Convert one pattern file once and render it for each measurement set.
+    Skips measurement sets whose output already exists. Runs in a worker process.
+    Returns one result dict per measurement set.
+    """
+    content_hash = file_sha256(path)
+    filename = os.path.basename(path)
+    pending = []
+    results = []
+    for measurements in measurement_sets:
+        key = job_key(content_hash, measurements, profile["name"])
+        result_path = os.path.join(output_dir, key, RESULT_FILENAME)
+        if os.path.exists(result_path):
+            with open(result_path, "r", encoding="utf-8") as f:
+                results.append(dict(json.load(f), status="skipped"))
+        else:
+            pending.append((key, measurements))
+    if not pending:
+        return results
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if path.lower().endswith(".pdf"):
+            svg_paths = convert_pdf_to_svgs(path, os.path.join(work_dir, "svg_pages"))
+        else:
+            svg_paths = [path]
+        for key, measurements in pending:
+            job_dir = os.path.join(output_dir, key)
+            render_dir = os.path.join(work_dir, key)
+            os.makedirs(job_dir, exist_ok=True)
+            result = {"key": key, "file": path, "filename": filename, "measurements": measurements,
+                      "profile": profile["name"], "pages": len(svg_paths), "recorded": False}
+            try:
+                if measurements["original_size"] not in SIZE_CHART:
+                    # Without it get_scale_factors falls back to 1.0 and the output would be silently unscaled
+                    raise ValueError(f"unknown original size {measurements['original_size']!r}")
+                scale_x, scale_y = get_scale_factors(measurements["original_size"], measurements["bust"],
+                                                     measurements["hips"], SIZE_CHART)
+                outputs = render_for_profile(svg_paths, scale_x, scale_y, render_dir, profile)
+                zip_filename, zip_path = zip_pngs(outputs, render_dir,
+                                                  f"{os.path.splitext(filename)[0]}_{measurements['label']}")
+                shutil.move(zip_path, os.path.join(job_dir, zip_filename))
+                result.update(zip_filename=zip_filename, scale_x=scale_x, scale_y=scale_y, outputs=len(outputs))
+                write_result(job_dir, result)
+                result["status"] = "done"
+            except Exception as e:
+                result.update(status="failed", error=str(e))
+            results.append(result)
+    return results
+
+
+def write_result(job_dir, result):
+    """
+    Atomically write a job's result marker; its presence means the output is complete.
+    """
+    tmp_path = os.path.join(job_dir, RESULT_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, os.path.join(job_dir, RESULT_FILENAME))
+
+
+def record_results(results, output_dir, pattern_type):
+    """
+    Save finished results that are not yet in the database in one transaction, then mark them recorded.
+    """
+    unrecorded = [r for r in results if r["status"] in ("done", "skipped") and not r.get("recorded")]
+    if not unrecorded:
+        return 0
+    save_uploads_to_db([
+        {
+            "filename": r["filename"],
+            "file_type": os.path.splitext(r["filename"])[1].lstrip(".").lower(),
+            "pattern_type": pattern_type,
+            "download_filename": r["zip_filename"],
+            "bust": r["measurements"]["bust"],
+            "waist": r["measurements"]["waist"],
+            "hips": r["measurements"]["hips"],
+            "torso_height": None,
+            "original_size": r["measurements"]["original_size"],
+            "scale_x": r["scale_x"],
+            "scale_y": r["scale_y"],
+            "resize_response": f"scale_x = {r['scale_x']}\nscale_y = {r['scale_y']}",
+            "instructions": None,
+            "source": "batch",
+        }
+        for r in unrecorded
+    ])
+    for r in unrecorded:
+        r["recorded"] = True
+        write_result(os.path.join(output_dir, r["key"]), {k: v for k, v in r.items() if k != "status"})
+    return len(unrecorded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resize a library of pattern files for many measurement sets.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="Directory of PDF/SVG patterns")
+    source.add_argument("--manifest", help="CSV manifest of file x measurement rows")
+    parser.add_argument("--original-size", choices=list(SIZE_CHART),
+                        help="Size the patterns are drafted in (with --input-dir)")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZE_CHART), help="Target sizes (with --input-dir)")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--profile", choices=list(OUTPUT_PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--pattern-type", default=None, help="Pattern type stored with each result")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--db-batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.input_dir:
+        if not args.sizes or not args.original_size:
+            parser.error("--sizes and --original-size are required with --input-dir")
+        jobs = jobs_from_dir(args.input_dir, args.original_size, args.sizes)
+    else:
+        jobs = jobs_from_manifest(args.manifest)
+    profile = get_profile(args.profile)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    counts = defaultdict(int)
+    pages = 0
+    recorded = 0
+    to_record = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_file, path, sets, args.output_dir, profile): path
+                   for path, sets in jobs.items()}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"FAILED {futures[future]}: {e}")
+                counts["failed"] += len(jobs[futures[future]])
+                continue
+            for r in results:
+                counts[r["status"]] += 1
+                if r["status"] == "done":
+                    pages += r["pages"]
+                elif r["status"] == "failed":
+                    print(f"FAILED {r['file']} [{r['measurements']['label']}]: {r['error']}")
+            to_record.extend(results)
+            if len(to_record) >= args.db_batch_size:
+                recorded += record_results(to_record, args.output_dir, args.pattern_type)
+                to_record = []
+    recorded += record_results(to_record, args.output_dir, args.pattern_type)
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    print(f"{total} jobs in {elapsed:.1f}s: {counts['done']} done, {counts['skipped']} skipped, "
+          f"{counts['failed']} failed, {recorded} recorded to the database")
+    if elapsed and counts["done"]:
+        print(f"Throughput: {counts['done'] / elapsed:.2f} jobs/s, {pages / elapsed:.2f} pages/s "
+              f"with {args.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Benchmark output profiles on a sample pattern.
+Usage: python bench_profiles.py pattern.svg [--scale-x 1.1] [--scale-y 1.05] [--profiles a4 a0 roll_914] [--nest]
+"""
+import argparse
+import tempfile
+from app.output_profiles import OUTPUT_PROFILES, benchmark_profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each output profile on the same SVG input.")
+    parser.add_argument("svg_paths", nargs="+", help="SVG pages to render")
+    parser.add_argument("--scale-x", type=float, default=1.0)
+    parser.add_argument("--scale-y", type=float, default=1.0)
+    parser.add_argument("--profiles", nargs="*", choices=list(OUTPUT_PROFILES), default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--nest", action="store_true", help="Pack pattern pieces onto as few sheets as possible")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = benchmark_profiles(args.svg_paths, args.scale_x, args.scale_y, work_dir,
+                                     args.profiles, args.repeat, args.nest)
+    print(f"{'profile':<12}{'seconds':>10}{'outputs':>10}{'pages/s':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['seconds']:>10.3f}{result['outputs']:>10}{result['pages_per_second']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Report what the SVG optimizer saves on sample pages: element and byte reductions and render speedup.
+Usage: python bench_svg_optimize.py page_1.svg [page_2.svg ...] [--precision 3] [--simplify 0.05]
+"""
+import argparse
+from app.svg_optimize import optimize_svg, format_stats, compare_render_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SVG optimizer reductions and render speedup.")
+    parser.add_argument("svg_paths", nargs="+")
+    parser.add_argument("--precision", type=int, default=3)
+    parser.add_argument("--simplify", type=float, default=None, help="Polyline simplification tolerance")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for svg_path in args.svg_paths:
+        with open(svg_path, "r", encoding="utf-8") as f:
+            svg_content = f.read()
+        optimized, stats = optimize_svg(svg_content, args.precision, args.simplify)
+        timing = compare_render_time(svg_content, optimized, args.repeat)
+        print(f"{svg_path}: {format_stats(stats)}, render {timing['before']:.3f}s -> {timing['after']:.3f}s "
+              f"({timing['speedup']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Import-time budget check for the Flask app.
+Creates the app in a fresh interpreter, fails if it takes longer than the budget
+or if any heavy library was imported during startup.
+Usage: python check_import_time.py [--budget-ms 1000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+HEAVY_MODULES = (
+    "openai",
+    "google.generativeai",
+    "pytesseract",
+    "pdf2image",
+    "cairosvg",
+    "svgpathtools",
+    "PyPDF2",
+    "svgwrite",
+    "boto3",
+)
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app({{"TESTING": True}})
+elapsed_ms = (time.perf_counter() - start) * 1000
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"elapsed_ms": elapsed_ms, "heavy": heavy}}))
+"""
+
+
+def measure_startup(runs):
+    """
+    Run the startup probe in fresh interpreters and return (median_ms, heavy modules seen).
+    """
+    timings = []
+    heavy = set()
+    probe = PROBE.format(heavy=HEAVY_MODULES)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["elapsed_ms"])
+        heavy.update(result["heavy"])
+    return statistics.median(timings), sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's startup import time against a budget.")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1000)))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    median_ms, heavy = measure_startup(args.runs)
+    print(f"create_app() median over {args.runs} runs: {median_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL: startup import time is over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+End-to-end load test: runs the Flask app locally with stubbed AI backends and replays a seeded mix of
+SVG uploads, multi-page PDF uploads and pattern generation at a target concurrency.
+Each simulated user keeps its own cookies and, like the browser, follows an upload with the
+sewing instructions stream and the print ZIP download, so the deferred work is measured too.
+Reports throughput, p50/p95/p99 latency, error rates and per-worker memory; --json saves the results
+together with the run configuration so runs can be compared.
+
+Usage:
+    python loadtest.py --pdf samples/dress.pdf --concurrency 8 --requests 200 --workers 2 --ai-latency 0.5
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+SAMPLE_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" viewBox="0 0 210 297">
+<path d="M 20 20 C 60 10, 120 10, 160 40 L 170 200 C 120 230, 60 230, 30 200 Z" fill="none" stroke="black"/>
+<path d="M 40 60 L 140 60 L 140 150 L 40 150 Z" fill="none" stroke="black"/>
+<text x="50" y="100">Front bodice</text>
+</svg>"""
+SERVER_CODE = "import sys; from app import create_app; create_app().run(port=int(sys.argv[1]), threaded=True)"
+STREAM_URL_RE = re.compile(r'new EventSource\("([^"]+)"\)')
+ZIP_URL_RE = re.compile(r'href="([^"]*/download_zip/[^"]+)"')
+
+
+def free_port():
+    """
+    Ask the OS for an unused TCP port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_workers(count, ai_latency, token_delay, data_dir):
+    """
+    Start app worker processes, each on its own port, with the fake AI backends enabled.
+    The workers share a fresh database, artifact store and pattern cache in data_dir,
+    so a run neither reads nor modifies the checkout's data.
+    Returns a list of (process, base_url).
+    """
+    from app.database.database import init_db
+
+    db_path = os.path.join(data_dir, "patterns.db")
+    init_db(db_path)
+    # Workers must share a session key, like the nodes of a real deployment
+    env = dict(os.environ, SEWING_AI_BACKEND="fake", FAKE_AI_LATENCY=str(ai_latency),
+               FAKE_AI_TOKEN_DELAY=str(token_delay), FLASK_SECRET_KEY=os.urandom(16).hex(),
+               SEWING_DB_PATH=db_path, ARTIFACT_STORE="local", ARTIFACT_ROOT=os.path.join(data_dir, "artifacts"),
+               PATTERN_CACHE_DIR=os.path.join(data_dir, "pattern_cache"))
+    workers = []
+    for _ in range(count):
+        port = free_port()
+        process = subprocess.Popen([sys.executable, "-c", SERVER_CODE, str(port)],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        workers.append((process, f"http://127.0.0.1:{port}"))
+    for process, base_url in workers:
+        wait_until_up(process, base_url)
+    return workers
+
+
+def wait_until_up(process, base_url, timeout=30):
+    """
+    Poll a worker's index page until it answers.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Worker at {base_url} exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Worker at {base_url} did not start within {timeout}s")
+
+
+def rss_kb(pid):
+    """
+    Resident memory of a process in KiB, via ps so it works on Linux and macOS.
+    """
+    output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout.strip()
+    return int(output) if output else 0
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples each worker's RSS periodically and keeps the peak and last value.
+    """
+
+    def __init__(self, pids, interval=0.5):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak = {pid: 0 for pid in pids}
+        self.last = {pid: 0 for pid in pids}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            for pid in self.pids:
+                self.last[pid] = rss_kb(pid)
+                self.peak[pid] = max(self.peak[pid], self.last[pid])
+            self.stopped.wait(self.interval)
+
+
+def multipart_body(fields, files):
+    """
+    Encode form fields and files as multipart/form-data. files maps field -> (filename, bytes, content type).
+    Returns (body, content_type header).
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_scenarios(svg_files, pdf_files, cold=False):
+    """
+    Return {scenario_name: request factory}; each factory takes a seeded Random and returns
+    (path, body, content_type). With cold=True every upload gets a unique trailing comment,
+    so the pattern cache misses and the full conversion and AI path runs each time.
+    """
+    def measurements(rng):
+        return {
+            "bust": rng.choice(range(76, 111, 2)),
+            "waist": rng.choice(range(60, 95, 2)),
+            "hips": rng.choice(range(84, 119, 2)),
+            "original_size": rng.choice(["34", "36", "38", "40", "42"]),
+        }
+
+    def upload(files, content_type, comment):
+        def factory(rng):
+            name, data = rng.choice(files)
+            if cold:
+                data += comment % rng.getrandbits(64)
+            fields = dict(measurements(rng), pattern=rng.choice(["corset", "dress", "bikini_top"]))
+            body, header = multipart_body(fields, {"svg_file": (name, data, content_type)})
+            return "/upload", body, header
+        return factory
+
+    def generate(rng):
+        fields = dict(measurements(rng), pattern=rng.choice(["bikini_top", "bikini_bottom", "corset"]))
+        body, header = multipart_body(fields, {})
+        return "/generate", body, header
+
+    scenarios = {"generate": generate}
+    scenarios["upload_svg"] = upload(svg_files or [("sample.svg", SAMPLE_SVG.encode())], "image/svg+xml",
+                                   b"\n<!-- %x -->\n")
+    if pdf_files:
+        scenarios["upload_pdf"] = upload(pdf_files, "application/pdf", b"\n%% %x\n")
+    return scenarios
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def timed(opener, url, timeout, data=None, headers=None):
+    """
+    Fetch a URL with a user's opener and read the whole body.
+    Returns (latency_seconds, status, body bytes); status is None when the request failed outright.
+    """
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    start = time.perf_counter()
+    try:
+        with opener.open(req, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body, status = e.read(), e.code
+    except Exception:
+        body, status = b"", None
+    return time.perf_counter() - start, status, body
+
+
+def follow_up(opener, base_url, name, page, timeout):
+    """
+    Do what the result page does after an upload: read the instructions stream to the end,
+    then download the print ZIP, which renders it on first request.
+    Returns a list of (step name, latency_seconds, ok).
+    """
+    html = page.decode("utf-8", errors="replace")
+    rows = []
+    stream = STREAM_URL_RE.search(html)
+    if stream:
+        latency, status, body = timed(opener, base_url + stream.group(1), timeout,
+                                      headers={"Accept": "text/event-stream"})
+        ok = status == 200 and b"event: done" in body and b"event: error" not in body
+        rows.append((f"{name}:instructions", latency, ok))
+    download = ZIP_URL_RE.search(html)
+    if download:
+        latency, status, body = timed(opener, base_url + download.group(1), timeout)
+        rows.append((f"{name}:zip", latency, status == 200 and body[:2] == b"PK"))
+    return rows
+
+
+def run_load(workers, scenarios, weights, total_requests, concurrency, seed, timeout):
+    """
+    Run total_requests user flows at the given concurrency, round-robin across workers.
+    Every flow is a new user with its own cookie jar; uploads are followed by their instructions
+    stream and print ZIP download, which are reported as separate steps.
+    Returns a list of (step name, latency_seconds, ok).
+    """
+    rng = random.Random(seed)
+    names = list(scenarios)
+    plan = []
+    for i in range(total_requests):
+        name = rng.choices(names, weights=[weights.get(n, 0.0) for n in names])[0]
+        plan.append((name, workers[i % len(workers)][1], scenarios[name](rng)))
+
+    def flow(item):
+        name, base_url, (path, body, content_type) = item
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        latency, status, page = timed(opener, base_url + path, timeout, data=body,
+                                      headers={"Content-Type": content_type})
+        ok = status is not None and 200 <= status < 300
+        rows = [(name, latency, ok)]
+        if ok:
+            rows.extend(follow_up(opener, base_url, name, page, timeout))
+        return rows
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return [row for rows in pool.map(flow, plan) for row in rows]
+
+
+def summarize(results, elapsed, sampler):
+    """
+    Aggregate raw results into overall and per-scenario metrics plus per-worker memory.
+    """
+    def stats(rows):
+        latencies = [latency for _, latency, _ in rows]
+        errors = sum(1 for _, _, ok in rows if not ok)
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows) if rows else 0.0,
+            "throughput_rps": len(rows) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        }
+
+    by_scenario = defaultdict(list)
+    for row in results:
+        by_scenario[row[0]].append(row)
+    return {
+        "elapsed_s": elapsed,
+        "overall": stats(results),
+        "scenarios": {name: stats(rows) for name, rows in sorted(by_scenario.items())},
+        "worker_memory_kb": [{"pid": pid, "peak_rss_kb": sampler.peak[pid], "final_rss_kb": sampler.last[pid]}
+                             for pid in sampler.pids],
+    }
+
+
+def print_report(report):
+    """
+    Print the summary as a table.
+    """
+    print(f"{'step':<26}{'reqs':>6}{'err%':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = list(report["scenarios"].items()) + [("overall", report["overall"])]
+    for name, s in rows:
+        print(f"{name:<26}{s['requests']:>6}{s['error_rate'] * 100:>7.1f}{s['throughput_rps']:>8.2f}"
+              f"{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}")
+    for worker in report["worker_memory_kb"]:
+        print(f"worker {worker['pid']}: peak RSS {worker['peak_rss_kb'] / 1024:.1f} MiB, "
+              f"final {worker['final_rss_kb'] / 1024:.1f} MiB")
+
+
+def read_files(paths):
+    """
+    Load fixture files as (basename, bytes).
+    """
+    files = []
+    for path in paths or []:
+        with open(path, "rb") as f:
+            files.append((os.path.basename(path), f.read()))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test uploads, downloads and /generate with stubbed AI backends.")
+    parser.add_argument("--svg", nargs="*", help="SVG fixtures (a built-in sample is used if omitted)")
+    parser.add_argument("--pdf", nargs="*", help="Multi-page PDF fixtures")
+    parser.add_argument("--requests", type=int, default=100, help="User flows to run")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="App worker processes")
+    parser.add_argument("--ai-latency", type=float, default=0.5, help="Seconds per stubbed OpenAI call")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds per stubbed Gemini chunk")
+    parser.add_argument("--mix", default="upload_svg=3,upload_pdf=1,generate=2",
+                        help="Scenario weights, e.g. upload_svg=3,upload_pdf=1,generate=2; "
+                             "scenarios left out are not run")
+    parser.add_argument("--cold", action="store_true", help="Make every upload unique to bypass the pattern cache")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", help="Write the report and run configuration to this file")
+    args = parser.parse_args()
+
+    weights = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+    scenarios = build_scenarios(read_files(args.svg), read_files(args.pdf), args.cold)
+    if not any(weights.get(name, 0.0) > 0 for name in scenarios):
+        parser.error(f"--mix gives no weight to any available scenario ({', '.join(scenarios)})")
+    data_dir = tempfile.mkdtemp(prefix="loadtest_")
+    workers = start_workers(args.workers, args.ai_latency, args.token_delay, data_dir)
+    sampler = MemorySampler([process.pid for process, _ in workers])
+    sampler.start()
+    try:
+        start = time.perf_counter()
+        results = run_load(workers, scenarios, weights, args.requests, args.concurrency, args.seed, args.timeout)
+        elapsed = time.perf_counter() - start
+    finally:
+        sampler.stopped.set()
+        sampler.join()
+        for process, _ in workers:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = summarize(results, elapsed, sampler)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
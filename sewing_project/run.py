@@ -1,4 +1,6 @@
-from app.routes import app
+from app import create_app
+
+app = create_app({"DEBUG": __name__ == "__main__"})
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5007)
\ No newline at end of file
+    app.run(debug=True, port=5007)
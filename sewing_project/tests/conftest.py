@@ -0,0 +1,119 @@
+"""
+Shared fixtures: an app with the fake AI backends, a throwaway database, artifact store and pattern cache.
+"""
+import os
+import pytest
+from app import create_app
+from app.artifact_store import LocalStore
+from app.database.database import init_db
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "patterns.db")
+    init_db(db_path)
+    monkeypatch.setenv("SEWING_DB_PATH", db_path)
+    monkeypatch.setenv("FLASK_SECRET_KEY", "test-secret")
+    monkeypatch.setenv("SEWING_AI_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_AI_LATENCY", "0")
+    monkeypatch.setenv("FAKE_AI_TOKEN_DELAY", "0")
+    return create_app({"TESTING": True, "ARTIFACT_ROOT": str(tmp_path / "artifacts"),
+                       "PATTERN_CACHE_DIR": str(tmp_path / "pattern_cache")})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(str(tmp_path / "store"))
+
+
+@pytest.fixture
+def saved_instructions(monkeypatch):
+    """
+    Record instructions the routes would write to the SQLite database instead of writing them.
+    """
+    saved = []
+    monkeypatch.setattr("app.routes.save_instructions_to_db", lambda upload_id, text: saved.append((upload_id, text)))
+    return saved
+
+
+PAGE_SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="{w}pt" height="{h}pt" viewBox="0 0 {w} {h}">'
+            '<path d="M 20 20 L {x} 20 L {x} {y} L 20 {y} Z" fill="none" stroke="black"/></svg>')
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """
+    Write a PDF with the given number of blank A4 pages and return its bytes.
+    """
+    PyPDF2 = pytest.importorskip("PyPDF2")
+
+    def make(pages=2):
+        writer = PyPDF2.PdfWriter()
+        for _ in range(pages):
+            writer.add_blank_page(width=595, height=842)
+        path = tmp_path / f"pattern_{pages}.pdf"
+        with open(path, "wb") as f:
+            writer.write(f)
+        return path.read_bytes()
+    return make
+
+
+@pytest.fixture
+def fake_pdf_tools(monkeypatch):
+    """
+    Stand-ins for the external tools of the PDF flow (pdf2svg, poppler and cairo), which the tests
+    cannot rely on: conversion writes one small SVG per PDF page, previews and print renders write
+    small PNGs. Returns a dict counting the calls.
+    """
+    from PIL import Image
+    PdfReader = pytest.importorskip("PyPDF2").PdfReader
+
+    calls = {"convert": 0, "previews": 0, "raster_previews": 0, "render": 0, "raster_render": 0}
+
+    def png(path):
+        Image.new("RGB", (20, 28), "white").save(path)
+        return path
+
+    def convert(pdf_path, output_dir, optimize=True):
+        calls["convert"] += 1
+        paths = []
+        for i, page in enumerate(PdfReader(pdf_path).pages, start=1):
+            w, h = float(page.mediabox.width), float(page.mediabox.height)
+            path = os.path.join(output_dir, f"page_{i}.svg")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(PAGE_SVG.format(w=w, h=h, x=w - 20, y=h - 20))
+            paths.append(path)
+        return paths
+
+    def previews(key):
+        def render(source, scale_x, scale_y, upload_dir, max_width=900):
+            calls[key] += 1
+            resized_dir = os.path.join(upload_dir, "resized")
+            os.makedirs(resized_dir, exist_ok=True)
+            pages = source if isinstance(source, list) else PdfReader(source).pages
+            names = [f"page_{i}_preview.png" for i in range(1, len(pages) + 1)]
+            for name in names:
+                png(os.path.join(resized_dir, name))
+            return names
+        return render
+
+    def render_for_profile(svg_paths, scale_x, scale_y, upload_dir, profile):
+        calls["render"] += 1
+        return [png(os.path.join(upload_dir, f"tile_{i}.png")) for i in range(len(svg_paths))]
+
+    def iter_raster_tiles(pdf_path, scale_x, scale_y, upload_dir, paper="A4", dpi=300):
+        calls["raster_render"] += 1
+        for i in range(len(PdfReader(pdf_path).pages)):
+            yield png(os.path.join(upload_dir, f"raster_tile_{i}.png"))
+
+    monkeypatch.setattr("app.routes.convert_pdf_to_svgs", convert)
+    monkeypatch.setattr("app.routes.render_previews", previews("previews"))
+    monkeypatch.setattr("app.routes.render_raster_previews", previews("raster_previews"))
+    monkeypatch.setattr("app.preview.render_for_profile", render_for_profile)
+    monkeypatch.setattr("app.preview.iter_raster_tiles", iter_raster_tiles)
+    return calls
@@ -0,0 +1,121 @@
+"""
+Admission control: cost lanes, queue and memory limits, and the /metrics counters.
+"""
+import io
+import threading
+import time
+import pytest
+from app import admission
+from app.admission import AdmissionRejected, admission_slot, job_cost, metrics_text
+from app.overlay import PAPER_SIZES
+
+A4 = PAPER_SIZES["A4"]
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm"><path d="M0 0 L10 10"/></svg>'
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setenv("ADMISSION_WAIT_SECONDS", "2")
+    monkeypatch.setenv("ADMISSION_MEMORY_MB", "2048")
+
+
+def cost(lane="light", memory_mb=100.0):
+    return {"lane": lane, "memory_mb": memory_mb, "cost": 1.0}
+
+
+def test_job_cost_sends_large_patterns_to_the_heavy_lane():
+    single = job_cost([A4])
+    assert single["lane"] == "light"
+    assert single["cost"] == pytest.approx(1.0)
+    assert single["pages"] == 1
+    assert job_cost([A4] * 20)["lane"] == "heavy"
+    assert job_cost([A4], paths=200000)["lane"] == "heavy"
+    # Scaling the pattern up scales its area and memory
+    doubled = job_cost([A4], scale_x=2.0, scale_y=2.0, dpi=300)
+    assert doubled["area_a4"] == pytest.approx(4.0)
+    assert doubled["memory_mb"] > job_cost([A4], dpi=300)["memory_mb"]
+
+
+def test_job_over_the_memory_budget_is_rejected_with_413(monkeypatch):
+    monkeypatch.setenv("ADMISSION_MEMORY_MB", "50")
+    with pytest.raises(AdmissionRejected) as exc:
+        with admission_slot(cost(memory_mb=100)):
+            pass
+    assert exc.value.status == 413
+    assert exc.value.retry_after is None
+
+
+def test_full_queue_is_rejected_with_retry_after(monkeypatch):
+    monkeypatch.setenv("ADMISSION_HEAVY_QUEUE", "0")
+    monkeypatch.setenv("ADMISSION_RETRY_AFTER", "7")
+    rejected = admission._stats["heavy"]["rejected"]
+    with pytest.raises(AdmissionRejected) as exc:
+        with admission_slot(cost("heavy")):
+            pass
+    assert exc.value.status == 503
+    assert exc.value.retry_after == 7
+    assert admission._stats["heavy"]["rejected"] == rejected + 1
+
+
+def test_light_jobs_run_while_the_heavy_lane_is_busy(monkeypatch):
+    monkeypatch.setenv("ADMISSION_WAIT_SECONDS", "0.05")
+    with admission_slot(cost("heavy")):
+        with admission_slot(cost("light")):
+            assert admission._stats["light"]["running"] >= 1
+        # The heavy lane has one worker, so a second heavy job times out
+        with pytest.raises(AdmissionRejected) as exc:
+            with admission_slot(cost("heavy")):
+                pass
+        assert exc.value.status == 503
+    assert admission._stats["heavy"]["running"] == 0
+
+
+def test_waiting_job_starts_when_memory_is_released(monkeypatch):
+    monkeypatch.setenv("ADMISSION_MEMORY_MB", "150")
+    started = threading.Event()
+    errors = []
+
+    def second_job():
+        try:
+            with admission_slot(cost(memory_mb=100)):
+                started.set()
+        except AdmissionRejected as e:
+            errors.append(e)
+
+    with admission_slot(cost(memory_mb=100)):
+        worker = threading.Thread(target=second_job)
+        worker.start()
+        time.sleep(0.1)
+        assert not started.is_set()
+        assert admission._stats["light"]["waiting"] == 1
+    worker.join(2)
+    assert started.is_set() and not errors
+    assert admission._usage["memory_mb"] == pytest.approx(0.0)
+
+
+def test_metrics_report_each_lane():
+    admitted = admission._stats["light"]["admitted"]
+    with admission_slot(cost(memory_mb=120)):
+        text = metrics_text()
+    assert f'sewing_admission_admitted_total{{lane="light"}} {admitted + 1}' in text
+    assert 'sewing_admission_running{lane="light"} 1' in text
+    assert "sewing_admission_memory_in_use_mb 120.0" in text
+    assert "sewing_admission_memory_budget_mb 2048.0" in text
+    assert "# TYPE sewing_admission_queue_depth gauge" in text
+
+
+def test_upload_over_budget_returns_413(client, monkeypatch):
+    monkeypatch.setenv("ADMISSION_MEMORY_MB", "1")
+    response = client.post("/upload", data={
+        "pattern": "corset", "bust": "90", "waist": "70", "hips": "95", "original_size": "38",
+        "svg_file": (io.BytesIO(SVG), "admission_test.svg"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert "Retry-After" not in response.headers
+
+
+def test_metrics_endpoint(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "sewing_admission_queue_depth" in response.get_data(as_text=True)
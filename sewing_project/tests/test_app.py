@@ -0,0 +1,31 @@
+"""
+App factory: session secret key handling.
+"""
+import os
+import threading
+import pytest
+from app import SECRET_KEY_FILENAME, create_app, load_dev_secret_key
+
+
+def test_secret_key_is_required_outside_debug_and_testing(monkeypatch):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda: None)
+    with pytest.raises(RuntimeError):
+        create_app()
+
+
+def test_workers_racing_for_the_dev_key_all_read_the_same_full_key(tmp_path):
+    keys = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        keys.append(load_dev_secret_key(str(tmp_path)))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(keys)) == 1 and len(keys[0]) == 64
+    assert os.listdir(tmp_path) == [SECRET_KEY_FILENAME]
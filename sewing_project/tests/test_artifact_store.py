@@ -0,0 +1,63 @@
+"""
+Content-addressed artifact store: keys, deduplication, precompressed SVGs and refs.
+"""
+import gzip
+import os
+import pytest
+from app.artifact_store import KEY_RE, content_key, get_store
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_same_content_is_stored_once(store, tmp_path):
+    first = store.put_file(write(tmp_path, "a.PNG", b"png bytes"))
+    second = store.put_file(write(tmp_path, "b.png", b"png bytes"))
+    assert first == second
+    assert KEY_RE.match(first) and first.endswith(".png")
+    assert len(os.listdir(os.path.dirname(store.local_path(first)))) == 1
+    assert store.put_file(write(tmp_path, "c.png", b"other bytes")) != first
+
+
+def test_jpeg_extension_is_normalised(tmp_path):
+    assert content_key(write(tmp_path, "photo.jpeg", b"x")).endswith(".jpg")
+
+
+def test_svg_objects_get_a_gzip_variant(store, tmp_path):
+    data = b"<svg xmlns='http://www.w3.org/2000/svg'/>"
+    path = store.local_path(store.put_file(write(tmp_path, "page.svg", data)))
+    with gzip.open(path + ".gz") as f:
+        assert f.read() == data
+    # Variants older than their original are ignored when serving downloads
+    assert os.path.getmtime(path + ".gz") >= os.path.getmtime(path)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith(".tmp")]
+
+
+def test_large_files_are_copied_intact(store, tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    key = store.put_file(write(tmp_path, "print.zip", data))
+    with open(store.local_path(key), "rb") as f:
+        assert f.read() == data
+
+
+def test_unknown_key_raises(store):
+    with pytest.raises(FileNotFoundError):
+        store.local_path("0" * 32 + ".svg")
+
+
+def test_refs_round_trip(store):
+    assert store.get_ref("handles/missing") is None
+    store.put_ref("handles/abc", {"svg_paths": ["a.svg"], "scale": 1.5})
+    assert store.get_ref("handles/abc") == {"svg_paths": ["a.svg"], "scale": 1.5}
+    store.put_ref("handles/abc", {"scale": 2})
+    assert store.get_ref("handles/abc") == {"scale": 2}
+
+
+def test_app_store_uses_artifact_root(app, tmp_path):
+    with app.app_context():
+        store = get_store()
+        assert store.root == str(tmp_path / "artifacts")
+        assert get_store() is store
@@ -0,0 +1,115 @@
+"""
+Batch resizing: outputs keyed by content hash, so re-running a batch resumes instead of re-rendering.
+"""
+import os
+import sqlite3
+import pytest
+import batch_resize
+from app.ai_calls import SIZE_CHART
+from app.database.db_helper import db_path
+from app.output_profiles import get_profile
+
+SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" viewBox="0 0 210 297">'
+       '<path d="M 20 20 L 180 20 L 180 270 L 20 270 Z" fill="none" stroke="black"/></svg>')
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """
+    Replace the cairo print render with small PNGs, recording the scale factors of each call.
+    """
+    from PIL import Image
+
+    calls = []
+
+    def render_for_profile(svg_paths, scale_x, scale_y, upload_dir, profile):
+        calls.append((scale_x, scale_y))
+        os.makedirs(upload_dir, exist_ok=True)
+        paths = [os.path.join(upload_dir, f"tile_{i}.png") for i in range(len(svg_paths))]
+        for path in paths:
+            Image.new("RGB", (10, 10), "white").save(path)
+        return paths
+
+    monkeypatch.setattr(batch_resize, "render_for_profile", render_for_profile)
+    return calls
+
+
+@pytest.fixture
+def library(tmp_path):
+    input_dir = tmp_path / "patterns"
+    input_dir.mkdir()
+    (input_dir / "corset.svg").write_text(SVG, encoding="utf-8")
+    (input_dir / "notes.txt").write_text("not a pattern", encoding="utf-8")
+    return input_dir
+
+
+def run(jobs, output_dir):
+    profile = get_profile("a4")
+    return [r for path, sets in jobs.items() for r in batch_resize.process_file(path, sets, str(output_dir), profile)]
+
+
+def test_jobs_from_dir_pairs_patterns_with_sizes(library):
+    jobs = batch_resize.jobs_from_dir(str(library), "38", ["36", "40"])
+    assert list(jobs) == [str(library / "corset.svg")]
+    assert [m["label"] for m in jobs[str(library / "corset.svg")]] == ["36", "40"]
+    assert jobs[str(library / "corset.svg")][1]["bust"] == SIZE_CHART["40"]["bust"]
+
+
+def test_rerun_skips_finished_outputs(library, tmp_path, renders):
+    output_dir = tmp_path / "graded"
+    first = run(batch_resize.jobs_from_dir(str(library), "38", ["36", "40"]), output_dir)
+    assert [r["status"] for r in first] == ["done", "done"]
+    for r in first:
+        assert os.path.exists(os.path.join(output_dir, r["key"], r["zip_filename"]))
+    assert len(renders) == 2
+
+    # Adding a size only renders the new one
+    second = run(batch_resize.jobs_from_dir(str(library), "38", ["36", "40", "42"]), output_dir)
+    assert [r["status"] for r in second] == ["skipped", "skipped", "done"]
+    assert [r["zip_filename"] for r in second[:2]] == [r["zip_filename"] for r in first]
+    assert len(renders) == 3
+
+
+def test_changed_content_is_rendered_again(library, tmp_path, renders):
+    output_dir = tmp_path / "graded"
+    run(batch_resize.jobs_from_dir(str(library), "38", ["36"]), output_dir)
+    (library / "corset.svg").write_text(SVG.replace("180 270", "170 270"), encoding="utf-8")
+    assert [r["status"] for r in run(batch_resize.jobs_from_dir(str(library), "38", ["36"]), output_dir)] == ["done"]
+
+
+def test_unknown_original_size_fails_and_is_retried(tmp_path, renders):
+    path = tmp_path / "dress.svg"
+    path.write_text(SVG, encoding="utf-8")
+    jobs = {str(path): [{"label": "row1", "original_size": None, "bust": 90.0, "waist": 72.0, "hips": 98.0}]}
+    for _ in range(2):
+        (result,) = run(jobs, tmp_path / "graded")
+        assert result["status"] == "failed" and "original size" in result["error"]
+        assert not os.path.exists(os.path.join(tmp_path, "graded", result["key"], batch_resize.RESULT_FILENAME))
+    assert renders == []
+
+
+def test_results_are_recorded_once(app, library, tmp_path, renders):
+    output_dir = tmp_path / "graded"
+    jobs = batch_resize.jobs_from_dir(str(library), "38", ["36", "40"])
+    assert batch_resize.record_results(run(jobs, output_dir), str(output_dir), "corset") == 2
+    # The resumed run reads the recorded flag back from the result markers
+    resumed = run(jobs, output_dir)
+    assert all(r["recorded"] for r in resumed)
+    assert batch_resize.record_results(resumed, str(output_dir), "corset") == 0
+    connection = sqlite3.connect(db_path())
+    try:
+        sources = connection.execute("SELECT source FROM scaling").fetchall()
+    finally:
+        connection.close()
+    assert sources == [("batch",), ("batch",)]
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text("file,original_size,bust,waist,hips\npatterns/corset.svg,38,92,74,100\n"
+                        "patterns/corset.svg,,96,,\n", encoding="utf-8")
+    jobs = batch_resize.jobs_from_manifest(str(manifest))
+    (rows,) = jobs.values()
+    assert list(jobs) == [os.path.join(str(tmp_path), "patterns", "corset.svg")]
+    assert rows[0] == {"label": "row1", "original_size": "38", "bust": 92.0, "waist": 74.0, "hips": 100.0}
+    assert rows[1]["label"] == "row2" and rows[1]["original_size"] is None
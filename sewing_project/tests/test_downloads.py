@@ -0,0 +1,74 @@
+"""
+Artifact downloads: ETags, conditional and range requests, precompressed variants and sandbox headers.
+"""
+import gzip
+import pytest
+from app import downloads
+from app.artifact_store import get_store
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm"><path d="M0 0 L10 10"/></svg>'
+
+
+@pytest.fixture
+def stored(app, tmp_path):
+    def put(name, data):
+        path = tmp_path / name
+        path.write_bytes(data)
+        with app.app_context():
+            return get_store().put_file(str(path))
+    return put
+
+
+def test_etag_and_conditional_get(client, stored):
+    key = stored("tiles.zip", b"PK" + bytes(range(200)))
+    response = client.get(f"/artifact/{key}?name=pattern.zip")
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"].startswith("attachment")
+    assert "immutable" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+    again = client.get(f"/artifact/{key}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_range_request(client, stored):
+    data = bytes(range(256))
+    key = stored("tiles.zip", data)
+    response = client.get(f"/artifact/{key}", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.data == data[10:20]
+    assert response.headers["Content-Range"] == "bytes 10-19/256"
+
+
+def test_svg_is_sandboxed_and_served_compressed(client, stored):
+    key = stored("scaled.svg", SVG)
+    plain = client.get(f"/artifact/{key}?inline=1")
+    assert plain.data == SVG
+    assert "sandbox" in plain.headers["Content-Security-Policy"]
+    assert plain.headers["X-Content-Type-Options"] == "nosniff"
+    assert plain.headers["Content-Disposition"].startswith("inline")
+    compressed = client.get(f"/artifact/{key}?inline=1", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == SVG
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+
+
+@pytest.mark.parametrize("key", ["../secret_key", "0" * 32 + ".svg", "not-a-key"])
+def test_unknown_or_malformed_keys_are_404(client, key):
+    assert client.get(f"/artifact/{key}").status_code == 404
+
+
+def test_etag_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "ETAG_CACHE_SIZE", 3)
+    monkeypatch.setattr(downloads, "_etag_cache", downloads.OrderedDict())
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"file{i}.bin"
+        path.write_bytes(bytes([i]) * 10)
+        paths.append(str(path))
+    first = downloads.file_etag(paths[0])
+    for path in paths[1:]:
+        downloads.file_etag(path)
+    assert len(downloads._etag_cache) == 3
+    assert [key[0] for key in downloads._etag_cache] == paths[2:]
+    assert downloads.file_etag(paths[0]) == first
@@ -0,0 +1,77 @@
+"""
+Parametric drafting: measurement completion, ease and piece geometry.
+"""
+import re
+import pytest
+from app.drafting import (CORSET_WAIST_WEIGHTS, complete_measurements, draft_bikini_top, draft_corset,
+                          draft_pattern, nearest_size, with_ease)
+
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def numbers(path):
+    return [float(n) for n in NUMBER_RE.findall(path)]
+
+
+def test_missing_measurements_come_from_the_nearest_size():
+    assert complete_measurements(bust=88) == {"bust": 88, "waist": 72, "hips": 96}
+    # Measurements between sizes shift the filled-in values by the same offset
+    assert complete_measurements(bust=90, hips=98) == pytest.approx({"bust": 90, "waist": 74, "hips": 98})
+    with pytest.raises(ValueError):
+        nearest_size()
+
+
+def test_ease_is_applied_per_pattern_type():
+    eased = with_ease("corset", {"bust": 88, "waist": 72, "hips": 96})
+    assert eased == {"bust": 86, "waist": 66, "hips": 94}
+
+
+def test_corset_panels_add_up_to_the_eased_waist():
+    m = with_ease("corset", complete_measurements(88, 72, 96))
+    pieces = draft_corset(m)
+    assert len(pieces) == len(CORSET_WAIST_WEIGHTS)
+    waist_widths = []
+    for _, path, width, height in pieces:
+        values = numbers(path)
+        waist_widths.append(values[8] - values[22])
+        # Panels start at the bust line and end at the hip line
+        assert values[1] == 0 and values[15] == pytest.approx(height, abs=0.01)
+    # Half a corset is drafted and cut twice
+    assert 2 * sum(waist_widths) == pytest.approx(m["waist"], abs=0.1)
+    # Side panels take more of the reduction than the centre front
+    assert waist_widths[2] < waist_widths[0]
+
+
+def test_bikini_top_scales_with_the_bust():
+    small = draft_bikini_top({"bust": 80})[0]
+    large = draft_bikini_top({"bust": 100})[0]
+    assert large[2] / small[2] == pytest.approx(100 / 80)
+
+
+def test_draft_pattern_returns_svg_in_millimetres():
+    pytest.importorskip("svgwrite")
+    svg = draft_pattern("bikini_bottom", waist=70, hips=96)
+    assert svg.startswith("<svg") and 'width="' in svg and "mm" in svg
+    assert svg.count("<path") == 2
+    with pytest.raises(ValueError):
+        draft_pattern("trousers", bust=88)
+
+
+@pytest.mark.parametrize("value", [-80, 0, 39.9, 200.5, float("nan"), float("inf")])
+def test_out_of_range_measurements_are_rejected(value):
+    with pytest.raises(ValueError):
+        draft_pattern("corset", bust=value, waist=72, hips=96)
+
+
+@pytest.mark.parametrize("bust", ["-80", "nan", "inf", "1e9"])
+def test_generate_rejects_bad_measurements_with_400(client, bust):
+    response = client.post("/generate", data={"pattern": "bikini_top", "bust": bust})
+    assert response.status_code == 400
+    assert "between 40 and 200 cm" in response.get_data(as_text=True)
+
+
+def test_generate_drafts_from_valid_measurements(client):
+    pytest.importorskip("svgwrite")
+    response = client.post("/generate", data={"pattern": "corset", "bust": "88", "waist": "72", "hips": "96"})
+    assert response.status_code == 200
+    assert "<svg" in response.get_data(as_text=True)
@@ -0,0 +1,129 @@
+"""
+Server-Sent Events stream of sewing instructions, driven by the fake Gemini backend.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.artifact_store import get_store
+from app.database.db_helper import database_id
+from app.routes import INSTRUCTION_JOBS_KEY, INSTRUCTION_REF_PREFIX
+
+
+def queue_job(app, client, job_id, **fields):
+    job = {"pattern_type": "corset", "measurements": "bust = 88", "handle": None,
+           "database": database_id(), "upload_id": 7}
+    job.update(fields)
+    with app.app_context():
+        get_store().put_ref(INSTRUCTION_REF_PREFIX + job_id, job)
+    with client.session_transaction() as session:
+        session[INSTRUCTION_JOBS_KEY] = [job_id]
+
+
+def parse_events(body):
+    """
+    Split an SSE body into (event name, decoded data) pairs.
+    """
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = "message", None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def test_stream_sends_chunks_then_done(app, client, saved_instructions):
+    queue_job(app, client, "a" * 32)
+    response = client.get(f"/instructions/{'a' * 32}/stream")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1][0] == "done"
+    text = "".join(data for event, data in events if event == "message")
+    assert text.startswith("1. Print the pattern")
+    assert "corset" in text
+    assert saved_instructions == [(7, text.strip())]
+    with app.app_context():
+        assert get_store().get_ref(INSTRUCTION_REF_PREFIX + "a" * 32)["instructions"] == text.strip()
+
+
+def test_finished_stream_is_replayed_without_calling_the_ai(app, client, saved_instructions, monkeypatch):
+    queue_job(app, client, "b" * 32, instructions="Saved instructions")
+
+    def fail(*args):
+        raise AssertionError("the AI must not be called again")
+
+    monkeypatch.setattr("app.routes.stream_sewing_instructions", fail)
+    events = parse_events(client.get(f"/instructions/{'b' * 32}/stream").get_data(as_text=True))
+    assert events == [("message", "Saved instructions"), ("done", {})]
+    assert saved_instructions == []
+
+
+def test_other_nodes_do_not_write_to_their_database(app, client, saved_instructions):
+    queue_job(app, client, "c" * 32, database="other-host:/srv/patterns.db")
+    events = parse_events(client.get(f"/instructions/{'c' * 32}/stream").get_data(as_text=True))
+    assert events[-1][0] == "done"
+    assert saved_instructions == []
+
+
+def test_stream_requires_the_job_in_the_session(app, client):
+    queue_job(app, client, "d" * 32)
+    with client.session_transaction() as session:
+        session[INSTRUCTION_JOBS_KEY] = []
+    assert client.get(f"/instructions/{'d' * 32}/stream").status_code == 404
+
+
+def test_ai_errors_end_the_stream_with_an_error_event(app, client, saved_instructions, monkeypatch):
+    def broken(*args):
+        yield "1. Cut"
+        raise RuntimeError("backend down")
+
+    monkeypatch.setattr("app.routes.stream_sewing_instructions", broken)
+    queue_job(app, client, "e" * 32)
+    events = parse_events(client.get(f"/instructions/{'e' * 32}/stream").get_data(as_text=True))
+    assert events[0] == ("message", "1. Cut")
+    assert events[-1][0] == "error"
+    assert saved_instructions == []
+
+
+def test_instructions_are_saved_when_the_browser_disconnects(app, client, saved_instructions, monkeypatch):
+    monkeypatch.setenv("FAKE_AI_TOKEN_DELAY", "0.005")
+    queue_job(app, client, "f" * 32)
+    response = client.get(f"/instructions/{'f' * 32}/stream", buffered=False)
+    first = next(iter(response.response))
+    assert b"data: " in first
+    response.close()
+    deadline = time.monotonic() + 5
+    while not saved_instructions and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert saved_instructions and saved_instructions[0][1].startswith("1. Print the pattern")
+    with app.app_context():
+        assert get_store().get_ref(INSTRUCTION_REF_PREFIX + "f" * 32)["instructions"] == saved_instructions[0][1]
+
+
+def test_concurrent_readers_share_one_generation(app, saved_instructions, monkeypatch):
+    calls = []
+
+    def slow(pattern_type, measurements):
+        calls.append(pattern_type)
+        for word in ("1. Cut ", "the ", "panels."):
+            time.sleep(0.02)
+            yield word
+
+    monkeypatch.setattr("app.routes.stream_sewing_instructions", slow)
+    clients = [app.test_client() for _ in range(3)]
+    for c in clients:
+        queue_job(app, c, "9" * 32)
+
+    def read(c):
+        events = parse_events(c.get(f"/instructions/{'9' * 32}/stream").get_data(as_text=True))
+        return "".join(data for event, data in events if event == "message"), events[-1][0]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(read, clients))
+    assert results == [("1. Cut the panels.", "done")] * 3
+    assert calls == ["corset"]
+    assert saved_instructions == [(7, "1. Cut the panels.")]
@@ -0,0 +1,13 @@
+"""
+Load-test harness: scenario weighting.
+"""
+import loadtest
+
+
+def test_scenarios_missing_from_the_mix_are_not_run():
+    scenarios = loadtest.build_scenarios([], [])
+    # Nothing listens on the discard port, so every request fails fast
+    workers = [(None, "http://127.0.0.1:9")]
+    results = loadtest.run_load(workers, scenarios, {"upload_svg": 1.0}, 20, 4, seed=1, timeout=1)
+    assert len(results) == 20
+    assert {name for name, _, _ in results} == {"upload_svg"}
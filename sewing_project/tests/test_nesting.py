@@ -0,0 +1,136 @@
+"""
+Piece nesting: finding pieces on a page and shelf-packing them onto sheets, strips and tiles.
+"""
+import itertools
+import pytest
+from app.nesting import PIECE_GAP_MM, build_sheet_svg, covered_tiles, pack_for_tiles, pack_pieces
+from app.overlay import PAPER_SIZES
+
+PAGE = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" viewBox="0 0 210 297">'
+        # L-shaped piece with a small piece sitting in its hollow, and a square inside the L
+        '<path d="M 10 10 L 150 10 L 150 60 L 60 60 L 60 250 L 10 250 Z" fill="none" stroke="black"/>'
+        '<path d="M 80 80 L 140 80 L 140 150 L 80 150 Z" fill="none" stroke="black"/>'
+        '<path d="M 20 30 L 40 30 L 40 50 L 20 50 Z" fill="none" stroke="black"/>'
+        # A notch crossing the cutting line
+        '<path d="M 148 30 L 154 30" stroke="black"/>'
+        '{extra}</svg>')
+
+
+def piece(width, height):
+    return {"width_mm": width, "height_mm": height}
+
+
+def overlaps(a, b):
+    return (a["x"] < b["x"] + b["width"] and b["x"] < a["x"] + a["width"]
+            and a["y"] < b["y"] + b["height"] and b["y"] < a["y"] + a["height"])
+
+
+@pytest.fixture
+def page_svg(tmp_path):
+    def write(extra=""):
+        path = tmp_path / "page_1.svg"
+        path.write_text(PAGE.format(extra=extra), encoding="utf-8")
+        return str(path)
+    return write
+
+
+def test_pack_pieces_fills_sheets_without_overlaps():
+    pieces = [piece(w, h) for w, h in [(300, 200), (250, 400), (120, 90), (500, 150), (80, 80), (200, 200)]]
+    sheets = pack_pieces(pieces, 841, 1189)
+    placements = [p for sheet in sheets for p in sheet["placements"]]
+    assert len(sheets) == 1 and len(placements) == len(pieces)
+    for a, b in itertools.combinations(placements, 2):
+        assert not overlaps(a, b)
+    for p in placements:
+        assert p["x"] >= 0 and p["x"] + p["width"] <= 841
+        assert p["y"] >= 0 and p["y"] + p["height"] <= 1189
+
+
+def test_pack_pieces_rotates_long_pieces_to_fit_the_roll():
+    sheet = pack_pieces([piece(800, 300)], 610, None)[0]
+    placement = sheet["placements"][0]
+    assert placement["rotated"]
+    assert (placement["width"], placement["height"]) == (300, 800)
+    assert sheet["height"] == pytest.approx(800 + PIECE_GAP_MM)
+    assert not pack_pieces([piece(300, 800)], 610, None, allow_rotation=False)[0]["placements"][0]["rotated"]
+
+
+def test_oversized_pieces_get_a_sheet_of_their_own():
+    sheets = pack_pieces([piece(1000, 100), piece(100, 100)], 841, 1189, allow_rotation=False)
+    assert len(sheets) == 2
+    assert sheets[0]["width"] == pytest.approx(1000 + PIECE_GAP_MM)
+
+
+def test_pack_for_tiles_needs_fewer_tiles_than_the_pages():
+    # Eight small pieces that would each sit on their own A4 page
+    sheet = pack_for_tiles([piece(90, 120)] * 8, "A4")
+    tile_w, tile_h = PAPER_SIZES["A4"]
+    assert len(covered_tiles(sheet, tile_w, tile_h)) < 8
+
+
+def test_covered_tiles_lists_every_tile_a_piece_touches():
+    sheet = {"placements": [{"x": 200, "y": 10, "width": 20, "height": 300}]}
+    assert covered_tiles(sheet, 210, 297) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+
+
+def test_extract_pieces_tests_containment_against_the_outline(page_svg):
+    pytest.importorskip("svgpathtools")
+    from app.nesting import extract_pieces
+
+    pieces, stray = extract_pieces(page_svg())
+    assert stray == 0
+    # The square in the L's hollow is its own piece; the square inside the L travels with it
+    assert sorted(tuple(round(v) for v in p["outline_bbox"]) for p in pieces) == [(10, 10, 150, 250),
+                                                                                  (80, 80, 140, 150)]
+
+
+def test_extract_pieces_counts_drawing_outside_every_piece(page_svg):
+    pytest.importorskip("svgpathtools")
+    from app.nesting import extract_pieces
+
+    _, stray = extract_pieces(page_svg('<path d="M 100 200 L 180 280" stroke="black"/>'))
+    assert stray == 1
+
+
+GLYPH = '<defs><symbol id="glyph0-1"><path d="M 0 -3 L 2 -3 L 2 0 L 0 0 Z"/></symbol></defs>'
+
+
+@pytest.mark.parametrize("extra, expected", [
+    ('<text x="30" y="120" font-size="5">FRONT</text>', 0),
+    ('<text x="170" y="200" style="font-size:5px">BACK x2</text>', 1),
+    # A long label starting inside the piece but running far past its margin
+    ('<text x="20" y="200" font-size="8">CUT TWO ON THE FOLD</text>', 1),
+    (GLYPH + '<use xmlns:xlink="http://www.w3.org/1999/xlink" xlink:href="#glyph0-1" x="100" y="100"/>', 0),
+    (GLYPH + '<g transform="translate(150 0)"><use href="#glyph0-1" x="30" y="200"/></g>', 1),
+    ('<image x="20" y="100" width="20" height="20" href="data:,"/>', 0),
+    ('<image x="160" y="260" width="30" height="20" href="data:,"/>', 1),
+])
+def test_extract_pieces_counts_text_glyphs_and_images_outside_every_piece(page_svg, extra, expected):
+    pytest.importorskip("svgpathtools")
+    from app.nesting import extract_pieces
+
+    _, stray = extract_pieces(page_svg(extra))
+    assert stray == expected
+
+
+def test_render_nested_keeps_the_page_layout_when_drawing_would_be_lost(page_svg, tmp_path):
+    pytest.importorskip("svgpathtools")
+    from app.nesting import render_nested
+    from app.output_profiles import get_profile
+
+    svg_path = page_svg('<path d="M 100 200 L 180 280" stroke="black"/>')
+    assert render_nested([svg_path], 1.0, 1.0, str(tmp_path), get_profile("a4", nest=True)) is None
+
+
+def test_sheet_svg_clips_each_piece_with_a_margin(page_svg):
+    pytest.importorskip("svgpathtools")
+    from app.nesting import extract_pieces
+
+    svg_path = page_svg()
+    pieces, _ = extract_pieces(svg_path)
+    root = build_sheet_svg(pack_pieces(pieces, 610, None)[0], [svg_path])
+    clips = root.findall("defs/clipPath")
+    assert len(clips) == len(pieces)
+    for clip in clips:
+        assert clip[0].tag == "path" and len(clip.findall("ellipse")) > 10
+    assert len(root.findall("g/g/use")) == len(pieces)
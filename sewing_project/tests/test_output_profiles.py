@@ -0,0 +1,52 @@
+"""
+Output profiles: DPI validation and keeping the chosen DPI across rescales.
+"""
+import io
+import math
+import re
+import pytest
+from app.artifact_store import get_store
+from app.output_profiles import MAX_DPI, MIN_DPI, get_profile
+from app.preview import JOB_REF_PREFIX
+
+MEASUREMENTS = {"pattern": "corset", "bust": "90", "waist": "72", "hips": "98", "original_size": "38"}
+
+
+def test_get_profile_overrides_and_validates_dpi():
+    assert get_profile("a4")["dpi"] == 300
+    assert get_profile("a3", dpi=150.0)["dpi"] == 150
+    assert get_profile("a4", dpi=MIN_DPI)["dpi"] == MIN_DPI
+    for dpi in (MIN_DPI - 1, MAX_DPI + 1, math.nan, -300):
+        with pytest.raises(ValueError):
+            get_profile("a4", dpi=dpi)
+    with pytest.raises(ValueError):
+        get_profile("a5")
+
+
+def print_job_dpi(app, page):
+    job_id = re.search(r"/download_zip/([0-9a-f]{32})", page).group(1)
+    with app.app_context():
+        return get_store().get_ref(JOB_REF_PREFIX + job_id)["profile"]["dpi"]
+
+
+def test_rescale_keeps_the_upload_dpi(app, client, make_pdf, fake_pdf_tools):
+    response = client.post("/upload", data=dict(MEASUREMENTS, dpi="150", svg_file=(io.BytesIO(make_pdf()), "p.pdf")),
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert print_job_dpi(app, page) == 150
+    assert 'name="dpi" id="dpi" min="72" max="600" value="150"' in page
+    handle = re.search(r"/rescale/([0-9a-f]{16})", page).group(1)
+
+    # A rescale without the field keeps the stored DPI; the form's value wins when present
+    kept = client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, bust="94"))
+    assert print_job_dpi(app, kept.get_data(as_text=True)) == 150
+    changed = client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, bust="94", dpi="200"))
+    assert print_job_dpi(app, changed.get_data(as_text=True)) == 200
+    assert client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, dpi="2000")).status_code == 400
+
+
+def test_upload_rejects_out_of_range_dpi(client, make_pdf, fake_pdf_tools):
+    response = client.post("/upload", data=dict(MEASUREMENTS, dpi="5", svg_file=(io.BytesIO(make_pdf()), "p.pdf")),
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
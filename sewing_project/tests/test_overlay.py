@@ -0,0 +1,30 @@
+"""
+Tile overlays: page stamp caching and the tiler that composites them.
+"""
+from PIL import Image
+from app.overlay import cached_page_stamp, get_page_stamp, page_size_px
+from app.resize import tile_image
+
+
+def test_only_profile_dpis_are_cached():
+    cached_page_stamp.cache_clear()
+    assert get_page_stamp("A4", 300) is get_page_stamp("A4", 300)
+    stamp = get_page_stamp("A4", 150)
+    assert stamp.size == page_size_px("A4", 150)
+    assert get_page_stamp("A4", 150) is not stamp
+    assert cached_page_stamp.cache_info().currsize == 1
+
+
+def test_tiles_are_white_pages_with_the_overlay(tmp_path):
+    dpi = 72
+    width, height = page_size_px("A4", dpi)
+    image_path = str(tmp_path / "page.png")
+    Image.new("RGBA", (width + 10, height), (0, 0, 0, 0)).save(image_path)
+    tiles = tile_image(image_path, str(tmp_path), paper="A4", dpi=dpi)
+    assert [p.rsplit("_", 2)[-2:] for p in tiles] == [["r0", "c0.png"], ["r0", "c1.png"]]
+    tile = Image.open(tiles[1])
+    assert tile.size == (width, height) and tile.mode == "RGB"
+    assert tile.getpixel((width // 2, height // 2)) == (255, 255, 255)
+    # Registration mark in the top-left corner
+    assert tile.getpixel((int(40 * dpi / 300), int(40 * dpi / 300))) == (0, 0, 0)
+    assert cached_page_stamp.cache_info().currsize <= 1
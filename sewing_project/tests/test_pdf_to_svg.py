@@ -0,0 +1,141 @@
+"""
+PDF to SVG conversion: the pdf2svg call, the optimizer pass and the raster fallback decision.
+The pdf2svg binary is replaced by a function writing page files, so no external tools are needed.
+"""
+import os
+import subprocess
+import pytest
+from app import pdf_to_svg
+from app.pdf_to_svg import (MAX_SVG_PAGE_ELEMENTS, OSD_CHUNK_PAGES, convert_pdf_to_svgs, count_svg_elements,
+                            get_required_rotations, prepare_source_pdf, svg_conversion_is_pathological)
+
+PAGE = '<svg xmlns="http://www.w3.org/2000/svg" width="10mm" height="10mm">{body}</svg>'
+
+
+class FakePdf2svg:
+    """
+    Stands in for the pdf2svg binary: "all" writes every page, a page number writes that page only.
+    Records the commands run; set fail_all to make the single-call conversion fail
+    and add page numbers to fail_pages to make those pages fail on their own.
+    """
+
+    def __init__(self, pages=3, body='<path d="M0 0 L1 1"/>'):
+        self.pages = pages
+        self.body = body
+        self.fail_all = False
+        self.fail_pages = set()
+        self.commands = []
+
+    def __call__(self, cmd, check=False):
+        self.commands.append(cmd)
+        _, _, output, page = cmd
+        if page == "all":
+            if self.fail_all:
+                raise subprocess.CalledProcessError(1, cmd)
+            pages = range(1, self.pages + 1)
+        elif int(page) in self.fail_pages:
+            raise subprocess.CalledProcessError(1, cmd)
+        else:
+            pages = [int(page)]
+        for i in pages:
+            with open(output.replace("%d", str(i)), "w", encoding="utf-8") as f:
+                f.write(PAGE.format(body=self.body))
+
+
+@pytest.fixture
+def pdf2svg(monkeypatch):
+    fake = FakePdf2svg()
+    monkeypatch.setattr(pdf_to_svg.subprocess, "run", fake)
+    monkeypatch.setattr(pdf_to_svg, "prepare_source_pdf", lambda pdf_path, output_dir: (pdf_path, fake.pages, False))
+    return fake
+
+
+@pytest.fixture
+def optimized(monkeypatch):
+    calls = []
+    optimize_svg_files = pdf_to_svg.optimize_svg_files
+
+    def record(paths):
+        calls.append(list(paths))
+        return optimize_svg_files(paths)
+
+    monkeypatch.setattr(pdf_to_svg, "optimize_svg_files", record)
+    return calls
+
+
+def test_pathological_pages_skip_the_optimizer(pdf2svg, optimized, tmp_path):
+    pdf2svg.body = "<path/>" * (MAX_SVG_PAGE_ELEMENTS + 1)
+    svg_paths = convert_pdf_to_svgs("pattern.pdf", str(tmp_path))
+    assert len(svg_paths) == 3
+    assert optimized == []
+    assert svg_conversion_is_pathological(svg_paths)
+
+
+def test_normal_pages_are_optimized(pdf2svg, optimized, tmp_path):
+    svg_paths = convert_pdf_to_svgs("pattern.pdf", str(tmp_path))
+    assert optimized == [svg_paths]
+    assert not svg_conversion_is_pathological(svg_paths)
+
+
+def test_all_pages_convert_in_one_pdf2svg_call(pdf2svg, tmp_path):
+    svg_paths = convert_pdf_to_svgs("pattern.pdf", str(tmp_path), optimize=False)
+    assert [os.path.basename(path) for path in svg_paths] == ["page_1.svg", "page_2.svg", "page_3.svg"]
+    assert pdf2svg.commands == [["pdf2svg", "pattern.pdf", os.path.join(str(tmp_path), "page_%d.svg"), "all"]]
+
+
+def test_failed_single_call_falls_back_to_page_by_page(pdf2svg, tmp_path):
+    pdf2svg.fail_all = True
+    pdf2svg.fail_pages = {2}
+    svg_paths = convert_pdf_to_svgs("pattern.pdf", str(tmp_path), optimize=False)
+    assert [command[-1] for command in pdf2svg.commands] == ["all", "1", "2", "3"]
+    # A bad page is left out instead of losing the whole document
+    assert [os.path.basename(path) for path in svg_paths] == ["page_1.svg", "page_3.svg"]
+
+
+def test_patched_source_pdf_is_removed_after_conversion(pdf2svg, monkeypatch, tmp_path):
+    patched = tmp_path / "temp_patched.pdf"
+    patched.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(pdf_to_svg, "prepare_source_pdf", lambda pdf_path, output_dir: (str(patched), 3, True))
+    convert_pdf_to_svgs("pattern.pdf", str(tmp_path), optimize=False)
+    assert pdf2svg.commands[0][1] == str(patched)
+    assert not patched.exists()
+
+
+def test_source_pdf_is_only_rewritten_when_pages_need_rotating(make_pdf, monkeypatch, tmp_path):
+    PdfReader = pytest.importorskip("PyPDF2").PdfReader
+    pdf_path = tmp_path / "pattern.pdf"
+    pdf_path.write_bytes(make_pdf(3))
+
+    monkeypatch.setattr(pdf_to_svg, "get_required_rotations", lambda path, count: [0] * count)
+    assert prepare_source_pdf(str(pdf_path), str(tmp_path)) == (str(pdf_path), 3, False)
+
+    monkeypatch.setattr(pdf_to_svg, "get_required_rotations", lambda path, count: [0, 90, 0])
+    source_pdf, page_count, is_temporary = prepare_source_pdf(str(pdf_path), str(tmp_path))
+    assert is_temporary and page_count == 3 and source_pdf != str(pdf_path)
+    assert [page.get("/Rotate", 0) for page in PdfReader(source_pdf).pages] == [0, 90, 0]
+
+
+def test_orientation_is_detected_in_chunks(monkeypatch):
+    pdf2image = pytest.importorskip("pdf2image")
+    renders = []
+
+    def convert_from_path(pdf_path, dpi, first_page, last_page, thread_count):
+        renders.append((first_page, last_page))
+        if first_page > OSD_CHUNK_PAGES:
+            raise RuntimeError("poppler failed")
+        return ["image"] * (last_page - first_page + 1)
+
+    monkeypatch.setattr(pdf2image, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(pdf_to_svg, "osd_rotation", lambda img: 90)
+    pages = OSD_CHUNK_PAGES + 3
+    rotations = get_required_rotations("pattern.pdf", pages)
+    assert renders == [(1, OSD_CHUNK_PAGES), (OSD_CHUNK_PAGES + 1, pages)]
+    # Pages of a chunk that failed to render are assumed upright
+    assert rotations == [90] * OSD_CHUNK_PAGES + [0] * 3
+
+
+def test_count_svg_elements_across_chunk_boundaries(tmp_path):
+    path = tmp_path / "page.svg"
+    # Put a tag across the 1 MiB read boundary
+    path.write_bytes(b" " * ((1 << 20) - 3) + b"<path/><use/><image/><text/>")
+    assert count_svg_elements(str(path)) == 3
@@ -0,0 +1,69 @@
+"""
+Lazy print render: the upload only schedules the print ZIP, the first download renders it once.
+"""
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.artifact_store import get_store
+from app.preview import JOB_REF_PREFIX
+
+MEASUREMENTS = {"pattern": "corset", "bust": "90", "waist": "72", "hips": "98", "original_size": "38"}
+
+
+@pytest.fixture
+def renders_dir(app, tmp_path):
+    path = tmp_path / "renders"
+    app.config["RENDER_DIR"] = str(path)
+    return path
+
+
+def upload_pdf(client, make_pdf, pages=2):
+    response = client.post("/upload", data=dict(MEASUREMENTS, svg_file=(io.BytesIO(make_pdf(pages)), "pattern.pdf")),
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    return re.search(r"/download_zip/([0-9a-f]{32})", response.get_data(as_text=True)).group(1)
+
+
+def test_print_zip_is_rendered_on_first_download_only(app, client, make_pdf, fake_pdf_tools, renders_dir):
+    job_id = upload_pdf(client, make_pdf)
+    assert fake_pdf_tools["render"] == 0
+    with app.app_context():
+        assert "zip_key" not in get_store().get_ref(JOB_REF_PREFIX + job_id)
+
+    first = client.get(f"/download_zip/{job_id}")
+    assert first.status_code == 200
+    assert first.data.startswith(b"PK")
+    assert len(zipfile.ZipFile(io.BytesIO(first.data)).namelist()) == 2
+    with app.app_context():
+        assert get_store().get_ref(JOB_REF_PREFIX + job_id)["zip_key"]
+
+    second = client.get(f"/download_zip/{job_id}")
+    assert second.data == first.data
+    assert fake_pdf_tools["render"] == 1
+
+
+def test_concurrent_downloads_render_once(app, client, make_pdf, fake_pdf_tools, renders_dir):
+    job_id = upload_pdf(client, make_pdf)
+
+    def download(_):
+        return app.test_client().get(f"/download_zip/{job_id}").status_code
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(download, range(4))) == [200] * 4
+    assert fake_pdf_tools["render"] == 1
+
+
+def test_unknown_print_jobs_give_404(client, renders_dir):
+    assert client.get(f"/download_zip/{'0' * 32}").status_code == 404
+    assert client.get("/download_zip/not-a-job").status_code == 404
+
+
+def test_renders_work_outside_the_app_directory(app, client, make_pdf, fake_pdf_tools, renders_dir):
+    job_id = upload_pdf(client, make_pdf)
+    assert client.get(f"/download_zip/{job_id}").status_code == 200
+    # Only the job's lock file is left behind; the work directory is removed after the render
+    assert os.listdir(renders_dir) == [job_id + ".lock"]
+    assert not os.path.exists(os.path.join(app.root_path, "uploads", "resized"))
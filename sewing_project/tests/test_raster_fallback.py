@@ -0,0 +1,88 @@
+"""
+Raster fallback: PDFs whose SVG conversion is pathological are previewed and tiled straight from the PDF.
+"""
+import io
+import os
+import re
+import pytest
+from PIL import Image
+from app.pattern_cache import load_handle
+from app.preview import render_raster_previews
+from app.utils import iter_raster_tiles
+
+MEASUREMENTS = {"pattern": "corset", "bust": "90", "waist": "72", "hips": "98", "original_size": "38"}
+
+
+@pytest.fixture
+def pathological(monkeypatch):
+    monkeypatch.setattr("app.routes.svg_conversion_is_pathological", lambda svg_paths: True)
+
+
+def upload_pdf(client, make_pdf, **fields):
+    return client.post("/upload", data=dict(MEASUREMENTS, svg_file=(io.BytesIO(make_pdf(2)), "pattern.pdf"), **fields),
+                       content_type="multipart/form-data")
+
+
+def test_pathological_pdfs_use_the_raster_fallback(app, client, make_pdf, fake_pdf_tools, pathological, tmp_path):
+    app.config["RENDER_DIR"] = str(tmp_path / "renders")
+    response = upload_pdf(client, make_pdf)
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    handle = re.search(r"/rescale/([0-9a-f]{16})", page).group(1)
+    with app.app_context():
+        assert load_handle(app.root_path, handle)["raster_fallback"]
+    assert (fake_pdf_tools["raster_previews"], fake_pdf_tools["previews"]) == (1, 0)
+
+    job_id = re.search(r"/download_zip/([0-9a-f]{32})", page).group(1)
+    assert client.get(f"/download_zip/{job_id}").status_code == 200
+    assert (fake_pdf_tools["raster_render"], fake_pdf_tools["render"]) == (1, 0)
+
+
+def test_raster_fallback_only_allows_tiled_profiles(client, make_pdf, fake_pdf_tools, pathological):
+    response = upload_pdf(client, make_pdf, output_profile="a0")
+    assert response.status_code == 400
+    assert "tiled profile" in response.get_data(as_text=True)
+    page = upload_pdf(client, make_pdf).get_data(as_text=True)
+    handle = re.search(r"/rescale/([0-9a-f]{16})", page).group(1)
+    assert client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, output_profile="roll_610")).status_code == 400
+
+
+def test_normal_pdfs_keep_the_svg_path(app, client, make_pdf, fake_pdf_tools):
+    page = upload_pdf(client, make_pdf, output_profile="a0").get_data(as_text=True)
+    handle = re.search(r"/rescale/([0-9a-f]{16})", page).group(1)
+    with app.app_context():
+        assert not load_handle(app.root_path, handle)["raster_fallback"]
+    assert (fake_pdf_tools["raster_previews"], fake_pdf_tools["previews"]) == (0, 1)
+
+
+def test_raster_previews_are_stretched_to_the_scaled_proportions(monkeypatch, tmp_path):
+    pdf2image = pytest.importorskip("pdf2image")
+
+    def convert_from_path(pdf_path, size, output_folder, paths_only, fmt, output_file):
+        paths = []
+        for i in range(2):
+            path = os.path.join(output_folder, f"{output_file}{i}.png")
+            Image.new("RGB", (size[0], 400), "white").save(path)
+            paths.append(path)
+        return paths
+
+    monkeypatch.setattr(pdf2image, "convert_from_path", convert_from_path)
+    previews = render_raster_previews("pattern.pdf", 1.0, 1.1, str(tmp_path), max_width=300)
+    assert previews == ["page_1_preview.png", "page_2_preview.png"]
+    # The width stays at max_width; only the height follows the ratio of the scale factors
+    assert Image.open(tmp_path / "resized" / previews[0]).size == (300, 440)
+    assert sorted(os.listdir(tmp_path / "resized")) == previews
+
+
+def test_raster_tiles_are_cut_page_by_page(monkeypatch, tmp_path):
+    def pages(pdf_path, output_folder, dpi):
+        for i in range(2):
+            path = os.path.join(output_folder, f"raster_1_{i}.png")
+            Image.new("RGB", (500, 700), "white").save(path)
+            yield path
+
+    monkeypatch.setattr("app.utils.iter_pdf_page_images", pages)
+    tiles = list(iter_raster_tiles("pattern.pdf", 1.2, 1.0, str(tmp_path), paper="A4", dpi=72))
+    # 600 x 700 px per scaled page is 2 x 1 A4 tiles at 72 DPI (595 x 842 px)
+    assert len(tiles) == 4 and all(os.path.exists(tile) for tile in tiles)
+    assert os.listdir(tmp_path / "raster_pages") == []
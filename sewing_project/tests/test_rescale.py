@@ -0,0 +1,72 @@
+"""
+Rescaling a pattern handle: reusing the cached conversion with new measurements.
+"""
+import io
+import re
+import sqlite3
+import pytest
+from app.artifact_store import get_store
+from app.database.db_helper import db_path
+from app.preview import JOB_REF_PREFIX
+
+MEASUREMENTS = {"pattern": "corset", "bust": "90", "waist": "72", "hips": "98", "original_size": "38"}
+SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" viewBox="0 0 210 297">'
+       '<path d="M 20 20 L 180 20 L 180 270 L 20 270 Z" fill="none" stroke="black"/></svg>')
+
+
+def upload(client, data, filename):
+    response = client.post("/upload", data=dict(MEASUREMENTS, svg_file=(io.BytesIO(data), filename)),
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    return re.search(r"/rescale/([0-9a-f]{16})", page).group(1), page
+
+
+def scaling_rows():
+    connection = sqlite3.connect(db_path())
+    try:
+        return connection.execute("SELECT scale_x, scale_y, source FROM scaling ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def print_job(app, page):
+    job_id = re.search(r"/download_zip/([0-9a-f]{32})", page).group(1)
+    with app.app_context():
+        return get_store().get_ref(JOB_REF_PREFIX + job_id)
+
+
+def test_svg_rescale_derives_factors_from_the_upload(client):
+    handle, _ = upload(client, SVG.encode(), "corset.svg")
+    response = client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, bust="99", hips="98"))
+    assert response.status_code == 200
+    assert "/artifact/" in response.get_data(as_text=True)
+    (upload_x, upload_y, _), (scale_x, scale_y, source) = scaling_rows()
+    assert source == "derived"
+    assert scale_x == pytest.approx(upload_x * 99 / 90)
+    assert scale_y == pytest.approx(upload_y)
+
+
+def test_rescale_needs_a_handle_of_this_session(app, client):
+    assert client.post(f"/rescale/{'0' * 16}", data=MEASUREMENTS).status_code == 404
+    handle, _ = upload(client, SVG.encode(), "corset.svg")
+    assert app.test_client().post(f"/rescale/{handle}", data=MEASUREMENTS).status_code == 404
+
+
+def test_pdf_rescale_reuses_the_conversion(app, client, make_pdf, fake_pdf_tools):
+    handle, _ = upload(client, make_pdf(2), "pattern.pdf")
+    response = client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, bust="96"))
+    assert response.status_code == 200
+    assert fake_pdf_tools["convert"] == 1
+    assert fake_pdf_tools["previews"] == 2
+    assert print_job(app, response.get_data(as_text=True))["scale_x"] == pytest.approx(scaling_rows()[-1][0])
+
+
+def test_rescale_form_turns_nesting_on_and_off(app, client, make_pdf, fake_pdf_tools):
+    handle, page = upload(client, make_pdf(1), "pattern.pdf")
+    assert not print_job(app, page)["profile"].get("nest")
+    nested = client.post(f"/rescale/{handle}", data=dict(MEASUREMENTS, nest="1"))
+    assert print_job(app, nested.get_data(as_text=True))["profile"].get("nest")
+    # An unticked checkbox is simply missing from the form
+    plain = client.post(f"/rescale/{handle}", data=MEASUREMENTS)
+    assert not print_job(app, plain.get_data(as_text=True))["profile"].get("nest")
@@ -0,0 +1,76 @@
+"""
+SVG optimizer pass: invisible elements, group flattening, symbol deduplication, rounding and serialization.
+"""
+import importlib
+import xml.etree.ElementTree as Et
+from app import svg_optimize
+from app.svg_optimize import optimize_svg, rdp, round_numbers
+
+SVG_NS = "http://www.w3.org/2000/svg"
+
+
+def svg(body):
+    return (f'<svg xmlns="{SVG_NS}" xmlns:xlink="http://www.w3.org/1999/xlink" width="210mm" height="297mm" '
+            f'viewBox="0 0 210 297">{body}</svg>')
+
+
+def tags(svg_content):
+    return [elem.tag.split("}", 1)[-1] for elem in Et.fromstring(svg_content).iter()]
+
+
+def test_removes_display_none_and_transparent_subtrees():
+    out, stats = optimize_svg(svg('<g style="display: none"><path d="M 0 0 L 1 1"/></g>'
+                                  '<path d="M 0 0 L 2 2" opacity="0"/>'
+                                  '<path d="M 0 0 L 3 3"/>'))
+    assert tags(out) == ["svg", "path"]
+    assert stats["elements_before"] == 5 and stats["elements_after"] == 2
+
+
+def test_keeps_visible_children_of_hidden_groups():
+    out, _ = optimize_svg(svg('<g visibility="hidden"><path d="M 0 0 L 1 1" visibility="visible"/></g>'))
+    assert 'visibility="visible"' in out
+    assert "path" in tags(out)
+
+
+def test_flattens_groups_and_pushes_transforms_down():
+    out, _ = optimize_svg(svg('<g><g transform="translate(1,2)"><path d="M 0 0 L 1 1"/></g></g>'))
+    root = Et.fromstring(out)
+    assert tags(out) == ["svg", "path"]
+    assert root[0].get("transform") == "translate(1,2)"
+
+
+def test_dedupes_symbols_and_drops_empty_ones():
+    out, stats = optimize_svg(svg(
+        '<defs><symbol id="g1"><path d="M 0 0 L 1 0"/></symbol><symbol id="g2"><path d="M 0 0 L 1 0"/></symbol>'
+        '<symbol id="space"><path d=""/></symbol></defs>'
+        '<use xlink:href="#g1" x="1"/><use xlink:href="#g2" x="2"/><use xlink:href="#space" x="3"/>'))
+    root = Et.fromstring(out)
+    hrefs = [use.get("{http://www.w3.org/1999/xlink}href") for use in root.iter(f"{{{SVG_NS}}}use")]
+    assert stats["symbols_removed"] == 2
+    assert hrefs == ["#g1", "#g1"]
+
+
+def test_output_is_namespaced_svg_without_registering_prefixes_globally():
+    registered = dict(Et._namespace_map)
+    importlib.reload(svg_optimize)
+    out, _ = svg_optimize.optimize_svg(svg('<use xlink:href="#a"/>'))
+    assert out.startswith("<svg ") and 'xmlns="http://www.w3.org/2000/svg"' in out
+    assert 'xmlns:xlink="http://www.w3.org/1999/xlink"' in out
+    # Other modules serializing namespaced trees keep whatever prefixes they registered
+    assert Et._namespace_map == registered
+
+
+def test_rounds_coordinates_but_keeps_transform_precision():
+    assert round_numbers("M 1.234567 -0.0001 L 2.50 3", 3) == "M 1.235 0 L 2.5 3"
+    out, _ = optimize_svg(svg('<path d="M 1.234567 2 L 3 4" transform="scale(1.23456789)"/>'))
+    path = Et.fromstring(out)[0]
+    assert path.get("d") == "M 1.235 2 L 3 4"
+    assert path.get("transform") == "scale(1.234568)"
+
+
+def test_simplify_drops_collinear_points_only_when_asked():
+    line = svg('<path d="M 0 0 L 1 0.001 L 2 0 L 2 5"/>')
+    assert Et.fromstring(optimize_svg(line)[0])[0].get("d") == "M 0 0 L 1 0.001 L 2 0 L 2 5"
+    simplified = Et.fromstring(optimize_svg(line, simplify_tolerance=0.05)[0])[0].get("d")
+    assert simplified == "M 0 0 L 2 0 L 2 5"
+    assert rdp([(0, 0), (1, 1), (2, 2)], 0.01) == [(0, 0), (2, 2)]
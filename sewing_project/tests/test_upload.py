@@ -0,0 +1,38 @@
+"""
+Upload flow: every request works in a private directory, so concurrent uploads do not interfere.
+"""
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" viewBox="0 0 210 297">'
+       '<path d="M 20 20 L 180 20 L 180 270 L 20 270 Z" fill="none" stroke="black"/><!-- {n} --></svg>')
+
+
+def upload(client, n):
+    return client.post("/upload", data={
+        "pattern": "corset", "bust": "90", "waist": "72", "hips": "98", "original_size": "38",
+        "svg_file": (io.BytesIO(SVG.format(n=n).encode()), f"s{n}.svg"),
+    }, content_type="multipart/form-data")
+
+
+def test_svg_upload_renders_the_result(app, client):
+    response = upload(client, 0)
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "/artifact/" in page and "/instructions/" in page
+    assert not os.path.exists(os.path.join(app.root_path, "uploads", "s0.svg"))
+
+
+def test_concurrent_uploads_do_not_delete_each_others_files(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    def run(n):
+        return upload(app.test_client(), n).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(run, range(16)))
+    assert statuses == [200] * 16
+    # Each request's directory is removed once its response is built
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("upload_")]